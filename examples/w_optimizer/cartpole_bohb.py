@@ -19,6 +19,7 @@ from hpbandster.core.worker import Worker
 from hpbandster.optimizers import BOHB
 
 from hpolib.container.benchmarks.rl.cartpole import CartpoleReduced as Benchmark
+from hpolib.container.container_pool import ContainerPool
 from hpolib.util.example_utils import get_travis_settings, set_env_variables_to_use_only_one_core
 from hpolib.util.rng_helper import get_rng
 
@@ -27,18 +28,20 @@ set_env_variables_to_use_only_one_core()
 
 
 class CustomWorker(Worker):
-    def __init__(self, seed, max_budget, *args, **kwargs):
+    def __init__(self, seed, max_budget, pool, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.seed = seed
         self.max_budget = max_budget
+        self.pool = pool
 
     def compute(self, config, budget, **kwargs):
-        b = Benchmark(rng=self.seed)
-        # Old API ---- NO LONGER SUPPORTED ---- This will simply ignore the fidelities
-        # result_dict = b.objective_function(config, budget=int(budget))
-        
-        # New API ---- Use this
-        result_dict = b.objective_function(config, fidelity={"budget": int(budget)})
+        # Lease an already started container instead of starting a new one for each evaluation.
+        with self.pool.lease(Benchmark, rng=self.seed) as b:
+            # Old API ---- NO LONGER SUPPORTED ---- This will simply ignore the fidelities
+            # result_dict = b.objective_function(config, budget=int(budget))
+
+            # New API ---- Use this
+            result_dict = b.objective_function(config, fidelity={"budget": int(budget)})
         return {'loss': result_dict['function_value'],
                 'info': {'cost': result_dict['cost'],
                          'budget': result_dict['budget']}}
@@ -70,7 +73,12 @@ def run_experiment(out_path, on_travis):
     ns = hpns.NameServer(run_id=run_id, host='localhost', working_directory=str(settings.get('output_dir')))
     ns_host, ns_port = ns.start()
 
+    # Start the container of the worker in the background, while the optimizer is set up.
+    pool = ContainerPool(size=1)
+    pool.warm_up(Benchmark, rng=seed)
+
     worker = CustomWorker(seed=seed,
+                          pool=pool,
                           nameserver=ns_host,
                           nameserver_port=ns_port,
                           run_id=run_id,
@@ -90,6 +98,7 @@ def run_experiment(out_path, on_travis):
     result = master.run(n_iterations=settings.get('num_iterations'))
     master.shutdown(shutdown_workers=True)
     ns.shutdown()
+    pool.close()
 
     with open(settings.get('output_dir') / 'results.pkl', 'wb') as f:
         pickle.dump(result, f)
@@ -1,20 +1,38 @@
 """ Base-class of all benchmarks """
 
 import abc
-from typing import Union, Dict
+import sys
+from typing import Union, Dict, List, Tuple
 
 import logging
 import ConfigSpace
 import numpy as np
 
 from hpolib.util import rng_helper
+from hpolib.util.config_validator import ConfigurationValidator
+from hpolib.util.result_cache import ResultCache
+from hpolib.util.trajectory import TrajectoryRecorder
 
 logger = logging.getLogger('AbstractBenchmark')
 
 
 class AbstractBenchmark(object, metaclass=abc.ABCMeta):
 
-    def __init__(self, rng: Union[int, np.random.RandomState, None] = None):
+    # Set to True in benchmarks, which always return the same result for a query, independent of the random state.
+    # E.g. tabular benchmarks. Only used for the result cache (see `enable_result_cache`).
+    _deterministic = False
+
+    # Set to True in benchmarks, which use the random state only in the objective functions, but not to load or prepare
+    # the data in the constructor. Then, the container server lets instances with different random states share the
+    # loaded data (see `BenchmarkServer.create_benchmark`).
+    _rng_independent_data = False
+
+    # Attributes, which hold the state of a single instance instead of the loaded data, e.g. the random state or caches.
+    # Instances, which share the loaded data, get their own deep copies of them (see
+    # `BenchmarkServer.create_benchmark`). Extend it in benchmarks with further mutable state.
+    _instance_attributes = ('rng', '_result_cache', '_result_cache_deterministic', 'trajectory')
+
+    def __init__(self, rng: Union[int, np.random.RandomState, None] = None, validate: str = 'full'):
         """
         Interface for benchmarks.
 
@@ -31,12 +49,23 @@ class AbstractBenchmark(object, metaclass=abc.ABCMeta):
             The default random state for the benchmark. If type is int, a
             np.random.RandomState with seed `rng` is created. If type is None,
             create a new random state.
+        validate : str
+            How the decorators _check_configuration and _check_fidelity validate the input.
+            'full': Create a ConfigSpace.Configuration and check it with ConfigSpace.
+            'fast': Check bounds, choices and conditions directly on the dictionary (see ConfigurationValidator).
+            'off': Don't check the configuration. Only fill in the default fidelities.
         """
+        assert validate in ['full', 'fast', 'off'], f'Unknown validation mode {validate}'
 
+        self._validate = validate
         self.rng = rng_helper.get_rng(rng=rng)
         self.configuration_space = self.get_configuration_space()
         self.fidelity_space = self.get_fidelity_space()
 
+        self._result_cache = None
+        self._result_cache_deterministic = False
+        self.trajectory = None
+
     @abc.abstractmethod
     def objective_function(self, configuration: Dict, fidelity: Union[Dict, None] = None,
                            rng: Union[np.random.RandomState, int, None] = None,
@@ -93,6 +122,210 @@ class AbstractBenchmark(object, metaclass=abc.ABCMeta):
         """
         pass
 
+    def objective_function_batch(self, configurations: List[Union[np.ndarray, ConfigSpace.Configuration, Dict]],
+                                 fidelities: Union[List[Dict], Dict, ConfigSpace.Configuration, None] = None,
+                                 rng: Union[np.random.RandomState, int, None] = None,
+                                 **kwargs) -> Dict:
+        """
+        Evaluate a batch of configurations.
+
+        The default implementation calls `objective_function` once per configuration. Benchmarks which are able to
+        answer many queries at once (e.g. tabular benchmarks) should override this function.
+
+        Parameters
+        ----------
+        configurations : List[np.ndarray, ConfigSpace.Configuration, Dict]
+        fidelities : List[Dict], Dict, ConfigSpace.Configuration, None
+            Either one fidelity per configuration or a single fidelity, which is then used for all configurations.
+            Uses default (max) value if None.
+        rng : np.random.RandomState, int, None
+            see :py:func:`~HPOlib2.abstract_benchmark.objective_function`
+        kwargs
+            Passed to every call of the objective function.
+
+        Returns
+        -------
+        Dict
+            Results in a columnar layout: `function_value` and `cost` are np.ndarrays with one entry per
+            configuration. `info` maps each info key to the values of all configurations.
+        """
+        fidelities = self._broadcast_fidelities(configurations, fidelities)
+        results = [self.objective_function(configuration, fidelity=fidelity, rng=rng, **kwargs)
+                   for configuration, fidelity in zip(configurations, fidelities)]
+        return self._results_to_columns(results)
+
+    def _check_batch(self, configurations: List[Union[np.ndarray, ConfigSpace.Configuration, Dict]],
+                     fidelities: Union[List[Dict], Dict, ConfigSpace.Configuration, None] = None) \
+            -> Tuple[List[Union[np.ndarray, Dict]], List[Dict]]:
+        """
+        Helper function for benchmarks overriding `objective_function_batch`. Applies the same checks as the
+        decorators `_configuration_as_dict`, `_check_configuration` and `_check_fidelity` to each pair of
+        configuration and fidelity in the batch.
+
+        Returns
+        -------
+        List[Dict], List[Dict]
+            The checked configurations and the completed fidelities.
+        """
+        @AbstractBenchmark._configuration_as_dict
+        @AbstractBenchmark._check_configuration
+        @AbstractBenchmark._check_fidelity
+        def _check(_, configuration, fidelity=None):
+            return configuration, fidelity
+
+        fidelities = self._broadcast_fidelities(configurations, fidelities)
+        checked = [_check(self, configuration, fidelity=fidelity)
+                   for configuration, fidelity in zip(configurations, fidelities)]
+        return [c for c, _ in checked], [f for _, f in checked]
+
+    @staticmethod
+    def _broadcast_fidelities(configurations: List,
+                              fidelities: Union[List[Dict], Dict, ConfigSpace.Configuration, None]) -> List:
+        """ Helper function to bring the fidelities of a batch into the form: one fidelity per configuration. """
+        if fidelities is None or isinstance(fidelities, (dict, ConfigSpace.Configuration)):
+            return [fidelities] * len(configurations)
+        if len(fidelities) != len(configurations):
+            raise ValueError(f'Number of fidelities ({len(fidelities)}) does not match the number of '
+                             f'configurations ({len(configurations)})')
+        return list(fidelities)
+
+    @staticmethod
+    def _results_to_columns(results: List[Dict]) -> Dict:
+        """
+        Helper function to transform a list of result dictionaries into the columnar layout of
+        `objective_function_batch`. Info keys which are missing in some of the results are filled with None.
+        """
+        info_keys = []
+        for result in results:
+            info_keys.extend(k for k in result.get('info', {}) if k not in info_keys)
+
+        return {'function_value': np.array([result['function_value'] for result in results], dtype=float),
+                'cost': np.array([result['cost'] for result in results], dtype=float),
+                'info': {k: [result.get('info', {}).get(k, None) for result in results] for k in info_keys}
+                }
+
+    def enable_result_cache(self, cache: Union[ResultCache, None] = None, deterministic: Union[bool, None] = None):
+        """
+        Enable caching the results of the objective functions, which are decorated with `_cache_result`.
+
+        A call is cached if the benchmark is deterministic or if the `rng` is given as int. Calls using the
+        benchmark's random state or a np.random.RandomState are always evaluated, since they are not reproducible.
+        Note that a cached result contains the `cost` of the original evaluation.
+
+        Parameters
+        ----------
+        cache : ResultCache, None
+            The cache to use. Defaults to a ResultCache in `hpolib.config_file.cache_dir`.
+        deterministic : bool, None
+            If True, results are cached independently of the `rng`. Defaults to True for tabular benchmarks.
+        """
+        self._result_cache = cache if cache is not None else ResultCache()
+        self._result_cache_deterministic = self._deterministic if deterministic is None else deterministic
+
+    def disable_result_cache(self):
+        """ Disable the result cache. The cached results are not removed. """
+        self._result_cache = None
+
+    def enable_trajectory_recorder(self, initial_size: int = 1024, max_size: Union[int, None] = None) \
+            -> TrajectoryRecorder:
+        """
+        Record the queries of the objective functions, which are decorated with `_record_trajectory`, in
+        `self.trajectory`. See :py:class:`~hpolib.util.trajectory.TrajectoryRecorder`.
+
+        Parameters
+        ----------
+        initial_size : int
+            Number of queries, for which memory is allocated at the beginning.
+        max_size : int, None
+            Maximum number of stored queries. Afterwards, the oldest queries are overwritten.
+
+        Returns
+        -------
+        TrajectoryRecorder
+        """
+        self.trajectory = TrajectoryRecorder(self.configuration_space, self.fidelity_space,
+                                             initial_size=initial_size, max_size=max_size)
+        return self.trajectory
+
+    def disable_trajectory_recorder(self):
+        """ Stop recording the queries. """
+        self.trajectory = None
+
+    def _use_result_cache(self, **kwargs) -> bool:
+        """ Whether the result of a call with the given arguments can be cached. """
+        if self._result_cache_deterministic:
+            return True
+        rng = kwargs.get('rng', None)
+        return isinstance(rng, (int, np.integer)) and not isinstance(rng, bool)
+
+    def _uses_instance_state(self, **kwargs) -> bool:
+        """
+        Whether a call of the objective functions with the given arguments reads or changes state of this instance
+        besides the random state, e.g. a cache. Copies of the benchmark in other processes would not see this state.
+        Thus, the container server does not evaluate such calls in its process pool (see
+        `BenchmarkServer.set_worker_pool`).
+        """
+        return self._result_cache is not None or self.trajectory is not None
+
+    def _get_cache_key_parameters(self) -> Dict:
+        """
+        Parameters of the benchmark instance, which influence the results, e.g. the task id. They become part of the
+        key in the result cache. Parameters which are encoded in the class already don't have to be returned.
+        """
+        return {}
+
+    @staticmethod
+    def _cache_result(foo):
+        """
+        Decorator to look up the result of the objective function in the result cache before evaluating it.
+        Does nothing, if the cache is not enabled (see `enable_result_cache`).
+
+        The key consists of the benchmark class, its version, the configuration and all keyword arguments. Thus, it
+        has to be applied after the _check_configuration and _check_fidelity decorators, so that only valid
+        configurations are cached and missing fidelity parameters are already filled in.
+        """
+        def wrapper(self, configuration: Union[np.ndarray, Dict], **kwargs):
+            cache = getattr(self, '_result_cache', None)
+            if cache is None or not self._use_result_cache(**kwargs):
+                return foo(self, configuration, **kwargs)
+
+            arguments = kwargs
+            if self._result_cache_deterministic:
+                arguments = {k: v for k, v in kwargs.items() if k != 'rng'}
+
+            try:
+                key = cache.get_key(benchmark=f'{type(self).__module__}.{type(self).__name__}',
+                                    version=getattr(sys.modules[type(self).__module__], '__version__', None),
+                                    function=foo.__name__,
+                                    parameters=self._get_cache_key_parameters(),
+                                    configuration=configuration,
+                                    arguments=arguments)
+            except TypeError as e:
+                logger.debug(f'Result is not cached: {e}')
+                return foo(self, configuration, **kwargs)
+
+            result = cache.get(key)
+            if result is None:
+                result = foo(self, configuration, **kwargs)
+                cache.set(key, result)
+            return result
+        return wrapper
+
+    @staticmethod
+    def _record_trajectory(foo):
+        """
+        Decorator to record the query in the trajectory recorder. Does nothing, if the recorder is not enabled (see
+        `enable_trajectory_recorder`). It has to be applied after the _check_fidelity decorator, so that the
+        fidelity is filled in.
+        """
+        def wrapper(self, configuration: Union[np.ndarray, Dict], **kwargs):
+            result = foo(self, configuration, **kwargs)
+            recorder = getattr(self, 'trajectory', None)
+            if recorder is not None:
+                recorder.record(configuration, kwargs.get('fidelity', None), result['function_value'], result['cost'])
+            return result
+        return wrapper
+
     @staticmethod
     def _check_configuration(foo):
         """
@@ -105,6 +338,13 @@ class AbstractBenchmark(object, metaclass=abc.ABCMeta):
         """
         def wrapper(self, configuration: Union[np.ndarray, ConfigSpace.Configuration, Dict], **kwargs):
 
+            mode = getattr(self, '_validate', 'full')
+            if mode == 'off':
+                return foo(self, configuration, **kwargs)
+            if mode == 'fast':
+                _get_validator(self, 'configuration_space').check(configuration)
+                return foo(self, configuration, **kwargs)
+
             try:
                 if isinstance(configuration, np.ndarray):
                     config_dict = {k: configuration[i] for (i, k) in enumerate(self.configuration_space)}
@@ -145,6 +385,20 @@ class AbstractBenchmark(object, metaclass=abc.ABCMeta):
         def wrapper(self, configuration: Union[np.ndarray, ConfigSpace.Configuration, Dict],
                     fidelity: Union[Dict, ConfigSpace.Configuration, None] = None, **kwargs):
 
+            mode = getattr(self, '_validate', 'full')
+            if mode != 'full':
+                # Reuse the cached default fidelities instead of creating a ConfigSpace.Configuration on every call
+                validator = _get_validator(self, 'fidelity_space')
+                for name in validator.default_values:
+                    if name in kwargs:
+                        raise ValueError(f'Fidelity parameter {name} should not be part of kwargs\n'
+                                         f'Fidelity: {fidelity}\n Kwargs: {kwargs}')
+
+                fidelity = validator.complete(fidelity)
+                if mode == 'fast':
+                    validator.check(fidelity)
+                return foo(self, configuration, fidelity=fidelity, **kwargs)
+
             # Sanity check that there are no fidelities in **kwargs
             for f in self.fidelity_space.get_hyperparameters():
                 if f.name in kwargs:
@@ -262,3 +516,23 @@ class AbstractBenchmark(object, metaclass=abc.ABCMeta):
 
         """
         raise NotImplementedError()
+
+
+def _get_validator(benchmark, space_name: str) -> ConfigurationValidator:
+    """
+    Helper function to get the validator for the configuration or fidelity space of a benchmark. The validator is
+    created on first use and stored at the benchmark.
+
+    Parameters
+    ----------
+    benchmark : AbstractBenchmark
+    space_name : str
+        Either 'configuration_space' or 'fidelity_space'.
+    """
+    attribute = f'_{space_name}_validator'
+    space = getattr(benchmark, space_name)
+    validator = getattr(benchmark, attribute, None)
+    if validator is None or validator.configuration_space is not space:
+        validator = ConfigurationValidator(space)
+        setattr(benchmark, attribute, validator)
+    return validator
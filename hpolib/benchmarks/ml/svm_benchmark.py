@@ -1,4 +1,6 @@
+import hashlib
 import time
+from collections import OrderedDict
 from typing import Union, Tuple, Dict, List
 
 import ConfigSpace as CS
@@ -9,6 +11,7 @@ from sklearn import svm
 from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
 from sklearn.metrics import accuracy_score, make_scorer
+from sklearn.metrics.pairwise import euclidean_distances
 from sklearn.preprocessing import OneHotEncoder
 
 import hpolib.util.rng_helper as rng_helper
@@ -23,6 +26,8 @@ logger = logging.getLogger('SVMBenchmark')
 
 
 class SupportVectorMachine(AbstractBenchmark):
+    # `shuffle_data` shuffles the training idx in place.
+    _instance_attributes = AbstractBenchmark._instance_attributes + ('train_idx', '_kernel_cache')
     """
     Hyperparameter optimization task to optimize the regularization
     parameter C and the kernel parameter gamma of a support vector machine.
@@ -33,17 +38,24 @@ class SupportVectorMachine(AbstractBenchmark):
     """
 
     def __init__(self, task_id: Union[int, None] = None,
-                 rng: Union[np.random.RandomState, int, None] = None):
+                 rng: Union[np.random.RandomState, int, None] = None, kernel_cache_size: int = 0):
         """
         Parameters
         ----------
         task_id : int, None
         rng : np.random.RandomState, int, None
+        kernel_cache_size : int
+            Memory budget in MB for the squared distances between the preprocessed data points (0 disables the cache).
+            They are computed once per training subset. The RBF kernel for any gamma is derived from them and passed
+            to the SVC as precomputed kernel. If the distances of a subset exceed the budget, the SVC computes the
+            kernel itself as before. See `_get_distances`.
         """
         super(SupportVectorMachine, self).__init__(rng=rng)
 
         self.task_id = task_id
         self.cache_size = 200  # Cache for the SVC in MB
+        self.kernel_cache_size = kernel_cache_size
+        self._kernel_cache = OrderedDict()
         self.accuracy_scorer = make_scorer(accuracy_score)
 
         self.X_train, self.y_train, self.X_valid, self.y_valid, self.X_test, self.y_test, variable_types = \
@@ -92,9 +104,27 @@ class SupportVectorMachine(AbstractBenchmark):
         random_state = rng_helper.get_rng(rng, self.rng)
         random_state.shuffle(self.train_idx)
 
+    def _use_result_cache(self, **kwargs) -> bool:
+        # Shuffling changes the training idx for all following calls. Thus, it must not be skipped by the cache.
+        if kwargs.get('shuffle', False):
+            return False
+        return super(SupportVectorMachine, self)._use_result_cache(**kwargs)
+
+    def _uses_instance_state(self, **kwargs) -> bool:
+        # Shuffling changes the training idx for all following calls.
+        if kwargs.get('shuffle', False):
+            return True
+        return super(SupportVectorMachine, self)._uses_instance_state(**kwargs)
+
+    def _get_cache_key_parameters(self) -> Dict:
+        # The order of the training idx depends on the random state of the benchmark.
+        return {'task_id': self.task_id,
+                'train_idx': hashlib.sha256(self.train_idx.tobytes()).hexdigest()}
+
     @AbstractBenchmark._configuration_as_dict
     @AbstractBenchmark._check_configuration
     @AbstractBenchmark._check_fidelity
+    @AbstractBenchmark._cache_result
     def objective_function(self, configuration: Union[Dict, CS.Configuration],
                            fidelity: Union[Dict, None] = None,
                            shuffle: bool = False,
@@ -152,13 +182,24 @@ class SupportVectorMachine(AbstractBenchmark):
         hp_c = np.exp(float(configuration['C']))
         hp_gamma = np.exp(float(configuration['gamma']))
 
-        # Train support vector machine
-        model = self.get_pipeline(hp_c, hp_gamma)
-        model.fit(self.X_train[train_idx], self.y_train[train_idx])
+        distances = self._get_distances(train_idx)
+        if distances is not None:
+            # Train support vector machine on the precomputed kernel
+            kernel = self._rbf_kernel(distances['train'], hp_gamma)
+            model = self._get_classifier(hp_c, kernel='precomputed')
+            model.fit(kernel, self.y_train[train_idx])
+
+            # Compute validation error
+            train_loss = 1 - self.accuracy_scorer(model, kernel, self.y_train[train_idx])
+            val_loss = 1 - self.accuracy_scorer(model, self._rbf_kernel(distances['valid'], hp_gamma), self.y_valid)
+        else:
+            # Train support vector machine
+            model = self.get_pipeline(hp_c, hp_gamma)
+            model.fit(self.X_train[train_idx], self.y_train[train_idx])
 
-        # Compute validation error
-        train_loss = 1 - self.accuracy_scorer(model, self.X_train[train_idx], self.y_train[train_idx])
-        val_loss = 1 - self.accuracy_scorer(model, self.X_valid, self.y_valid)
+            # Compute validation error
+            train_loss = 1 - self.accuracy_scorer(model, self.X_train[train_idx], self.y_train[train_idx])
+            val_loss = 1 - self.accuracy_scorer(model, self.X_valid, self.y_valid)
 
         cost = time.time() - start_time
 
@@ -170,6 +211,7 @@ class SupportVectorMachine(AbstractBenchmark):
     @AbstractBenchmark._configuration_as_dict
     @AbstractBenchmark._check_configuration
     @AbstractBenchmark._check_fidelity
+    @AbstractBenchmark._cache_result
     def objective_function_test(self, configuration: Union[Dict, CS.Configuration],
                                 fidelity: Union[Dict, None] = None, shuffle: bool = False,
                                 rng: Union[np.random.RandomState, int, None] = None, **kwargs) -> Dict:
@@ -206,25 +248,30 @@ class SupportVectorMachine(AbstractBenchmark):
 
         start_time = time.time()
 
-        # Concatenate training and validation dataset
-        if isinstance(self.X_train, sparse.csr.csr_matrix) or isinstance(self.X_valid, sparse.csr.csr_matrix):
-            data = sparse.vstack((self.X_train, self.X_valid))
-        else:
-            data = np.concatenate((self.X_train, self.X_valid))
         targets = np.concatenate((self.y_train, self.y_valid))
 
         # Transform hyperparameters to linear scale
         hp_c = np.exp(float(configuration['C']))
         hp_gamma = np.exp(float(configuration['gamma']))
 
-        model = self.get_pipeline(hp_c, hp_gamma)
-        model.fit(data, targets)
+        distances = self._get_distances(train_idx=None)
+        if distances is not None:
+            kernel = self._rbf_kernel(distances['train'], hp_gamma)
+            model = self._get_classifier(hp_c, kernel='precomputed')
+            model.fit(kernel, targets)
 
-        # Compute validation error
-        train_valid_loss = 1 - self.accuracy_scorer(model, data, targets)
+            train_valid_loss = 1 - self.accuracy_scorer(model, kernel, targets)
+            test_loss = 1 - self.accuracy_scorer(model, self._rbf_kernel(distances['test'], hp_gamma), self.y_test)
+        else:
+            data = self._get_train_valid_data()
+            model = self.get_pipeline(hp_c, hp_gamma)
+            model.fit(data, targets)
 
-        # Compute test error
-        test_loss = 1 - self.accuracy_scorer(model, self.X_test, self.y_test)
+            # Compute validation error
+            train_valid_loss = 1 - self.accuracy_scorer(model, data, targets)
+
+            # Compute test error
+            test_loss = 1 - self.accuracy_scorer(model, self.X_test, self.y_test)
 
         cost = time.time() - start_time
 
@@ -233,10 +280,77 @@ class SupportVectorMachine(AbstractBenchmark):
                 'info': {'train_valid_loss': train_valid_loss,
                          'fidelity': fidelity}}
 
+    def _get_train_valid_data(self) -> Union[np.ndarray, sparse.csr_matrix]:
+        """ Concatenate training and validation dataset """
+        if isinstance(self.X_train, sparse.csr.csr_matrix) or isinstance(self.X_valid, sparse.csr.csr_matrix):
+            return sparse.vstack((self.X_train, self.X_valid))
+        return np.concatenate((self.X_train, self.X_valid))
+
+    def _get_distances(self, train_idx: Union[np.ndarray, None]) -> Union[Dict, None]:
+        """
+        Look up the squared euclidean distances of the preprocessed data in the LRU cache. Compute them, if they are
+        missing. They depend only on the training subset, not on the hyperparameters. The preprocessing is the same as
+        in the pipeline (see `get_pipeline`).
+
+        Parameters
+        ----------
+        train_idx : np.ndarray, None
+            Idx of the training data. If None, the training and validation data is used for training.
+
+        Returns
+        -------
+        Dict, None -
+            train : np.ndarray - Distances between the training points [n_train, n_train]
+            valid (test) : np.ndarray - Distances of the validation (test) points to the training points
+            None, if the cache is disabled or the distances exceed the memory budget.
+        """
+        key = 'test' if train_idx is None else hashlib.sha256(train_idx.tobytes()).hexdigest()
+        if key in self._kernel_cache:
+            self._kernel_cache.move_to_end(key)
+            return self._kernel_cache[key]
+
+        if train_idx is None:
+            X_fit, others = self._get_train_valid_data(), {'test': self.X_test}
+        else:
+            X_fit, others = self.X_train[train_idx], {'valid': self.X_valid}
+
+        budget = self.kernel_cache_size * 2**20
+        n_bytes = X_fit.shape[0] * (X_fit.shape[0] + sum(X.shape[0] for X in others.values())) * 8
+        if n_bytes > budget:
+            if self.kernel_cache_size > 0:
+                logger.debug(f'The distances ({n_bytes / 2**20:.1f} MB) exceed the kernel cache size. '
+                             f'Fall back to the SVC kernel.')
+            return None
+
+        preprocessing = self._get_preprocessing_pipeline().fit(X_fit)
+        X_fit = preprocessing.transform(X_fit)
+        distances = {'train': euclidean_distances(X_fit, squared=True)}
+        for name, X in others.items():
+            distances[name] = euclidean_distances(preprocessing.transform(X), X_fit, squared=True)
+
+        self._kernel_cache[key] = distances
+        while sum(array.nbytes for entry in self._kernel_cache.values() for array in entry.values()) > budget:
+            self._kernel_cache.popitem(last=False)
+        return distances
+
+    @staticmethod
+    def _rbf_kernel(distances: np.ndarray, gamma: float) -> np.ndarray:
+        """ Compute the RBF kernel exp(-gamma * ||x - y||^2) from the squared distances """
+        kernel = np.multiply(distances, -gamma)
+        return np.exp(kernel, out=kernel)
+
     def get_pipeline(self, C: float, gamma: float) -> pipeline.Pipeline:
         """ Create the scikit-learn (training-)pipeline """
 
-        model = pipeline.Pipeline([
+        model = pipeline.Pipeline(self._get_preprocessing_pipeline().steps + [
+            ('svm', self._get_classifier(C, gamma=gamma))
+        ])
+        return model
+
+    def _get_preprocessing_pipeline(self) -> pipeline.Pipeline:
+        """ Create the preprocessing part of the pipeline: Impute the continuous and one-hot encode the categorical
+        features. """
+        return pipeline.Pipeline([
             ('preprocess_impute',
              ColumnTransformer([
                  ("categorical", "passthrough", self.categorical_data),
@@ -244,11 +358,12 @@ class SupportVectorMachine(AbstractBenchmark):
             ('preprocess_one_hot',
              ColumnTransformer([
                  ("categorical", OneHotEncoder(categories=self.categories, sparse=False), self.categorical_data),
-                 ("continuous", "passthrough", ~self.categorical_data)])),
-            ('svm',
-             svm.SVC(gamma=gamma, C=C, random_state=self.rng, cache_size=self.cache_size))
+                 ("continuous", "passthrough", ~self.categorical_data)]))
         ])
-        return model
+
+    def _get_classifier(self, C: float, gamma: Union[float, str] = 'scale', kernel: str = 'rbf') -> svm.SVC:
+        """ Create the SVC, which is trained on the preprocessed data (or on a precomputed kernel) """
+        return svm.SVC(kernel=kernel, gamma=gamma, C=C, random_state=self.rng, cache_size=self.cache_size)
 
     @staticmethod
     def get_configuration_space(seed: Union[int, None] = None) -> CS.ConfigurationSpace:
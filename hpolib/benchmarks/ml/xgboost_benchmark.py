@@ -1,9 +1,12 @@
+import hashlib
 import time
-from typing import Union, Tuple, Dict, List
+from collections import OrderedDict
+from typing import Union, Tuple, Dict, List, Callable
 
 import ConfigSpace as CS
 import numpy as np
 import xgboost as xgb
+from scipy import sparse
 from sklearn import pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
@@ -13,14 +16,19 @@ from sklearn.preprocessing import OneHotEncoder
 import hpolib.util.rng_helper as rng_helper
 from hpolib.abstract_benchmark import AbstractBenchmark
 from hpolib.util.openml_data_manager import OpenMLHoldoutDataManager
+from hpolib.util.result_cache import ResultCache
 
 __version__ = '0.0.1'
 
 
 class XGBoostBenchmark(AbstractBenchmark):
+    # `shuffle_data` shuffles the training idx in place.
+    _instance_attributes = AbstractBenchmark._instance_attributes + \
+        ('train_idx', '_preprocessing_cache', '_booster_cache')
 
     def __init__(self, task_id: Union[int, None] = None, n_threads: int = 1,
-                 rng: Union[np.random.RandomState, int, None] = None):
+                 rng: Union[np.random.RandomState, int, None] = None, preprocessing_cache_size: int = 4,
+                 native_booster: bool = False, booster_cache_size: int = 0):
         """
 
         Parameters
@@ -28,12 +36,36 @@ class XGBoostBenchmark(AbstractBenchmark):
         task_id : int, None
         n_threads  : int, None
         rng : np.random.RandomState, int, None
+        preprocessing_cache_size : int
+            Number of preprocessed training sets (i.e. subsamples of the training data), which are kept in memory.
+            See `_get_preprocessed_data`.
+        native_booster : bool
+            If True, train the booster with the native xgboost interface on sparse float32 matrices instead of the
+            scikit-learn wrapper on dense one-hot encoded data. It uses the same parameters and yields the same
+            losses, but needs much less memory and time for data sets with many categories.
+            See `_get_dmatrices`.
+        booster_cache_size : int
+            Number of trained boosters, which are kept for further calls (0 disables the cache). Requires
+            `native_booster`. A booster is identified by the configuration, the training data and the seed. A call with
+            fewer trees (`n_estimators`) uses the first trees of the cached booster. A call with more trees continues
+            the training of the cached booster. Thus, evaluating a configuration on increasing budgets costs about as
+            much as the largest budget. Calls without `rng` use a fixed seed of the benchmark, so that they can reuse
+            the cached boosters. See `_train_booster` and `_get_booster_seed`.
+            Note that the cache seeds the random numbers of each boosting round by the number of the round
+            (`seed_per_iteration`). This changes the random stream of the boosters. So, the losses for a seed differ
+            from those without the cache.
         """
+        assert booster_cache_size == 0 or native_booster, 'The booster cache requires native_booster=True'
 
         super(XGBoostBenchmark, self).__init__(rng=rng)
         self.n_threads = n_threads
         self.task_id = task_id
         self.accuracy_scorer = make_scorer(accuracy_score)
+        self.preprocessing_cache_size = preprocessing_cache_size
+        self._preprocessing_cache = OrderedDict()
+        self.native_booster = native_booster
+        self.booster_cache_size = booster_cache_size
+        self._booster_cache = OrderedDict()
 
         self.X_train, self.y_train, self.X_valid, self.y_valid, self.X_test, self.y_test, variable_types = \
             self.get_data()
@@ -64,6 +96,9 @@ class XGBoostBenchmark(AbstractBenchmark):
                                          size=len(self.X_train),
                                          replace=False)
 
+        # Seed of the boosters for calls without `rng`, if the booster cache is enabled. See `_get_booster_seed`.
+        self._booster_seed = self.rng.randint(1, 100000) if booster_cache_size > 0 else None
+
     def get_data(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, List]:
         """ Loads the data given a task or another source. """
 
@@ -81,9 +116,31 @@ class XGBoostBenchmark(AbstractBenchmark):
         random_state = rng_helper.get_rng(rng, self.rng)
         random_state.shuffle(self.train_idx)
 
+    def _use_result_cache(self, **kwargs) -> bool:
+        # Shuffling changes the training idx for all following calls. Thus, it must not be skipped by the cache.
+        if kwargs.get('shuffle', False):
+            return False
+        return super(XGBoostBenchmark, self)._use_result_cache(**kwargs)
+
+    def _uses_instance_state(self, **kwargs) -> bool:
+        # Shuffling changes the training idx for all following calls. The booster cache is filled by all calls.
+        if kwargs.get('shuffle', False) or self.booster_cache_size > 0:
+            return True
+        return super(XGBoostBenchmark, self)._uses_instance_state(**kwargs)
+
+    def _get_cache_key_parameters(self) -> Dict:
+        # The order of the training idx depends on the random state of the benchmark.
+        parameters = {'task_id': self.task_id,
+                      'train_idx': hashlib.sha256(self.train_idx.tobytes()).hexdigest()}
+        # The booster cache changes the random stream of the boosters (see `_train_booster`).
+        if self.booster_cache_size > 0:
+            parameters['seed_per_iteration'] = True
+        return parameters
+
     @AbstractBenchmark._configuration_as_dict
     @AbstractBenchmark._check_configuration
     @AbstractBenchmark._check_fidelity
+    @AbstractBenchmark._cache_result
     def objective_function(self, configuration: Union[Dict, CS.Configuration],
                            fidelity: Union[Dict, None] = None, shuffle: bool = False,
                            rng: Union[np.random.RandomState, int, None] = None, **kwargs) -> Dict:
@@ -126,11 +183,21 @@ class XGBoostBenchmark(AbstractBenchmark):
 
         train_idx = self.train_idx[:int(len(self.train_idx) * fidelity["subsample"])]
 
-        model = self._get_pipeline(n_estimators=fidelity["n_estimators"], **configuration)
-        model.fit(X=self.X_train[train_idx], y=self.y_train[train_idx])
-
-        train_loss = 1 - self.accuracy_scorer(model, self.X_train[train_idx], self.y_train[train_idx])
-        val_loss = 1 - self.accuracy_scorer(model, self.X_valid, self.y_valid)
+        if self.native_booster:
+            data = self._get_dmatrices(train_idx)
+            booster = self._train_booster(data, n_estimators=fidelity["n_estimators"], seed=self._get_booster_seed(rng),
+                                          **configuration)
+            train_loss = 1 - accuracy_score(self.y_train[train_idx],
+                                            self._predict(booster, data, 'train', fidelity["n_estimators"]))
+            val_loss = 1 - accuracy_score(self.y_valid, self._predict(booster, data, 'valid', fidelity["n_estimators"]))
+        else:
+            data = self._get_preprocessed_data(train_idx)
+
+            model = self._get_classifier(n_estimators=fidelity["n_estimators"], **configuration)
+            model.fit(X=data['train'], y=self.y_train[train_idx])
+
+            train_loss = 1 - self.accuracy_scorer(model, data['train'], self.y_train[train_idx])
+            val_loss = 1 - self.accuracy_scorer(model, data['valid'], self.y_valid)
         cost = time.time() - start
 
         return {'function_value': val_loss,
@@ -142,6 +209,7 @@ class XGBoostBenchmark(AbstractBenchmark):
     @AbstractBenchmark._configuration_as_dict
     @AbstractBenchmark._check_configuration
     @AbstractBenchmark._check_fidelity
+    @AbstractBenchmark._cache_result
     def objective_function_test(self, configuration: Union[Dict, CS.Configuration],
                                 fidelity: Union[Dict, None] = None, rng: Union[np.random.RandomState, int, None] = None,
                                 **kwargs) -> Dict:
@@ -178,20 +246,97 @@ class XGBoostBenchmark(AbstractBenchmark):
 
         start = time.time()
 
-        # Impute potential nan values with the feature-
-        data = np.concatenate((self.X_train, self.X_valid))
-        targets = np.concatenate((self.y_train, self.y_valid))
+        if self.native_booster:
+            data = self._get_dmatrices(train_idx=None)
+            booster = self._train_booster(data, n_estimators=fidelity['n_estimators'], seed=self._get_booster_seed(rng),
+                                          **configuration)
+            test_loss = 1 - accuracy_score(self.y_test, self._predict(booster, data, 'test', fidelity['n_estimators']))
+        else:
+            # Impute potential nan values with the feature-
+            data = self._get_preprocessed_data(train_idx=None)
+            targets = np.concatenate((self.y_train, self.y_valid))
 
-        model = self._get_pipeline(n_estimators=fidelity['n_estimators'], **configuration)
-        model.fit(X=data, y=targets)
+            model = self._get_classifier(n_estimators=fidelity['n_estimators'], **configuration)
+            model.fit(X=data['train'], y=targets)
 
-        test_loss = 1 - self.accuracy_scorer(model, self.X_test, self.y_test)
+            test_loss = 1 - self.accuracy_scorer(model, data['test'], self.y_test)
         cost = time.time() - start
 
         return {'function_value': test_loss,
                 'cost': cost,
                 'info': {'fidelity': fidelity}}
 
+    @AbstractBenchmark._configuration_as_dict
+    @AbstractBenchmark._check_configuration
+    @AbstractBenchmark._check_fidelity
+    def get_learning_curve(self, configuration: Union[Dict, CS.Configuration], fidelity: Union[Dict, None] = None,
+                           shuffle: bool = False, rng: Union[np.random.RandomState, int, None] = None,
+                           **kwargs) -> Dict:
+        """
+        Trains a XGBoost model once with the given number of trees (`n_estimators`) and evaluates it after each tree.
+        This yields the losses of all smaller `n_estimators` fidelities for the price of a single call of the objective
+        function with the largest one.
+
+        Parameters
+        ----------
+        configuration : Dict, CS.Configuration
+            Configuration for the XGBoost model
+        fidelity: Dict, None
+            Fidelity parameters for the XGBoost model, check get_fidelity_space(). Uses default (max) value if None.
+            `n_estimators` is the length of the learning curve.
+        shuffle : bool
+            If ``True``, shuffle the training idx. If no parameter ``rng`` is given, use the class random state.
+            Defaults to ``False``.
+        rng : np.random.RandomState, int, None,
+            Random seed for benchmark. By default the class level random seed.
+        kwargs
+
+        Returns
+        -------
+        Dict -
+            n_estimators : np.ndarray - 1, ..., n_estimators
+            function_value : np.ndarray - validation loss per number of trees. Same as the objective function with
+                this number of trees.
+            train_loss : np.ndarray - trainings loss per number of trees
+            cost : time to train the model and to evaluate all numbers of trees
+        """
+        self.rng = rng_helper.get_rng(rng=rng, self_rng=self.rng)
+
+        if shuffle:
+            self.shuffle_data(self.rng)
+
+        start = time.time()
+
+        train_idx = self.train_idx[:int(len(self.train_idx) * fidelity["subsample"])]
+        n_estimators = range(1, fidelity["n_estimators"] + 1)
+
+        # Staged predictions: Using the first trees of the model gives the same predictions as a model, which is
+        # trained with fewer trees.
+        if self.native_booster:
+            data = self._get_dmatrices(train_idx)
+            booster = self._train_booster(data, n_estimators=fidelity["n_estimators"], seed=self._get_booster_seed(rng),
+                                          **configuration)
+            train_loss = [1 - accuracy_score(self.y_train[train_idx], self._predict(booster, data, 'train', n_trees))
+                          for n_trees in n_estimators]
+            val_loss = [1 - accuracy_score(self.y_valid, self._predict(booster, data, 'valid', n_trees))
+                        for n_trees in n_estimators]
+        else:
+            data = self._get_preprocessed_data(train_idx)
+
+            model = self._get_classifier(n_estimators=fidelity["n_estimators"], **configuration)
+            model.fit(X=data['train'], y=self.y_train[train_idx])
+
+            train_loss = [1 - accuracy_score(self.y_train[train_idx], model.predict(data['train'], ntree_limit=n_trees))
+                          for n_trees in n_estimators]
+            val_loss = [1 - accuracy_score(self.y_valid, model.predict(data['valid'], ntree_limit=n_trees))
+                        for n_trees in n_estimators]
+        cost = time.time() - start
+
+        return {'n_estimators': np.array(n_estimators),
+                'function_value': np.array(val_loss),
+                'train_loss': np.array(train_loss),
+                'cost': cost}
+
     @staticmethod
     def get_configuration_space(seed: Union[int, None] = None) -> CS.ConfigurationSpace:
         """
@@ -253,12 +398,203 @@ class XGBoostBenchmark(AbstractBenchmark):
                 'references': [],
                 }
 
+    def _get_preprocessed_data(self, train_idx: Union[np.ndarray, None]) -> Dict[str, np.ndarray]:
+        """
+        Impute and one-hot encode the data. The preprocessing is fitted on the training data given by `train_idx`.
+        If `train_idx` is None, it is fitted on the whole training and validation data (see
+        `objective_function_test`).
+
+        The preprocessing does not depend on the configuration. Thus, the transformed data is kept in a LRU cache for
+        the last `preprocessing_cache_size` training sets. A training set is identified by its indices, i.e. by the
+        subsample and the current order of the shuffled training idx.
+
+        Returns
+        -------
+        Dict -
+            train : np.ndarray - transformed training data in the order of `train_idx`
+            valid : np.ndarray - transformed validation data (only if `train_idx` is given)
+            test : np.ndarray - transformed test data
+        """
+        def preprocess():
+            preprocessing = self._get_preprocessing_pipeline()
+            if train_idx is None:
+                data = {'train': preprocessing.fit_transform(np.concatenate((self.X_train, self.X_valid)))}
+            else:
+                data = {'train': preprocessing.fit_transform(self.X_train[train_idx]),
+                        'valid': preprocessing.transform(self.X_valid)}
+            data['test'] = preprocessing.transform(self.X_test)
+            return data
+
+        return self._get_cached_data('dense', train_idx, preprocess)
+
+    def _get_dmatrices(self, train_idx: Union[np.ndarray, None]) -> Dict:
+        """
+        Create the xgboost DMatrix objects for the native booster (see `native_booster`). The continuous features are
+        imputed with their mean on the training data. The categorical features are one-hot encoded as sparse
+        matrix. Thus, they are stored as float32 CSR matrix. The continuous values (also zeros) are stored explicitly,
+        only the inactive one-hot entries are missing. As for `_get_preprocessed_data`, the fit is done on the
+        training data given by `train_idx` or on the training and validation data if `train_idx` is None and the
+        result is cached.
+
+        Returns
+        -------
+        Dict -
+            train, valid, test : xgb.DMatrix - The training matrix contains the encoded labels.
+            classes : np.ndarray - The classes in the training data. The labels are their indices.
+            train_key : str - Identifies the training data.
+        """
+        def preprocess():
+            if train_idx is None:
+                X_fit = np.concatenate((self.X_train, self.X_valid))
+                y_fit = np.concatenate((self.y_train, self.y_valid))
+                others = {'test': self.X_test}
+            else:
+                X_fit = self.X_train[train_idx]
+                y_fit = self.y_train[train_idx]
+                others = {'valid': self.X_valid, 'test': self.X_test}
+
+            # Same as the SimpleImputer: Columns without any value are removed.
+            continuous = X_fit[:, ~self.categorical_data]
+            n_values = np.sum(~np.isnan(continuous), axis=0)
+            keep = n_values > 0
+            means = np.nansum(continuous[:, keep], axis=0) / n_values[keep]
+
+            classes = np.unique(y_fit)
+            data = {'train': xgb.DMatrix(self._encode_sparse(X_fit, means, keep), label=np.searchsorted(classes, y_fit),
+                                         nthread=self.n_threads),
+                    'classes': classes,
+                    'train_key': self._get_train_key(train_idx)}
+            for name, X in others.items():
+                data[name] = xgb.DMatrix(self._encode_sparse(X, means, keep), nthread=self.n_threads)
+            return data
+
+        return self._get_cached_data('native', train_idx, preprocess)
+
+    def _encode_sparse(self, X: np.ndarray, means: np.ndarray, keep: np.ndarray) -> sparse.csr_matrix:
+        """ One-hot encode the categorical and impute the continuous features. Same column order as the pipeline. """
+        categorical_columns = X[:, self.categorical_data]
+        continuous = X[:, ~self.categorical_data][:, keep]
+        continuous = np.where(np.isnan(continuous), means, continuous)
+
+        # The categories are sorted, since the value for NaN is smaller than all other values.
+        offsets = np.cumsum([0] + [len(categories) for categories in self.categories])
+        n_rows, n_categorical, n_continuous = len(X), len(self.categories), continuous.shape[1]
+        n_entries = n_categorical + n_continuous
+
+        # Each row has one entry per categorical feature (the active category) and per continuous feature.
+        indices = np.empty((n_rows, n_entries), dtype=np.int64)
+        values = np.empty((n_rows, n_entries), dtype=np.float32)
+        for i, (offset, categories) in enumerate(zip(offsets, self.categories)):
+            indices[:, i] = offset + np.searchsorted(categories, categorical_columns[:, i])
+        indices[:, n_categorical:] = offsets[-1] + np.arange(n_continuous)
+        values[:, :n_categorical] = 1
+        values[:, n_categorical:] = continuous
+
+        return sparse.csr_matrix((values.ravel(), indices.ravel(), np.arange(0, n_rows * n_entries + 1, n_entries)),
+                                 shape=(n_rows, offsets[-1] + n_continuous))
+
+    def _get_cached_data(self, kind: str, train_idx: Union[np.ndarray, None], create: Callable[[], Dict]) -> Dict:
+        """ Look up the preprocessed data of the training set in the LRU cache. Create it, if it is missing. """
+        key = (kind, self._get_train_key(train_idx))
+        if key in self._preprocessing_cache:
+            self._preprocessing_cache.move_to_end(key)
+            return self._preprocessing_cache[key]
+
+        data = create()
+        if self.preprocessing_cache_size > 0:
+            self._preprocessing_cache[key] = data
+            while len(self._preprocessing_cache) > self.preprocessing_cache_size:
+                self._preprocessing_cache.popitem(last=False)
+        return data
+
+    @staticmethod
+    def _get_train_key(train_idx: Union[np.ndarray, None]) -> str:
+        """ Identifies the training data by the training idx. None stands for training and validation data. """
+        return 'test' if train_idx is None else hashlib.sha256(train_idx.tobytes()).hexdigest()
+
+    def _train_booster(self, data: Dict, eta: float, min_child_weight: int, colsample_bytree: float,
+                       colsample_bylevel: float, reg_lambda: int, reg_alpha: int, n_estimators: int,
+                       seed: Union[int, None] = None) -> xgb.Booster:
+        """
+        Train a booster with the native interface. The parameters are taken from the scikit-learn wrapper (see
+        `_get_classifier`), so that the model is the same as in the pipeline.
+
+        If the booster cache is enabled (`booster_cache_size`), the booster may have more than `n_estimators` trees.
+        Use only the first `n_estimators` trees for predictions.
+        """
+        classifier = self._get_classifier(eta=eta, min_child_weight=min_child_weight,
+                                          colsample_bytree=colsample_bytree, colsample_bylevel=colsample_bylevel,
+                                          reg_lambda=reg_lambda, reg_alpha=reg_alpha, n_estimators=n_estimators,
+                                          seed=seed)
+        params = classifier.get_xgb_params()
+        for wrapper_parameter in ['n_estimators', 'missing', 'use_label_encoder', 'kwargs']:
+            params.pop(wrapper_parameter, None)
+
+        # As XGBClassifier.fit: Train on the probabilities in the multi-class case.
+        if len(data['classes']) > 2:
+            params['objective'] = 'multi:softprob'
+            params['num_class'] = len(data['classes'])
+
+        if self.booster_cache_size == 0:
+            return xgb.train(params, data['train'], num_boost_round=n_estimators)
+
+        # The random numbers of a boosting round depend only on the seed and the number of the round. Thus, continuing
+        # the training of a cached booster gives the same model as training it from scratch.
+        params['seed_per_iteration'] = True
+        key = ResultCache.get_key(train_key=data['train_key'], params=params)
+
+        if key in self._booster_cache:
+            self._booster_cache.move_to_end(key)
+            booster, n_rounds = self._booster_cache[key]
+        else:
+            booster, n_rounds = xgb.Booster(params, [data['train']]), 0
+
+        # Same as xgb.train
+        for iteration in range(n_rounds, n_estimators):
+            booster.update(data['train'], iteration)
+
+        self._booster_cache[key] = (booster, max(n_rounds, n_estimators))
+        while len(self._booster_cache) > self.booster_cache_size:
+            self._booster_cache.popitem(last=False)
+        return booster
+
+    def _get_booster_seed(self, rng: Union[np.random.RandomState, int, None]) -> int:
+        """
+        Seed of the booster of a call with the given `rng`. With the booster cache, calls without `rng` use the fixed
+        seed of the benchmark. Otherwise, each of them would draw a new seed and never hit the cache.
+        """
+        if rng is None and self._booster_seed is not None:
+            return self._booster_seed
+        return self.rng.randint(1, 100000)
+
+    @staticmethod
+    def _predict(booster: xgb.Booster, data: Dict, name: str, ntree_limit: int = 0) -> np.ndarray:
+        """
+        Predict the classes of the data set `name`. Uses the first `ntree_limit` trees (all if 0). As 'multi:softmax',
+        the class with the largest margin is predicted in the multi-class case. The probabilities may be rounded to
+        ties, if the learning rate is small.
+        """
+        if len(data['classes']) > 2:
+            margins = booster.predict(data[name], output_margin=True, ntree_limit=ntree_limit)
+            labels = np.argmax(margins, axis=1)
+        else:
+            labels = (booster.predict(data[name], ntree_limit=ntree_limit) > 0.5).astype(int)
+        return data['classes'][labels]
+
     def _get_pipeline(self, eta: float, min_child_weight: int, colsample_bytree: float, colsample_bylevel: float,
                       reg_lambda: int, reg_alpha: int, n_estimators: int) -> pipeline.Pipeline:
         """ Create the scikit-learn (training-)pipeline """
-        objective = 'binary:logistic' if self.num_class <= 2 else 'multi:softmax'
+        clf = pipeline.Pipeline(self._get_preprocessing_pipeline().steps + [
+            ('xgb', self._get_classifier(eta=eta, min_child_weight=min_child_weight,
+                                         colsample_bytree=colsample_bytree, colsample_bylevel=colsample_bylevel,
+                                         reg_lambda=reg_lambda, reg_alpha=reg_alpha, n_estimators=n_estimators))
+        ])
+        return clf
 
-        clf = pipeline.Pipeline([
+    def _get_preprocessing_pipeline(self) -> pipeline.Pipeline:
+        """ Create the preprocessing part of the pipeline: Impute the continuous and one-hot encode the categorical
+        features. """
+        return pipeline.Pipeline([
             ('preprocess_impute',
              ColumnTransformer([
                 ("categorical", "passthrough", self.categorical_data),
@@ -266,19 +602,26 @@ class XGBoostBenchmark(AbstractBenchmark):
             ('preprocess_one_hot',
              ColumnTransformer([
                  ("categorical", OneHotEncoder(categories=self.categories, sparse=False), self.categorical_data),
-                 ("continuous", "passthrough", ~self.categorical_data)])),
-            ('xgb',
-             xgb.XGBClassifier(
-                 learning_rate=eta,
-                 min_child_weight=min_child_weight,
-                 colsample_bytree=colsample_bytree,
-                 colsample_bylevel=colsample_bylevel,
-                 reg_alpha=reg_alpha,
-                 reg_lambda=reg_lambda,
-                 n_estimators=n_estimators,
-                 objective=objective,
-                 n_jobs=self.n_threads,
-                 random_state=self.rng.randint(1, 100000),
-                 num_class=self.num_class))
-             ])
-        return clf
+                 ("continuous", "passthrough", ~self.categorical_data)]))
+        ])
+
+    def _get_classifier(self, eta: float, min_child_weight: int, colsample_bytree: float, colsample_bylevel: float,
+                        reg_lambda: int, reg_alpha: int, n_estimators: int,
+                        seed: Union[int, None] = None) -> xgb.XGBClassifier:
+        """
+        Create the XGBoost model, which is trained on the preprocessed data. If `seed` is None, it is drawn from the
+        random state of the benchmark.
+        """
+        objective = 'binary:logistic' if self.num_class <= 2 else 'multi:softmax'
+
+        return xgb.XGBClassifier(learning_rate=eta,
+                                 min_child_weight=min_child_weight,
+                                 colsample_bytree=colsample_bytree,
+                                 colsample_bylevel=colsample_bylevel,
+                                 reg_alpha=reg_alpha,
+                                 reg_lambda=reg_lambda,
+                                 n_estimators=n_estimators,
+                                 objective=objective,
+                                 n_jobs=self.n_threads,
+                                 random_state=seed if seed is not None else self.rng.randint(1, 100000),
+                                 num_class=self.num_class)
@@ -23,9 +23,6 @@ optimization.
 ```
 cd /path/to/HPOlib2
 pip install .[nasbench_101]
-
-pip install git+https://github.com/google-research/nasbench.git@master
-pip install git+https://github.com/automl/nas_benchmarks.git@master
 ```
 
 Notes:
@@ -33,49 +30,72 @@ Notes:
 Benchmarks in NASBench101 only contain epochs 4, 12, 36 and 108.
 Querying another epoch, e.g. 5, raises an assertion.
 
+Neither TensorFlow nor the nasbench package is required. On the first use, the tfrecord file is converted once to
+numpy arrays in the hpolib data directory (see `hpolib.util.data_manager.NASBench_101Data`). This takes a few minutes.
+Afterwards, the arrays are memory-mapped and a query is a lookup of the graph hash of the cell.
+
 """
 
 from pathlib import Path
-from typing import Union, Dict, Any
+from typing import Union, Dict, List, Iterator, Tuple
 
 import ConfigSpace as CS
 import numpy as np
-from tabular_benchmarks.nas_cifar10 import NASCifar10
 
 import hpolib.util.rng_helper as rng_helper
 from hpolib.abstract_benchmark import AbstractBenchmark
+from hpolib.util.data_manager import NASBench_101Data
+from hpolib.util.table_utils import TableWriter
 
 __version__ = '0.0.1'
 
-MAX_EDGES = 9
-VERTICES = 7
+MAX_EDGES = NASBench_101Data.MAX_EDGES
+VERTICES = NASBench_101Data.VERTICES
+N_EDGES = VERTICES * (VERTICES - 1) // 2
+# Each model in NASBench101 was trained three times per budget.
+N_RUNS = NASBench_101Data.N_RUNS
+INPUT = NASBench_101Data.INPUT
+OUTPUT = NASBench_101Data.OUTPUT
+CONV1X1 = 'conv1x1-bn-relu'
+CONV3X3 = 'conv3x3-bn-relu'
+MAXPOOL3X3 = 'maxpool3x3'
 
 
 class NASCifar10BaseBenchmark(AbstractBenchmark):
-    def __init__(self, benchmark: NASCifar10, data_path: Union[Path, str, None] = "./",
-                 rng: Union[np.random.RandomState, int, None] = None, **kwargs):
+    # The constructor only loads the tabular data. The random state is used in the objective functions.
+    _rng_independent_data = True
+    _instance_attributes = AbstractBenchmark._instance_attributes + ('_oracle',)
+
+    def __init__(self, data_path: Union[Path, str, None] = "./",
+                 rng: Union[np.random.RandomState, int, None] = None, validate: str = 'full', **kwargs):
         """
         Baseclass for the tabular benchmarks https://github.com/automl/nas_benchmarks/tree/master/tabular_benchmarks.
-        Please install the benchmark first. Place the data under ``data_path``.
+        Don't call this class directly. Instantiate via subclasses (see below). They differ in the encoding of the
+        cell. Place the data (nasbench_full.tfrecord) under ``data_path``.
 
         Parameters
         ----------
-        benchmark : NASCifar10
-            Type of the benchmark to use. Don't call this class directly. Instantiate via subclasses (see below).
         data_path : str, Path, None
-            Path to the folder, which contains the downloaded tabular benchmarks.
+            Path to the folder, which contains the nasbench_full.tfrecord.
         rng : np.random.RandomState, int, None
             Random seed for the benchmarks
+        validate : str
+            One of 'full', 'fast', 'off'. See :py:class:`~hpolib.abstract_benchmark.AbstractBenchmark`.
         """
 
-        super(NASCifar10BaseBenchmark, self).__init__(rng=rng)
+        super(NASCifar10BaseBenchmark, self).__init__(rng=rng, validate=validate)
 
-        self.benchmark = benchmark
         self.data_path = data_path
+        self.data_manager = NASBench_101Data(data_path=data_path)
+        self.data = self.data_manager.load()
+        self.budgets = NASBench_101Data.get_budgets()
+        self._oracle = None
 
     @AbstractBenchmark._configuration_as_dict
     @AbstractBenchmark._check_configuration
     @AbstractBenchmark._check_fidelity
+    @AbstractBenchmark._record_trajectory
+    @AbstractBenchmark._cache_result
     def objective_function(self, configuration: Union[CS.Configuration, Dict],
                            fidelity: Union[Dict, None] = None,
                            rng: Union[np.random.RandomState, int, None] = None,
@@ -104,22 +124,69 @@ class NASCifar10BaseBenchmark(AbstractBenchmark):
             info : Dict
                 fidelity : used fidelities in this evaluation
         """
-        self.benchmark.reset_tracker()
-
         self.rng = rng_helper.get_rng(rng, self_rng=self.rng)
 
-        # Returns (valid_error_rate: 1, runtime: 0) if it is invalid, e.g. config not valid or
-        # budget not in 4 12 36 108
-        valid_error_rate, runtime = self.benchmark.objective_function(config=configuration,
-                                                                      budget=fidelity["budget"])
+        # Returns (valid_error_rate: 1, runtime: 0) if the configuration is not a valid model
+        valid_error_rate, runtime = self._query(configuration, budget=fidelity["budget"])
         return {'function_value': float(valid_error_rate),
                 'cost': float(runtime),
                 'info': {'fidelity': fidelity}
                 }
 
+    def objective_function_batch(self, configurations: List[Union[CS.Configuration, Dict]],
+                                 fidelities: Union[List[Dict], Dict, None] = None,
+                                 rng: Union[np.random.RandomState, int, None] = None,
+                                 **kwargs) -> Dict:
+        """
+        Query the NAS-benchmark for a batch of configurations. Each configuration and fidelity is checked as in
+        `objective_function` (see `_check_batch`) and the results are returned column-wise.
+
+        Parameters
+        ----------
+        configurations : List[Dict, CS.Configuration]
+        fidelities : List[Dict], Dict, None
+            Either one fidelity per configuration or a single fidelity for all configurations.
+            Uses default (max) value if None.
+        rng : np.random.RandomState, int, None
+            Random seed to use in the benchmark.
+        kwargs
+
+        Returns
+        -------
+        Dict -
+            function_value : np.ndarray - validation error per configuration
+            cost : np.ndarray - runtime per configuration
+            info : Dict
+                fidelity : List[Dict]
+        """
+        configurations, fidelities = self._check_batch(configurations, fidelities)
+
+        self.rng = rng_helper.get_rng(rng, self_rng=self.rng)
+
+        # Invalid configurations have a validation error of 1 and a runtime of 0.
+        indices = np.array([self._get_model_index(configuration) for configuration in configurations], dtype=int)
+        budget_indices = np.array([self.budgets.index(fidelity['budget']) for fidelity in fidelities], dtype=int)
+        run_indices = self.rng.randint(N_RUNS, size=len(configurations))
+
+        valid = indices >= 0
+        function_values = np.ones(len(configurations))
+        costs = np.zeros(len(configurations))
+        function_values[valid] = \
+            1 - self.data['validation_accuracy'][indices[valid], budget_indices[valid], run_indices[valid]]
+        costs[valid] = self.data['training_time'][indices[valid], budget_indices[valid], run_indices[valid]]
+
+        if self.trajectory is not None:
+            self.trajectory.record_batch(configurations, fidelities, function_values, costs)
+
+        return {'function_value': function_values,
+                'cost': costs,
+                'info': {'fidelity': fidelities}
+                }
+
     @AbstractBenchmark._configuration_as_dict
     @AbstractBenchmark._check_configuration
     @AbstractBenchmark._check_fidelity
+    @AbstractBenchmark._cache_result
     def objective_function_test(self, configuration: Union[Dict, CS.Configuration],
                                 fidelity: Union[Dict, None] = None,
                                 rng: Union[np.random.RandomState, int, None] = None,
@@ -149,6 +216,128 @@ class NASCifar10BaseBenchmark(AbstractBenchmark):
         return self.objective_function(configuration=configuration, fidelity=fidelity, rng=rng,
                                        **kwargs)
 
+    def _query(self, configuration: Dict, budget: int) -> Tuple[float, float]:
+        """
+        Look up the validation error and the training time of a configuration. One of the runs of the model is drawn
+        with the random state of this benchmark.
+
+        Returns
+        -------
+        Tuple[float, float] - validation error, training time. (1, 0) if the configuration is not a valid model.
+        """
+        index = self._get_model_index(configuration)
+        if index < 0:
+            return 1, 0
+
+        budget_index = self.budgets.index(budget)
+        run = self.rng.randint(N_RUNS)
+        return 1 - float(self.data['validation_accuracy'][index, budget_index, run]), \
+            float(self.data['training_time'][index, budget_index, run])
+
+    def _get_model_index(self, configuration: Dict) -> int:
+        """ Position of the model in the arrays. -1 if the configuration is not a valid model. """
+        graph = self._get_matrix_and_ops(configuration)
+        if graph is None:
+            return -1
+        return self.data_manager.get_model_index(*graph)
+
+    @staticmethod
+    def _get_matrix_and_ops(configuration: Dict) -> Union[Tuple[np.ndarray, List[str]], None]:
+        """
+        Convert a configuration to the adjacency matrix and the operations of a cell. Returns None, if the cell has
+        too many edges. Implemented by the subclasses, following the encodings of
+        https://github.com/automl/nas_benchmarks/blob/master/tabular_benchmarks/nas_cifar10.py
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _get_ops(configuration: Dict) -> List[str]:
+        return [INPUT] + [configuration[f'op_node_{i}'] for i in range(VERTICES - 2)] + [OUTPUT]
+
+    def export_table(self, path: Union[Path, str], table_format: Union[str, None] = None,
+                     chunk_size: int = 10000) -> Path:
+        """
+        Export the whole table of NASBench101 as columnar file with one row per model, budget and run.
+
+        The configurations of the benchmarks A, B and C are mapped to the models of NASBench101, but this mapping is
+        not invertible. Therefore, the models are identified by their hash (see `NASBench_101Data.hash_module`).
+
+        Columns:
+            module_hash : The hash of the model. Stored as codes.
+            budget : int
+            run_index : int
+            validation_error : float
+            test_error : float
+            training_time : float
+
+        Parameters
+        ----------
+        path : Path, str
+            Path of the table. The suffix determines the format (.npz, .parquet, .arrow), if it is not given.
+        table_format : str, None
+            One of 'npz', 'parquet', 'arrow'. See :py:mod:`~hpolib.util.table_utils`.
+        chunk_size : int
+            Number of models, which are written at once.
+
+        Returns
+        -------
+        Path
+        """
+        module_hashes = self.data_manager.get_module_hashes()
+
+        metadata = {'benchmark': self.__class__.__name__, 'version': __version__}
+        with TableWriter(path, table_format, categories={'module_hash': module_hashes}, metadata=metadata) as writer:
+            for start, budgets, validation_error, test_error, training_time in self._iter_table(chunk_size):
+                n_models, n_budgets, n_runs = validation_error.shape
+                module_index = np.arange(start, start + n_models, dtype=np.int32)
+
+                writer.write({'module_hash': np.repeat(module_index, n_budgets * n_runs),
+                              'budget': np.tile(np.repeat(budgets, n_runs), n_models).astype(np.int16),
+                              'run_index': np.tile(np.arange(n_runs), n_models * n_budgets).astype(np.int8),
+                              'validation_error': validation_error.reshape(-1),
+                              'test_error': test_error.reshape(-1),
+                              'training_time': training_time.reshape(-1)})
+        return Path(path)
+
+    def get_oracle(self) -> Dict:
+        """
+        Return the best function value per budget over all models. The objective function returns the result of one
+        of the three runs of a model at random. Therefore, the function value of a model is its mean validation error
+        over the runs. The oracle is computed once and kept for further calls.
+
+        Returns
+        -------
+        Dict -
+            budget : np.ndarray - All budgets
+            function_value : np.ndarray - Best mean validation error per budget
+            cost : np.ndarray - Mean training time of the best model per budget
+            module_hash : List[str] - Hash of the best model per budget
+        """
+        if self._oracle is None:
+            function_values = 1 - np.nanmean(self.data['validation_accuracy'], axis=2)
+            costs = np.nanmean(self.data['training_time'], axis=2)
+
+            best = np.nanargmin(function_values, axis=0)
+            budget_index = np.arange(len(self.budgets))
+            module_hashes = self.data_manager.get_module_hashes()
+
+            self._oracle = {'budget': np.array(self.budgets),
+                            'function_value': function_values[best, budget_index],
+                            'cost': costs[best, budget_index],
+                            'module_hash': [module_hashes[i] for i in best]}
+        return self._oracle
+
+    def _iter_table(self, chunk_size: int = 10000) \
+            -> Iterator[Tuple[int, List[int], np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Iterate over the models in chunks. Yields the position of the chunk, the budgets and the validation error,
+        test error and training time with shape [model, budget, run]. Missing runs are NaN.
+        """
+        for start in range(0, len(self.data['module_hash']), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            yield start, self.budgets, 1 - self.data['validation_accuracy'][chunk], \
+                1 - self.data['test_accuracy'][chunk], np.asarray(self.data['training_time'][chunk])
+
     @staticmethod
     def get_configuration_space(seed: Union[int, None] = None) -> CS.ConfigurationSpace:
         raise NotImplementedError
@@ -164,11 +353,17 @@ class NASCifar10BaseBenchmark(AbstractBenchmark):
                 }
 
     @staticmethod
-    def _get_configuration_space(benchmark: Any, seed: Union[int, None] = None) -> CS.ConfigurationSpace:
-        """ Helper function to pass a seed to the configuration space """
+    def _get_configuration_space(edge_hyperparameters: List[CS.hyperparameters.Hyperparameter],
+                                 seed: Union[int, None] = None) -> CS.ConfigurationSpace:
+        """
+        Helper function to create the configuration space of a subclass. The operations of the five intermediate
+        nodes are the same for all encodings.
+        """
         seed = seed if seed is not None else np.random.randint(1, 100000)
-        cs = benchmark.get_configuration_space()
-        cs.seed(seed)
+        cs = CS.ConfigurationSpace(seed=seed)
+        cs.add_hyperparameters([CS.CategoricalHyperparameter(f'op_node_{i}', [CONV3X3, CONV1X1, MAXPOOL3X3])
+                                for i in range(VERTICES - 2)])
+        cs.add_hyperparameters(edge_hyperparameters)
         return cs
 
     @staticmethod
@@ -199,9 +394,7 @@ class NASCifar10BaseBenchmark(AbstractBenchmark):
 class NASCifar10ABenchmark(NASCifar10BaseBenchmark):
     def __init__(self, data_path: Union[Path, str, None] = './fcnet_tabular_benchmarks/',
                  rng: Union[np.random.RandomState, int, None] = None, **kwargs):
-        from tabular_benchmarks.nas_cifar10 import NASCifar10A
-        benchmark = NASCifar10A(data_dir=str(data_path), multi_fidelity=True)
-        super(NASCifar10ABenchmark, self).__init__(benchmark=benchmark, data_path=data_path, rng=rng, **kwargs)
+        super(NASCifar10ABenchmark, self).__init__(data_path=data_path, rng=rng, **kwargs)
 
     @staticmethod
     def get_configuration_space(seed: Union[int, None] = None) -> CS.ConfigurationSpace:
@@ -216,17 +409,23 @@ class NASCifar10ABenchmark(NASCifar10BaseBenchmark):
         -------
             CS.ConfigurationSpace - Containing the benchmark's hyperparameter
         """
+        return NASCifar10ABenchmark._get_configuration_space(
+            [CS.CategoricalHyperparameter(f'edge_{i}', [0, 1]) for i in range(N_EDGES)], seed)
 
-        from tabular_benchmarks.nas_cifar10 import NASCifar10A
-        return NASCifar10BBenchmark._get_configuration_space(NASCifar10A, seed)
+    @staticmethod
+    def _get_matrix_and_ops(configuration: Dict) -> Union[Tuple[np.ndarray, List[str]], None]:
+        """ Each edge of the upper triangular adjacency matrix is a binary hyperparameter. """
+        matrix = np.zeros([VERTICES, VERTICES], dtype=np.int8)
+        matrix[np.triu_indices(VERTICES, k=1)] = [configuration[f'edge_{i}'] for i in range(N_EDGES)]
+        if matrix.sum() > MAX_EDGES:
+            return None
+        return matrix, NASCifar10ABenchmark._get_ops(configuration)
 
 
 class NASCifar10BBenchmark(NASCifar10BaseBenchmark):
     def __init__(self, data_path: Union[Path, str, None] = './fcnet_tabular_benchmarks/',
                  rng: Union[np.random.RandomState, int, None] = None, **kwargs):
-        from tabular_benchmarks.nas_cifar10 import NASCifar10B
-        benchmark = NASCifar10B(data_dir=str(data_path), multi_fidelity=True)
-        super(NASCifar10BBenchmark, self).__init__(benchmark=benchmark, data_path=data_path, rng=rng, **kwargs)
+        super(NASCifar10BBenchmark, self).__init__(data_path=data_path, rng=rng, **kwargs)
 
     @staticmethod
     def get_configuration_space(seed: Union[int, None] = None) -> CS.ConfigurationSpace:
@@ -241,17 +440,31 @@ class NASCifar10BBenchmark(NASCifar10BaseBenchmark):
         -------
             CS.ConfigurationSpace - Containing the benchmark's hyperparameter
         """
+        return NASCifar10BBenchmark._get_configuration_space(
+            [CS.CategoricalHyperparameter(f'edge_{i}', list(range(N_EDGES))) for i in range(MAX_EDGES)], seed)
+
+    @staticmethod
+    def _get_matrix_and_ops(configuration: Dict) -> Union[Tuple[np.ndarray, List[str]], None]:
+        """
+        The hyperparameters are the indices of the edges, which are present. Edges are numbered in the order of the
+        bit encoding of nasbench (see `nasbench.lib.graph_util.gen_is_edge_fn`).
+        """
+        bits = np.zeros(N_EDGES, dtype=np.int8)
+        bits[[configuration[f'edge_{i}'] for i in range(MAX_EDGES)]] = 1
 
-        from tabular_benchmarks.nas_cifar10 import NASCifar10B
-        return NASCifar10BBenchmark._get_configuration_space(NASCifar10B, seed)
+        # The first edge is the most significant bit. Bit x + y * (y - 1) / 2 encodes the edge x -> y.
+        matrix = np.zeros([VERTICES, VERTICES], dtype=np.int8)
+        rows, cols = np.triu_indices(VERTICES, k=1)
+        matrix[rows, cols] = bits[N_EDGES - 1 - (rows + cols * (cols - 1) // 2)]
+        if matrix.sum() > MAX_EDGES:
+            return None
+        return matrix, NASCifar10BBenchmark._get_ops(configuration)
 
 
 class NASCifar10CBenchmark(NASCifar10BaseBenchmark):
     def __init__(self, data_path: Union[Path, str, None] = './fcnet_tabular_benchmarks/',
                  rng: Union[np.random.RandomState, int, None] = None, **kwargs):
-        from tabular_benchmarks.nas_cifar10 import NASCifar10C
-        benchmark = NASCifar10C(data_dir=str(data_path), multi_fidelity=True)
-        super(NASCifar10CBenchmark, self).__init__(benchmark=benchmark, data_path=data_path, rng=rng, **kwargs)
+        super(NASCifar10CBenchmark, self).__init__(data_path=data_path, rng=rng, **kwargs)
 
     @staticmethod
     def get_configuration_space(seed: Union[int, None] = None) -> CS.ConfigurationSpace:
@@ -266,6 +479,19 @@ class NASCifar10CBenchmark(NASCifar10BaseBenchmark):
         -------
             CS.ConfigurationSpace - Containing the benchmark's hyperparameter
         """
+        return NASCifar10CBenchmark._get_configuration_space(
+            [CS.UniformFloatHyperparameter(f'edge_{i}', 0, 1) for i in range(N_EDGES)]
+            + [CS.UniformIntegerHyperparameter('num_edges', 0, MAX_EDGES)], seed)
 
-        from tabular_benchmarks.nas_cifar10 import NASCifar10C
-        return NASCifar10BBenchmark._get_configuration_space(NASCifar10C, seed)
+    @staticmethod
+    def _get_matrix_and_ops(configuration: Dict) -> Union[Tuple[np.ndarray, List[str]], None]:
+        """ The `num_edges` edges with the highest values are present. """
+        edge_values = [configuration[f'edge_{i}'] for i in range(N_EDGES)]
+        edges = np.zeros(N_EDGES, dtype=np.int8)
+        edges[np.argsort(edge_values)[::-1][:int(configuration['num_edges'])]] = 1
+
+        matrix = np.zeros([VERTICES, VERTICES], dtype=np.int8)
+        matrix[np.triu_indices(VERTICES, k=1)] = edges
+        if matrix.sum() > MAX_EDGES:
+            return None
+        return matrix, NASCifar10CBenchmark._get_ops(configuration)
@@ -26,6 +26,7 @@ For more info about the nasbench201, please have a look at
 https://github.com/D-X-Y/AutoDL-Projects/blob/master/docs/NAS-Bench-201.md
 """
 import logging
+from pathlib import Path
 from typing import Union, Dict, List, Text, Tuple
 from copy import deepcopy
 
@@ -34,7 +35,8 @@ import numpy as np
 
 import hpolib.util.rng_helper as rng_helper
 from hpolib.abstract_benchmark import AbstractBenchmark
-from hpolib.util.data_manager import NASBench_201Data
+from hpolib.util.data_manager import NASBench_201Data, NASBench_201ArchitectureIndex
+from hpolib.util.table_utils import TableWriter
 
 __version__ = '0.0.1'
 MAX_NODES = 4
@@ -43,8 +45,13 @@ logger = logging.getLogger('NASBENCH201')
 
 
 class NasBench201BaseBenchmark(AbstractBenchmark):
+    # The results are looked up in a table. They don't depend on the random state.
+    _deterministic = True
+    _rng_independent_data = True
+    _instance_attributes = AbstractBenchmark._instance_attributes + ('_oracles',)
+
     def __init__(self, dataset: str,
-                 rng: Union[np.random.RandomState, int, None] = None, **kwargs):
+                 rng: Union[np.random.RandomState, int, None] = None, validate: str = 'full', **kwargs):
         """
         Benchmark interface to the NASBench201 Benchmarks. The NASBench201 contains
         results for architectures on 4 different data sets.
@@ -106,19 +113,28 @@ class NasBench201BaseBenchmark(AbstractBenchmark):
             One of cifar10-valid, cifar10, cifar100, ImageNet16-120.
         rng : np.random.RandomState, int, None
             Random seed for the benchmark's random state.
+        validate : str
+            One of 'full', 'fast', 'off'. See :py:class:`~hpolib.abstract_benchmark.AbstractBenchmark`.
         """
 
-        super(NasBench201BaseBenchmark, self).__init__(rng=rng)
+        super(NasBench201BaseBenchmark, self).__init__(rng=rng, validate=validate)
 
         data_manager = NASBench_201Data(dataset=dataset)
 
-        self.data = data_manager.load()
+        # Dense arrays per metric with shape [architecture, seed, epoch]. See NASBench_201Data.load_arrays
+        self.data = data_manager.load_arrays()
+        self.seeds = NASBench_201Data.get_seeds()
+        self.operations = {op: i for i, op in enumerate(NASBench_201Data.get_operations())}
+        # Maps configurations, arch strings and the indices into the data arrays. See NASBench_201ArchitectureIndex
+        self.architecture_index = NASBench_201ArchitectureIndex()
+        self._oracles = {}
 
         self.config_to_structure = NasBench201BaseBenchmark.config_to_structure_func(max_nodes=MAX_NODES)
 
     @AbstractBenchmark._configuration_as_dict
     @AbstractBenchmark._check_configuration
     @AbstractBenchmark._check_fidelity
+    @AbstractBenchmark._cache_result
     def objective_function(self, configuration: Union[CS.Configuration, Dict],
                            fidelity: Union[Dict, None] = None,
                            rng: Union[np.random.RandomState, int, None] = None,
@@ -194,33 +210,22 @@ class NasBench201BaseBenchmark(AbstractBenchmark):
                     used fidelities in this evaluation
         """
 
-        # Check if the data set seeds are valid
-        assert isinstance(data_seed, List) or isinstance(data_seed, Tuple) or isinstance(data_seed, int), \
-            f'data seed has unknown data type {type(data_seed)}, but should be tuple or int (777,888,999)'
-
-        if isinstance(data_seed, List):
-            data_seed = tuple(data_seed)
-
-        if isinstance(data_seed, int):
-            data_seed = (data_seed, )
-
-        assert len(set(data_seed) - {777, 888, 999}) == 0,\
-            f'data seed can only contain the elements 777, 888, 999, but was {data_seed}'
+        data_seed = self._check_data_seed(data_seed)
 
         self.rng = rng_helper.get_rng(rng)
 
-        structure = self.config_to_structure(configuration)
-        structure_str = structure.tostr()
+        arch_index = self._config_to_arch_index(configuration)
+        seed_index = [self.seeds.index(seed) for seed in data_seed]
 
         epoch = fidelity['epoch']
 
-        train_accuracies = [self.data[(seed, 'train_acc1es')][structure_str][epoch] for seed in data_seed]
-        train_losses = [self.data[(seed, 'train_losses')][structure_str][epoch] for seed in data_seed]
-        train_times = [np.sum(self.data[(seed, 'train_times')][structure_str][:epoch + 1]) for seed in data_seed]
+        train_accuracies = self.data['train_acc1es'][arch_index, seed_index, epoch]
+        train_losses = self.data['train_losses'][arch_index, seed_index, epoch]
+        train_times = self.data['train_times'][arch_index, seed_index, epoch]
 
-        eval_accuracies = [self.data[(seed, 'eval_acc1es')][structure_str][epoch] for seed in data_seed]
-        eval_losses = [self.data[(seed, 'eval_losses')][structure_str][epoch] for seed in data_seed]
-        eval_times = [np.sum(self.data[(seed, 'eval_times')][structure_str][:epoch + 1]) for seed in data_seed]
+        eval_accuracies = self.data['eval_acc1es'][arch_index, seed_index, epoch]
+        eval_losses = self.data['eval_losses'][arch_index, seed_index, epoch]
+        eval_times = self.data['eval_times'][arch_index, seed_index, epoch]
 
         return {'function_value': float(100 - np.mean(train_accuracies)),
                 'cost': float(np.sum(train_times)),
@@ -234,8 +239,71 @@ class NasBench201BaseBenchmark(AbstractBenchmark):
                          }
                 }
 
+    def objective_function_batch(self, configurations: List[Union[CS.Configuration, Dict]],
+                                 fidelities: Union[List[Dict], Dict, None] = None,
+                                 rng: Union[np.random.RandomState, int, None] = None,
+                                 data_seed: Union[List, Tuple, int, None] = (777, 888, 999),
+                                 **kwargs) -> Dict:
+        """
+        Query the NASBench201 for a batch of configurations at once. Each configuration and fidelity is checked as in
+        `objective_function` (see `_check_batch`), but the results are looked up in one pass and returned column-wise.
+
+        See also :py:meth:`~hpolib.benchmarks.nas.nasbench_201.objective_function`
+
+        Parameters
+        ----------
+        configurations : List[CS.Configuration, Dict]
+        fidelities : List[Dict], Dict, None
+            Either one fidelity per configuration or a single fidelity for all configurations.
+            Uses default (max) value if None.
+        rng : np.random.RandomState, int, None
+            Random seed to use in the benchmark.
+        data_seed : List, Tuple, None, int
+            The data set seeds to average over. See `objective_function`.
+        kwargs
+
+        Returns
+        -------
+        Dict -
+            function_value : np.ndarray - training precision per configuration
+            cost : np.ndarray - time to train the networks
+            info : Dict
+                train_precision, train_losses, train_cost, eval_precision, eval_losses, eval_cost : np.ndarray
+                fidelity : List[Dict]
+        """
+        configurations, fidelities = self._check_batch(configurations, fidelities)
+        data_seed = self._check_data_seed(data_seed)
+
+        self.rng = rng_helper.get_rng(rng)
+
+        arch_index = np.array([self._config_to_arch_index(configuration) for configuration in configurations],
+                              dtype=np.int64)
+        seed_index = np.array([self.seeds.index(seed) for seed in data_seed], dtype=np.int64)
+        epochs = np.array([fidelity['epoch'] for fidelity in fidelities], dtype=np.int64)
+
+        def _lookup(metric):
+            # Shape: [configurations, seeds]
+            return self.data[metric][arch_index[:, None], seed_index[None, :], epochs[:, None]].astype(float)
+
+        train_precision = 100 - _lookup('train_acc1es').mean(axis=1)
+        train_cost = _lookup('train_times').sum(axis=1)
+        eval_cost = train_cost + _lookup('eval_times').sum(axis=1)
+
+        return {'function_value': train_precision,
+                'cost': train_cost,
+                'info': {'train_precision': train_precision,
+                         'train_losses': _lookup('train_losses').mean(axis=1),
+                         'train_cost': train_cost,
+                         'eval_precision': 100 - _lookup('eval_acc1es').mean(axis=1),
+                         'eval_losses': _lookup('eval_losses').mean(axis=1),
+                         'eval_cost': eval_cost,
+                         'fidelity': fidelities
+                         }
+                }
+
     @AbstractBenchmark._configuration_as_dict
     @AbstractBenchmark._check_configuration
+    @AbstractBenchmark._cache_result
     def objective_function_test(self, configuration: Union[CS.Configuration, Dict],
                                 fidelity: Union[Dict, None] = None,
                                 rng: Union[np.random.RandomState, int, None] = None,
@@ -287,6 +355,200 @@ class NasBench201BaseBenchmark(AbstractBenchmark):
         result['cost'] = result['info']['eval_cost']
         return result
 
+    @AbstractBenchmark._configuration_as_dict
+    @AbstractBenchmark._check_configuration
+    def get_learning_curve(self, configuration: Union[CS.Configuration, Dict],
+                           data_seed: Union[List, Tuple, int, None] = (777, 888, 999),
+                           metrics: Union[List[str], None] = None,
+                           epochs: Union[slice, List[int], None] = None,
+                           **kwargs) -> Dict[str, np.ndarray]:
+        """
+        Return the whole learning curves of an architecture with a single call, instead of calling the objective
+        function once per epoch. The values are read directly from the data (see NASBench_201Data.load_arrays).
+
+        Parameters
+        ----------
+        configuration : CS.Configuration, Dict
+        data_seed : List, Tuple, None, int
+            The data set seeds (777, 888, 999). Each seed is a row of the returned arrays.
+        metrics : List[str], None
+            Subset of 'train_acc1es', 'train_losses', 'train_times', 'eval_acc1es', 'eval_times', 'eval_losses'.
+            Defaults to all metrics.
+        epochs : slice, List[int], None
+            The epochs (0 indexed) to return. Defaults to all 200 epochs. They are checked against the fidelity
+            `epoch`, as in the objective function.
+        kwargs
+
+        Returns
+        -------
+        Dict[str, np.ndarray]
+            Array of shape [seed, epoch] per metric. The accuracies are in percent. 'train_times' and 'eval_times'
+            are the cumulative costs up to the epoch, as the `train_cost` of the objective function.
+        """
+        data_seed = self._check_data_seed(data_seed)
+        metrics = metrics if metrics is not None else NASBench_201Data.get_metrics()
+        unknown_metrics = set(metrics) - set(self.data.keys())
+        assert len(unknown_metrics) == 0, f'Unknown metrics {unknown_metrics}. Choose from {list(self.data.keys())}'
+
+        epochs = self._check_epochs(epochs)
+        arch_index = self._config_to_arch_index(configuration)
+        seed_index = [self.seeds.index(seed) for seed in data_seed]
+
+        return {metric: self.data[metric][arch_index][seed_index][:, epochs].astype(float) for metric in metrics}
+
+    def export_table(self, path: Union[Path, str], table_format: Union[str, None] = None,
+                     data_seed: Union[List, Tuple, int, None] = (777, 888, 999), chunk_size: int = 1000) -> Path:
+        """
+        Export the whole table of the benchmark as columnar file with one row per architecture, data seed and epoch.
+
+        Columns:
+            arch_index : int - Index of the architecture (see NASBench_201ArchitectureIndex)
+            '1<-0', ..., '3<-2' : The operations on the edges. Stored as codes of the operations.
+            data_seed : int
+            epoch : int - 0 indexed
+            train_acc1es, train_losses, train_times, eval_acc1es, eval_times, eval_losses : float
+                The times are the cumulative costs up to the epoch.
+
+        Parameters
+        ----------
+        path : Path, str
+            Path of the table. The suffix determines the format (.npz, .parquet, .arrow), if it is not given.
+        table_format : str, None
+            One of 'npz', 'parquet', 'arrow'. See :py:mod:`~hpolib.util.table_utils`.
+        data_seed : List, Tuple, None, int
+            The data set seeds to export.
+        chunk_size : int
+            Number of architectures, which are written at once.
+
+        Returns
+        -------
+        Path
+        """
+        data_seed = self._check_data_seed(data_seed)
+        seed_index = [self.seeds.index(seed) for seed in data_seed]
+        n_epochs = self.data['train_acc1es'].shape[2]
+        edges = self.architecture_index.edge_names
+        op_names = self.architecture_index.op_names
+
+        categories = {edge: op_names for edge in edges}
+        metadata = {'benchmark': self.__class__.__name__, 'version': __version__}
+        with TableWriter(path, table_format, categories=categories, metadata=metadata) as writer:
+            for start in range(0, len(self.architecture_index), chunk_size):
+                arch_index = np.arange(start, min(start + chunk_size, len(self.architecture_index)))
+                rows_per_arch = len(seed_index) * n_epochs
+
+                columns = {'arch_index': np.repeat(arch_index, rows_per_arch).astype(np.int32)}
+                for k, edge in enumerate(edges):
+                    columns[edge] = np.repeat(self.architecture_index.operations[arch_index, k], rows_per_arch)
+                columns['data_seed'] = np.tile(np.repeat(data_seed, n_epochs), len(arch_index)).astype(np.int16)
+                columns['epoch'] = np.tile(np.arange(n_epochs), len(arch_index) * len(seed_index)).astype(np.int16)
+                for metric in NASBench_201Data.get_metrics():
+                    columns[metric] = self.data[metric][start:start + len(arch_index)][:, seed_index].reshape(-1)
+
+                writer.write(columns)
+        return Path(path)
+
+    def get_oracle(self, data_seed: Union[List, Tuple, int, None] = (777, 888, 999), test: bool = False) -> Dict:
+        """
+        Return the best function value per epoch over all architectures. Thus, the regret of a configuration is its
+        function value minus the value of the oracle. The oracle is computed directly on the data arrays and kept for
+        further calls.
+
+        Parameters
+        ----------
+        data_seed : List, Tuple, None, int
+            The data set seeds to average over. See `objective_function`.
+        test : bool
+            If True, return the best function values of `objective_function_test`, which uses all data set seeds.
+
+        Returns
+        -------
+        Dict -
+            epoch : np.ndarray - All epochs (0 indexed)
+            function_value : np.ndarray - Best function value per epoch
+            cost : np.ndarray - Cost of the best architecture per epoch
+            configuration : List[Dict] - Best architecture per epoch
+        """
+        data_seed = self._check_data_seed(data_seed) if not test else (777, 888, 999)
+        key = (data_seed, test)
+
+        if key not in self._oracles:
+            seed_index = [self.seeds.index(seed) for seed in data_seed]
+            accuracy_metric = 'eval_acc1es' if test else 'train_acc1es'
+            # Same operations as in the objective function, such that the values are exactly equal.
+            function_values = 100 - self.data[accuracy_metric][:, seed_index].mean(axis=1)
+            costs = self.data['train_times'][:, seed_index].sum(axis=1)
+            if test:
+                costs = costs + self.data['eval_times'][:, seed_index].sum(axis=1)
+
+            best = np.nanargmin(function_values, axis=0)
+            epochs = np.arange(function_values.shape[1])
+            self._oracles[key] = {'epoch': epochs,
+                                  'function_value': function_values[best, epochs].astype(float),
+                                  'cost': costs[best, epochs].astype(float),
+                                  'configuration': [self.architecture_index.index_to_config(arch_index)
+                                                    for arch_index in best]}
+        return self._oracles[key]
+
+    @AbstractBenchmark._configuration_as_dict
+    @AbstractBenchmark._check_configuration
+    def get_canonical_configuration(self, configuration: Union[CS.Configuration, Dict], **kwargs) -> Dict:
+        """
+        Return the canonical representative of the configuration. All configurations which describe the same cell up
+        to isomorphism (e.g. swapped intermediate nodes or edges which do not reach the output) are mapped to the same
+        configuration. Thus, caches and optimizers can detect equivalent queries.
+
+        Note: The benchmark still returns the recorded results of the given architecture. Equivalent architectures
+        were trained separately and their results differ slightly.
+
+        Parameters
+        ----------
+        configuration : CS.Configuration, Dict
+        kwargs
+
+        Returns
+        -------
+        Dict
+        """
+        arch_index = self.architecture_index.canonical_index(self._config_to_arch_index(configuration))
+        return self.architecture_index.index_to_config(arch_index)
+
+    def _config_to_arch_index(self, configuration: Dict) -> int:
+        """ Helper function to encode a configuration as index into the data arrays (see NASBench_201Data). """
+        return self.architecture_index.config_to_index(configuration)
+
+    def _check_epochs(self, epochs: Union[slice, List[int], None]) -> Union[slice, List[int]]:
+        """ Helper function to check if the epochs of a learning curve are valid values of the fidelity `epoch`. """
+        if epochs is None:
+            return slice(None)
+
+        hyperparameter = self.fidelity_space.get_hyperparameter('epoch')
+        if isinstance(epochs, slice):
+            epochs = range(hyperparameter.lower if epochs.start is None else epochs.start,
+                           hyperparameter.upper + 1 if epochs.stop is None else epochs.stop,
+                           1 if epochs.step is None else epochs.step)
+
+        illegal_epochs = [epoch for epoch in epochs if not hyperparameter.is_legal(epoch)]
+        if len(illegal_epochs) > 0:
+            raise ValueError(f'Epochs {illegal_epochs} are not legal values of the fidelity {hyperparameter}')
+        return list(epochs)
+
+    @staticmethod
+    def _check_data_seed(data_seed: Union[List, Tuple, int]) -> Tuple:
+        """ Helper function to check if the data set seeds are valid and to cast them to a tuple. """
+        assert isinstance(data_seed, List) or isinstance(data_seed, Tuple) or isinstance(data_seed, int), \
+            f'data seed has unknown data type {type(data_seed)}, but should be tuple or int (777,888,999)'
+
+        if isinstance(data_seed, List):
+            data_seed = tuple(data_seed)
+
+        if isinstance(data_seed, int):
+            data_seed = (data_seed, )
+
+        assert len(set(data_seed) - {777, 888, 999}) == 0,\
+            f'data seed can only contain the elements 777, 888, 999, but was {data_seed}'
+        return data_seed
+
     @staticmethod
     def config_to_structure_func(max_nodes: int):
         # From https://github.com/D-X-Y/AutoDL-Projects/blob/master/exps/algos/BOHB.py
@@ -21,40 +21,62 @@ tar xf fcnet_tabular_benchmarks.tar.gz
 ```
 cd /path/to/HPOlib2
 pip install .[tabular_benchmarks]
-pip install git+https://github.com/google-research/nasbench.git@master
-
-git clone https://github.com/automl/nas_benchmarks.git
-cd nas_benchmarks
-python setup.py install
 ```
 
+The hdf5 files are converted once to arrays, which are stored in the hpolib data directory (see FCNetData).
+Therefore, the package `tabular_benchmarks` is not needed anymore.
+
 """
 
 from pathlib import Path
-from typing import Union, Dict, Tuple
+from typing import Union, Dict, Tuple, List
 
 import ConfigSpace as CS
 import numpy as np
-from tabular_benchmarks.fcnet_benchmark import FCNetBenchmark
 
 import hpolib.util.rng_helper as rng_helper
 from hpolib.abstract_benchmark import AbstractBenchmark
+from hpolib.util.data_manager import FCNetData
+from hpolib.util.table_utils import TableWriter
 
 __version__ = '0.0.1'
 
 
 class FCNetBaseBenchmark(AbstractBenchmark):
-    def __init__(self, benchmark: FCNetBenchmark,
+    # The results are looked up in a table. They don't depend on the random state.
+    _deterministic = True
+    _rng_independent_data = True
+    _instance_attributes = AbstractBenchmark._instance_attributes + ('_oracles',)
+
+    def __init__(self, dataset: str,
                  data_path: Union[Path, str, None] = "./fcnet_tabular_benchmarks/",
-                 rng: Union[np.random.RandomState, int, None] = None, **kwargs):
+                 rng: Union[np.random.RandomState, int, None] = None, validate: str = 'full', **kwargs):
+        """
+        Baseclass for the FCNet tabular benchmarks. Don't call this class directly. Instantiate via subclasses.
 
-        super(FCNetBaseBenchmark, self).__init__(rng=rng)
-        self.benchmark = benchmark
+        Parameters
+        ----------
+        dataset : str
+            One of slice_localization, protein_structure, naval_propulsion, parkinsons_telemonitoring
+        data_path : str, Path, None
+            Path to the folder, which contains the hdf5 files of the tabular benchmarks.
+        rng : np.random.RandomState, int, None
+            Random seed for the benchmark's random state.
+        validate : str
+            One of 'full', 'fast', 'off'. See :py:class:`~hpolib.abstract_benchmark.AbstractBenchmark`.
+        """
+        super(FCNetBaseBenchmark, self).__init__(rng=rng, validate=validate)
         self.data_path = data_path
 
+        # Dense arrays 'valid_mse' [configuration, run, epoch] and 'runtime' [configuration, run]. See FCNetData.load
+        self.data = FCNetData(dataset=dataset, data_path=data_path).load()
+        self._oracles = {}
+
     @AbstractBenchmark._configuration_as_dict
     @AbstractBenchmark._check_configuration
     @AbstractBenchmark._check_fidelity
+    @AbstractBenchmark._record_trajectory
+    @AbstractBenchmark._cache_result
     def objective_function(self, configuration: Union[CS.Configuration, Dict],
                            fidelity: Union[Dict, None] = None,
                            run_index: Union[int, Tuple, None] = (0, 1, 2, 3),
@@ -92,26 +114,12 @@ class FCNetBaseBenchmark(AbstractBenchmark):
         """
         self.rng = rng_helper.get_rng(rng)
 
-        if isinstance(run_index, int):
-            assert 0 <= run_index <= 3, f'run_index must be in [0, 3], not {run_index}'
-            run_index = (run_index, )
-        elif isinstance(run_index, tuple) or isinstance(run_index, list):
-            assert len(run_index) != 0, 'run_index must not be empty'
-            assert min(run_index) >= 0 and max(run_index) <= 3, \
-                f'all run_index values must be in [0, 3], but were {run_index}'
-        else:
-            raise ValueError(f'run index must be one of Tuple or Int, but was {type(run_index)}')
-
-        self._reset_tracker()
+        run_index = self._check_run_index(run_index)
 
-        valid_rmse_list, runtime_list = [], []
-        for run_id in run_index:
-            valid_rmse, runtime = self.benchmark.\
-                objective_function_deterministic(config=configuration,
-                                                 budget=fidelity["budget"],
-                                                 index=run_id)
-            valid_rmse_list.append(float(valid_rmse))
-            runtime_list.append(float(runtime))
+        # All runs in a single lookup
+        index = FCNetData.config_to_index(configuration)
+        valid_rmse_list = self.data['valid_mse'][index, list(run_index), fidelity['budget'] - 1].tolist()
+        runtime_list = self._get_runtime(self.data['runtime'][index, list(run_index)], fidelity['budget']).tolist()
 
         valid_rmse = sum(valid_rmse_list) / len(valid_rmse_list)
         runtime = sum(runtime_list) / len(runtime_list)
@@ -123,9 +131,66 @@ class FCNetBaseBenchmark(AbstractBenchmark):
                          'fidelity': fidelity},
                 }
 
+    def objective_function_batch(self, configurations: List[Union[CS.Configuration, Dict]],
+                                 fidelities: Union[List[Dict], Dict, None] = None,
+                                 run_index: Union[int, Tuple, None] = (0, 1, 2, 3),
+                                 rng: Union[np.random.RandomState, int, None] = None,
+                                 **kwargs) -> Dict:
+        """
+        Query the tabular benchmark for a batch of configurations. Each configuration and fidelity is checked as in
+        `objective_function` (see `_check_batch`) and the results are returned column-wise.
+
+        Parameters
+        ----------
+        configurations : List[Dict, CS.Configuration]
+        fidelities : List[Dict], Dict, None
+            Either one fidelity per configuration or a single fidelity for all configurations.
+            Uses default (max) value if None.
+        run_index : int, Tuple, None
+            See `objective_function`.
+        rng : np.random.RandomState, int, None
+            Random seed to use in the benchmark.
+        kwargs
+
+        Returns
+        -------
+        Dict -
+            function_value : np.ndarray - validation loss per configuration
+            cost : np.ndarray - time to train and evaluate the models
+            info : Dict
+                valid_rmse_per_run : np.ndarray - shape [configurations, runs]
+                runtime_per_run : np.ndarray - shape [configurations, runs]
+                fidelity : List[Dict]
+        """
+        configurations, fidelities = self._check_batch(configurations, fidelities)
+        run_index = self._check_run_index(run_index)
+
+        self.rng = rng_helper.get_rng(rng)
+
+        index = np.array([FCNetData.config_to_index(configuration) for configuration in configurations],
+                         dtype=np.int64)
+        budgets = np.array([fidelity['budget'] for fidelity in fidelities], dtype=np.int64)
+        run_index = np.array(run_index, dtype=np.int64)
+
+        # Shape: [configurations, runs]
+        valid_rmse = self.data['valid_mse'][index[:, None], run_index[None, :], budgets[:, None] - 1].astype(float)
+        runtime = self._get_runtime(self.data['runtime'][index[:, None], run_index[None, :]], budgets[:, None])
+
+        function_values, costs = valid_rmse.mean(axis=1), runtime.mean(axis=1)
+        if self.trajectory is not None:
+            self.trajectory.record_batch(configurations, fidelities, function_values, costs)
+
+        return {'function_value': function_values,
+                'cost': costs,
+                'info': {'valid_rmse_per_run': valid_rmse,
+                         'runtime_per_run': runtime,
+                         'fidelity': fidelities},
+                }
+
     @AbstractBenchmark._configuration_as_dict
     @AbstractBenchmark._check_configuration
     @AbstractBenchmark._check_fidelity
+    @AbstractBenchmark._cache_result
     def objective_function_test(self, configuration: Union[Dict, CS.Configuration],
                                 fidelity: Union[Dict, None] = None,
                                 rng: Union[np.random.RandomState, int, None] = None,
@@ -156,10 +221,103 @@ class FCNetBaseBenchmark(AbstractBenchmark):
         return self.objective_function(configuration=configuration, fidelity=fidelity, rng=rng,
                                        **kwargs)
 
+    def export_table(self, path: Union[Path, str], table_format: Union[str, None] = None,
+                     chunk_size: int = 1000) -> Path:
+        """
+        Export the whole table of the benchmark as columnar file with one row per configuration, run and budget.
+
+        Columns:
+            One column per hyperparameter. Hyperparameters with string values are stored as codes.
+            run_index : int
+            budget : int
+            valid_mse : float
+            runtime : float - Time to train the model for `budget` epochs (the cost of the objective function)
+
+        Parameters
+        ----------
+        path : Path, str
+            Path of the table. The suffix determines the format (.npz, .parquet, .arrow), if it is not given.
+        table_format : str, None
+            One of 'npz', 'parquet', 'arrow'. See :py:mod:`~hpolib.util.table_utils`.
+        chunk_size : int
+            Number of configurations, which are written at once.
+
+        Returns
+        -------
+        Path
+        """
+        hyperparameters = FCNetData.get_hyperparameters()
+        categories = {name: values for name, values in hyperparameters.items()
+                      if any(isinstance(value, str) for value in values)}
+        n_configurations, n_runs, n_budgets = self.data['valid_mse'].shape
+        budgets = np.arange(1, n_budgets + 1)
+
+        metadata = {'benchmark': self.__class__.__name__, 'version': __version__}
+        with TableWriter(path, table_format, categories=categories, metadata=metadata) as writer:
+            for start in range(0, n_configurations, chunk_size):
+                index = np.arange(start, min(start + chunk_size, n_configurations))
+                value_indices = np.unravel_index(index, [len(values) for values in hyperparameters.values()])
+
+                columns = {}
+                for (name, values), value_index in zip(hyperparameters.items(), value_indices):
+                    if name in categories:
+                        column = value_index.astype(np.int8)
+                    else:
+                        column = np.array(values, dtype=float)[value_index]
+                    columns[name] = np.repeat(column, n_runs * n_budgets)
+                columns['run_index'] = np.tile(np.repeat(np.arange(n_runs), n_budgets), len(index)).astype(np.int8)
+                columns['budget'] = np.tile(budgets, len(index) * n_runs).astype(np.int16)
+                columns['valid_mse'] = self.data['valid_mse'][start:start + len(index)].reshape(-1)
+                columns['runtime'] = self._get_runtime(self.data['runtime'][start:start + len(index), :, None],
+                                                       budgets).reshape(-1)
+
+                writer.write(columns)
+        return Path(path)
+
+    def get_oracle(self, run_index: Union[int, Tuple, None] = (0, 1, 2, 3)) -> Dict:
+        """
+        Return the best function value per budget over all configurations. Thus, the regret of a configuration is its
+        function value minus the value of the oracle. The oracle is computed directly on the data arrays and kept for
+        further calls.
+
+        Parameters
+        ----------
+        run_index : int, Tuple, None
+            The runs to average over. See `objective_function`.
+
+        Returns
+        -------
+        Dict -
+            budget : np.ndarray - All budgets
+            function_value : np.ndarray - Best function value per budget
+            cost : np.ndarray - Cost of the best configuration per budget
+            configuration : List[Dict] - Best configuration per budget
+        """
+        run_index = self._check_run_index(run_index)
+
+        if run_index not in self._oracles:
+            budgets = np.arange(1, self.data['valid_mse'].shape[2] + 1)
+            # Shape: [configuration, budget]
+            function_values = self.data['valid_mse'][:, list(run_index)].astype(float).mean(axis=1)
+            costs = self._get_runtime(self.data['runtime'][:, list(run_index), None], budgets).mean(axis=1)
+
+            best = np.nanargmin(function_values, axis=0)
+            self._oracles[run_index] = {'budget': budgets,
+                                        'function_value': function_values[best, budgets - 1],
+                                        'cost': costs[best, budgets - 1],
+                                        'configuration': [FCNetData.index_to_config(index) for index in best]}
+        return self._oracles[run_index]
+
+    @staticmethod
+    def _get_runtime(runtime: np.ndarray, budget: Union[int, np.ndarray]) -> np.ndarray:
+        """ The data contains the runtime for 100 epochs. The runtime for `budget` epochs is linearly interpolated. """
+        return runtime.astype(float) / 100 * budget
+
     @staticmethod
     def get_configuration_space(seed: Union[int, None] = None) -> CS.ConfigurationSpace:
         """
-        Interface to the get_configuration_space function from the FCNet Benchmark.
+        Return the configuration space of the FCNet benchmarks. It equals the configuration space of the
+        FCNetBenchmark from https://github.com/automl/nas_benchmarks.
 
         Parameters
         ----------
@@ -173,8 +331,20 @@ class FCNetBaseBenchmark(AbstractBenchmark):
         """
 
         seed = seed if seed is not None else np.random.randint(1, 100000)
-        cs = FCNetBenchmark.get_configuration_space()
-        cs.seed(seed)
+        cs = CS.ConfigurationSpace(seed=seed)
+
+        hyperparameters = FCNetData.get_hyperparameters()
+        cs.add_hyperparameters([
+            CS.OrdinalHyperparameter('n_units_1', hyperparameters['n_units_1']),
+            CS.OrdinalHyperparameter('n_units_2', hyperparameters['n_units_2']),
+            CS.OrdinalHyperparameter('dropout_1', hyperparameters['dropout_1']),
+            CS.OrdinalHyperparameter('dropout_2', hyperparameters['dropout_2']),
+            CS.CategoricalHyperparameter('activation_fn_1', hyperparameters['activation_fn_1']),
+            CS.CategoricalHyperparameter('activation_fn_2', hyperparameters['activation_fn_2']),
+            CS.OrdinalHyperparameter('init_lr', hyperparameters['init_lr']),
+            CS.CategoricalHyperparameter('lr_schedule', hyperparameters['lr_schedule']),
+            CS.OrdinalHyperparameter('batch_size', hyperparameters['batch_size']),
+        ])
         return cs
 
     @staticmethod
@@ -201,11 +371,19 @@ class FCNetBaseBenchmark(AbstractBenchmark):
 
         return fidel_space
 
-    def _reset_tracker(self):
-        """ Helper function to reset the internal memory of the benchmark. """
-        self.benchmark.X = []
-        self.benchmark.y = []
-        self.benchmark.c = []
+    @staticmethod
+    def _check_run_index(run_index: Union[int, Tuple, List]) -> Tuple:
+        """ Helper function to check the requested run indices and to cast them to a tuple. """
+        if isinstance(run_index, int):
+            assert 0 <= run_index <= 3, f'run_index must be in [0, 3], not {run_index}'
+            run_index = (run_index, )
+        elif isinstance(run_index, tuple) or isinstance(run_index, list):
+            assert len(run_index) != 0, 'run_index must not be empty'
+            assert min(run_index) >= 0 and max(run_index) <= 3, \
+                f'all run_index values must be in [0, 3], but were {run_index}'
+        else:
+            raise ValueError(f'run index must be one of Tuple or Int, but was {type(run_index)}')
+        return tuple(run_index)
 
     @staticmethod
     def get_meta_information() -> Dict:
@@ -222,34 +400,29 @@ class SliceLocalizationBenchmark(FCNetBaseBenchmark):
 
     def __init__(self, data_path: Union[Path, str, None] = './fcnet_tabular_benchmarks/',
                  rng: Union[np.random.RandomState, int, None] = None, **kwargs):
-        from tabular_benchmarks import FCNetSliceLocalizationBenchmark
-        benchmark = FCNetSliceLocalizationBenchmark(data_dir=str(data_path))
-        super(SliceLocalizationBenchmark, self).__init__(benchmark=benchmark, data_path=data_path, rng=rng, **kwargs)
+        super(SliceLocalizationBenchmark, self).__init__(dataset='slice_localization', data_path=data_path, rng=rng,
+                                                         **kwargs)
 
 
 class ProteinStructureBenchmark(FCNetBaseBenchmark):
 
     def __init__(self, data_path: Union[Path, str, None] = './fcnet_tabular_benchmarks/',
                  rng: Union[np.random.RandomState, int, None] = None, **kwargs):
-        from tabular_benchmarks import FCNetProteinStructureBenchmark
-        benchmark = FCNetProteinStructureBenchmark(data_dir=str(data_path))
-        super(ProteinStructureBenchmark, self).__init__(benchmark=benchmark, data_path=data_path, rng=rng, **kwargs)
+        super(ProteinStructureBenchmark, self).__init__(dataset='protein_structure', data_path=data_path, rng=rng,
+                                                        **kwargs)
 
 
 class NavalPropulsionBenchmark(FCNetBaseBenchmark):
 
     def __init__(self, data_path: Union[Path, str, None] = './fcnet_tabular_benchmarks/',
                  rng: Union[np.random.RandomState, int, None] = None, **kwargs):
-        from tabular_benchmarks import FCNetNavalPropulsionBenchmark
-        benchmark = FCNetNavalPropulsionBenchmark(data_dir=str(data_path))
-        super(NavalPropulsionBenchmark, self).__init__(benchmark=benchmark, data_path=data_path, rng=rng, **kwargs)
+        super(NavalPropulsionBenchmark, self).__init__(dataset='naval_propulsion', data_path=data_path, rng=rng,
+                                                       **kwargs)
 
 
 class ParkinsonsTelemonitoringBenchmark(FCNetBaseBenchmark):
 
     def __init__(self, data_path: Union[Path, str, None] = './fcnet_tabular_benchmarks/',
                  rng: Union[np.random.RandomState, int, None] = None, **kwargs):
-        from tabular_benchmarks import FCNetParkinsonsTelemonitoringBenchmark
-        benchmark = FCNetParkinsonsTelemonitoringBenchmark(data_dir=str(data_path))
-        super(ParkinsonsTelemonitoringBenchmark, self).__init__(benchmark=benchmark, data_path=data_path, rng=rng,
-                                                                **kwargs)
+        super(ParkinsonsTelemonitoringBenchmark, self).__init__(dataset='parkinsons_telemonitoring',
+                                                                data_path=data_path, rng=rng, **kwargs)
@@ -3,6 +3,11 @@
 
 """ Benchmark for the XGBoost Benchmark from hpolib/benchmarks/ml/xgboost_benchmark """
 
+from typing import Union, Dict, List
+
+import ConfigSpace as CS
+import numpy as np
+
 from hpolib.container.client_abstract_benchmark import AbstractBenchmarkClient
 
 
@@ -11,3 +16,26 @@ class XGBoostBenchmark(AbstractBenchmarkClient):
         kwargs['benchmark_name'] = kwargs.get('benchmark_name', 'XGBoostBenchmark')
         kwargs['container_name'] = kwargs.get('container_name', 'xgboost_benchmark')
         super(XGBoostBenchmark, self).__init__(**kwargs)
+
+    def get_learning_curve(self, configuration: Union[np.ndarray, List, CS.Configuration, Dict],
+                           fidelity: Union[CS.Configuration, Dict, None] = None,
+                           rng: Union[np.random.RandomState, int, None] = None, **kwargs) -> Dict:
+        """
+        Train a XGBoost model once and return the losses after each tree.
+        See :py:func:`~hpolib.benchmarks.ml.xgboost_benchmark.XGBoostBenchmark.get_learning_curve`
+
+        Parameters
+        ----------
+        configuration : np.ndarray, List, CS.Configuration, Dict
+        fidelity : CS.Configuration, Dict, None
+        rng : np.random.RandomState, int, None
+        kwargs : Dict
+
+        Returns
+        -------
+        Dict
+        """
+        kwargs['fidelity'] = self._fidelity_as_dict(fidelity)
+        if rng is not None:
+            kwargs['rng'] = self._cast_random_state_to_int(rng)
+        return super(XGBoostBenchmark, self).get_learning_curve(configuration, **kwargs)
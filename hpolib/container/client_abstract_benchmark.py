@@ -13,9 +13,13 @@ are defined in the ~/.hpolibrc - file.
 
 The name of the container (``container_name``) is defined either in its belonging
 container-benchmark definition. (hpolib/container/<type>/<name> or via ``container_name``.
+
+After connecting, client and server negotiate the protocol for the objective functions. If both sides support it,
+a binary protocol is used (see hpolib.container.transport). Otherwise, the payloads are sent as json strings.
 """
 import os
 import abc
+import copy
 import sys
 import json
 import logging
@@ -34,6 +38,8 @@ from ConfigSpace.read_and_write import json as csjson
 from oslo_concurrency import lockutils
 
 import hpolib.config
+from hpolib.abstract_benchmark import AbstractBenchmark
+from hpolib.container import transport
 
 # Read in the verbosity level from the environment variable HPOLIB_DEBUG
 log_level_str = os.environ.get('HPOLIB_DEBUG', 'false')
@@ -55,11 +61,16 @@ class AbstractBenchmarkClient(metaclass=abc.ABCMeta):
     Attributes
     ----------
     socket_id : str
+    cold_start_time : Dict
+        Time in seconds to start the instance, to start the server in the container, to initialize the benchmark and
+        in total.
     """
     def __init__(self, benchmark_name: str, container_name: str, container_source: Optional[str] = None,
                  gpu: Optional[bool] = False, rng: Union[np.random.RandomState, int, None] = None, **kwargs):
 
         self.socket_id = self._id_generator()
+        self.protocol = 'json'
+        self.handle = None
 
         if rng is not None:
             kwargs['rng'] = rng
@@ -156,6 +167,12 @@ class AbstractBenchmarkClient(metaclass=abc.ABCMeta):
         cmd = f'{log_str} singularity instance start {bind_options}{gpu_opt}{container_options} {self.socket_id}'
         logger.debug(cmd)
 
+        start_time = time.time()
+
+        # `singularity instance start` returns after the instance is running and fails with a non-zero exit status
+        # otherwise. Starting an instance fails sometimes without a reason, e.g. if many instances are started at the
+        # same time. Therefore, try this step multiple times. The waiting time between the tries is random, so that
+        # instances, which failed together, don't start again at the same time.
         MAX_TRIES = 5
         for num_tries in range(MAX_TRIES):
             p = subprocess.Popen(cmd,
@@ -163,31 +180,31 @@ class AbstractBenchmarkClient(metaclass=abc.ABCMeta):
             output, err = p.communicate()
             logger.debug(err)
 
-            # Give a little bit of time to make sure the instance does not disappears after testing if it is there.
-            time.sleep(1)
-
-            # Check if the instance is started. Starting a instance crashes sometimes without a warning.
-            # Therefore, try this step multiple times unless it is really started
-            out = subprocess.getoutput('singularity instance list')
-            out = out.split()
-
-            if self.socket_id in out:
+            # Failed starts may still leave a running instance behind. Then, a further try would fail, since the
+            # name of the instance is already taken.
+            if p.returncode == 0 or self.socket_id in subprocess.getoutput('singularity instance list').split():
                 break
-            else:
-                logger.debug(f'Could not start instance: Try {num_tries + 1}|{MAX_TRIES}')
-                if num_tries + 1 == MAX_TRIES:
-                    raise SystemError(f'Could not start a instance of the benchmark. Retried {MAX_TRIES:d} times'
-                                      f'\nStdout: {output} \nStderr: {err}')
-            st = np.random.randint(1, 60)
-            logger.critical(f'[{num_tries + 1}/{MAX_TRIES}] Could not start instance, sleeping for {st} seconds')
+
+            logger.debug(f'Could not start instance: Try {num_tries + 1}|{MAX_TRIES}')
+            if num_tries + 1 == MAX_TRIES:
+                raise SystemError(f'Could not start a instance of the benchmark. Retried {MAX_TRIES:d} times'
+                                  f'\nStdout: {output} \nStderr: {err}')
+            st = np.random.uniform(0.5, 5)
+            logger.critical(f'[{num_tries + 1}/{MAX_TRIES}] Could not start instance, sleeping for {st:.2f} seconds')
             time.sleep(st)
 
-        # Give each instance a little bit time to start
-        time.sleep(1)
+        instance_time = time.time()
 
         cmd = f'singularity run {gpu_opt}instance://{self.socket_id} {benchmark_name} {self.socket_id}'
         logger.debug(cmd)
-        subprocess.Popen(cmd.split())
+        server_process = subprocess.Popen(cmd.split())
+
+        # Wait until the server in the container signals that it is ready, instead of retrying to connect.
+        self._wait_for_server(server_process,
+                              ready_file=self.config.socket_dir / f'{self.socket_id}_ready',
+                              socket_file=self.config.socket_dir / f'{self.socket_id}_unix.sock',
+                              max_wait=self.config.pyro_connect_max_wait)
+        server_time = time.time()
 
         Pyro4.config.REQUIRE_EXPOSE = False
         # Generate Pyro 4 URI for connecting to client
@@ -196,29 +213,99 @@ class AbstractBenchmarkClient(metaclass=abc.ABCMeta):
         self.benchmark = Pyro4.Proxy(self.uri)
 
         # Handle rng and other optional benchmark arguments
+        kwargs_str = self._parse_benchmark_kwargs(**kwargs)
+
+        # The server has registered its socket before it signals that it is ready. Thus, the first call succeeds.
+        logger.debug('Init benchmark')
+        self.benchmark.init_benchmark(kwargs_str)
+        logger.debug('Connected to container')
+
+        end_time = time.time()
+        self.cold_start_time = {'instance': instance_time - start_time,
+                                'server': server_time - instance_time,
+                                'init_benchmark': end_time - server_time,
+                                'total': end_time - start_time}
+        logger.info(f'Started {benchmark_name} from container {container_name} in '
+                    f'{self.cold_start_time["total"]:.2f}s (instance: {self.cold_start_time["instance"]:.2f}s, '
+                    f'server: {self.cold_start_time["server"]:.2f}s, '
+                    f'init benchmark: {self.cold_start_time["init_benchmark"]:.2f}s)')
+
+        self.protocol = self._negotiate_protocol()
+        logger.debug(f'Use protocol {self.protocol}')
+
+    @staticmethod
+    def _wait_for_server(server_process: subprocess.Popen, ready_file: Path, socket_file: Path,
+                         max_wait: float, legacy_wait: float = 1, poll_interval: float = 0.005):
+        """
+        Wait until the server in the container has created the ready file. The server creates it after it has
+        registered itself at the Pyro4 daemon.
+
+        Containers of older versions do not create a ready file. Their socket accepts connections as soon as it
+        exists. Therefore, if the socket exists for `legacy_wait` seconds without a ready file, we stop waiting.
+
+        Parameters
+        ----------
+        server_process : subprocess.Popen
+            The process which runs the server. If it exits before the server is ready, the server has crashed.
+        ready_file : Path
+        socket_file : Path
+        max_wait : float
+            Maximum waiting time in seconds. See the config option pyro_connect_max_wait.
+        legacy_wait : float
+        poll_interval : float
+            Time in seconds between two checks.
+        """
+        start_time = time.time()
+        socket_time = None
+
+        while not ready_file.exists():
+            if server_process.poll() is not None:
+                raise SystemError(f'The benchmark server has exited with code {server_process.returncode} before it '
+                                  f'was ready.')
+
+            now = time.time()
+            if socket_time is None and socket_file.exists():
+                socket_time = now
+            if socket_time is not None and now - socket_time >= legacy_wait:
+                logger.debug('The container does not signal that it is ready. Connect to its socket.')
+                break
+            if now - start_time >= max_wait:
+                raise TimeoutError(f'The benchmark server was not ready after {max_wait}s. To increase the waiting '
+                                   f'time, adjust config option pyro_connect_max_wait.')
+            time.sleep(poll_interval)
+
+        logger.debug(f'Server ready after {time.time() - start_time:.3f}s')
+
+    def _negotiate_protocol(self) -> str:
+        """ Use the binary protocol if it is supported by both sides. Older containers only support json. """
+        if not transport.is_available():
+            return 'json'
+
+        try:
+            protocols = self.benchmark.transport_protocols()
+        except (AttributeError, Pyro4.errors.PyroError) as e:
+            logger.debug(f'Container does not support the binary protocol: {e}')
+            return 'json'
+
+        if transport.PROTOCOL not in protocols:
+            return 'json'
+
+        # Pyro's default serializer (serpent) transfers bytes base64 encoded. Marshal sends them as they are.
+        self.benchmark._pyroSerializer = 'marshal'
+        return transport.PROTOCOL
+
+    @staticmethod
+    def _parse_benchmark_kwargs(**kwargs) -> str:
+        """ Helper function to parse the arguments of the benchmark constructor to json str. """
         if 'rng' in kwargs and isinstance(kwargs['rng'], np.random.RandomState):
             (rnd0, rnd1, rnd2, rnd3, rnd4) = kwargs['rng'].get_state()
             rnd1 = [int(number) for number in rnd1]
             kwargs['rng'] = (rnd0, rnd1, rnd2, rnd3, rnd4)
-        kwargs_str = json.dumps(kwargs)
+        return json.dumps(kwargs)
 
-        # Try to connect to server calling benchmark constructor via RPC. There exists a time limit
-        logger.debug('Check connection to container and init benchmark')
-        wait = 0
-        while True:
-            try:
-                self.benchmark.init_benchmark(kwargs_str)
-            except Pyro4.core.errors.CommunicationError:
-                logger.debug('Still waiting')
-                time.sleep(5)
-                wait += 5
-                if wait < self.config.pyro_connect_max_wait:
-                    continue
-                else:
-                    logger.debug('Waiting time exceeded. To increase, adjust config option pyro_connect_max_wait.')
-                    raise
-            break
-        logger.debug('Connected to container')
+    def _handle_kwargs(self) -> Dict:
+        """ Helper function: Address the benchmark of this client in the container (see `create_benchmark`). """
+        return {'handle': self.handle} if self.handle is not None else {}
 
     def _parse_kwargs(self, rng: Union[np.random.RandomState, int, None] = None, **kwargs):
         """ Helper function to parse the named keyword arguments to json str. """
@@ -229,6 +316,11 @@ class AbstractBenchmarkClient(metaclass=abc.ABCMeta):
         return kwargs_str
 
     def _parse_fidelities(self, fidelity: Union[CS.Configuration, Dict, None] = None):
+        f_str = json.dumps(self._fidelity_as_dict(fidelity), indent=None)
+        return f_str
+
+    @staticmethod
+    def _fidelity_as_dict(fidelity: Union[CS.Configuration, Dict, None] = None) -> Dict:
         if fidelity is None:
             fidelity = {}
         elif isinstance(fidelity, CS.Configuration):
@@ -237,29 +329,42 @@ class AbstractBenchmarkClient(metaclass=abc.ABCMeta):
             fidelity = fidelity
         else:
             raise ValueError(f'Type of fidelity not understood: {type(fidelity)}')
-        f_str = json.dumps(fidelity, indent=None)
-        return f_str
-
-    def objective_function(self, configuration: Union[np.ndarray, List, CS.Configuration, Dict],
-                           fidelity: Union[CS.Configuration, Dict, None] = None,
-                           rng: Union[np.random.RandomState, int, None] = None, **kwargs) -> Dict:
-        """
-        Run a given configuration for a given fidelity on the containerized benchmark.
+        return fidelity
 
-        Convert the given parameters to strings and send them via Pyro to the container.
-        Read the result information and parse them.
+    def _container_supports(self, method_name: str) -> bool:
+        """ Helper function to check if the server in the container offers a method. Older containers lack some. """
+        methods = getattr(self.benchmark, '_pyroMethods', None)
+        return not methods or method_name in methods
 
-        Parameters
-        ----------
-        configuration : np.ndarray, List, CS.Configuration, Dict
-        fidelity : CS.Configuration, Dict, None
-        rng : np.random.RandomState, int, None
-        kwargs : Dict
-
-        Returns
-        -------
-        Dict
+    def _parse_configuration(self, configuration: Union[np.ndarray, List, CS.Configuration, Dict]) \
+            -> Union[np.ndarray, List, Dict]:
+        """
+        Helper function to cast the configuration to a type, which can be sent to the container. Arrays are only kept
+        for the binary protocol, which preserves their dtype and shape. For json, they are sent as list.
+        """
+        if isinstance(configuration, np.ndarray):
+            return configuration if self.protocol == transport.PROTOCOL else configuration.tolist()
+        if isinstance(configuration, CS.Configuration):
+            return configuration.get_dictionary()
+        if isinstance(configuration, (list, dict)):
+            return configuration
+        raise ValueError(f'Type of config not understood: {type(configuration)}')
+
+    def _query(self, proxy: Pyro4.Proxy, function_name: str,
+               configuration: Union[np.ndarray, List, CS.Configuration, Dict],
+               fidelity: Union[CS.Configuration, Dict, None] = None,
+               rng: Union[np.random.RandomState, int, None] = None, **kwargs) -> Dict:
         """
+        Helper function to query an objective function of the benchmark, e.g. 'objective_function', via the given
+        proxy. Uses the negotiated protocol.
+        """
+        if self.protocol == transport.PROTOCOL:
+            if rng is not None:
+                kwargs['rng'] = self._cast_random_state_to_int(rng)
+            payload = transport.pack([self._parse_configuration(configuration), self._fidelity_as_dict(fidelity),
+                                      kwargs])
+            result = getattr(proxy, f'{function_name}_binary')(payload, **self._handle_kwargs())
+            return transport.unpack(result)
 
         kwargs_str = self._parse_kwargs(rng, **kwargs)
         f_str = self._parse_fidelities(fidelity)
@@ -269,7 +374,7 @@ class AbstractBenchmarkClient(metaclass=abc.ABCMeta):
 
         if isinstance(configuration, list):
             c_str = json.dumps(configuration, indent=None)
-            json_str = self.benchmark.objective_function_list(c_str, f_str, kwargs_str)
+            json_str = getattr(proxy, f'{function_name}_list')(c_str, f_str, kwargs_str, **self._handle_kwargs())
             return json.loads(json_str)
         elif isinstance(configuration, CS.Configuration):
             c_str = json.dumps(configuration.get_dictionary(), indent=None)
@@ -278,16 +383,38 @@ class AbstractBenchmarkClient(metaclass=abc.ABCMeta):
         else:
             raise ValueError(f'Type of config not understood: {type(configuration)}')
 
-        json_str = self.benchmark.objective_function(c_str, f_str, kwargs_str)
+        json_str = getattr(proxy, function_name)(c_str, f_str, kwargs_str, **self._handle_kwargs())
         return json.loads(json_str)
 
+    def objective_function(self, configuration: Union[np.ndarray, List, CS.Configuration, Dict],
+                           fidelity: Union[CS.Configuration, Dict, None] = None,
+                           rng: Union[np.random.RandomState, int, None] = None, **kwargs) -> Dict:
+        """
+        Run a given configuration for a given fidelity on the containerized benchmark.
+
+        Serialize the given parameters (binary or json, see ``protocol``) and send them via Pyro to the container.
+        Read the result information and parse them.
+
+        Parameters
+        ----------
+        configuration : np.ndarray, List, CS.Configuration, Dict
+        fidelity : CS.Configuration, Dict, None
+        rng : np.random.RandomState, int, None
+        kwargs : Dict
+
+        Returns
+        -------
+        Dict
+        """
+        return self._query(self.benchmark, 'objective_function', configuration, fidelity, rng, **kwargs)
+
     def objective_function_test(self, configuration: Union[np.ndarray, List, CS.Configuration, Dict],
                                 fidelity: Union[CS.Configuration, Dict, None] = None,
                                 rng: Union[np.random.RandomState, int, None] = None, **kwargs) -> Dict:
         """
         Run a given configuration for a given fidelity on the test function of the containerized  benchmark.
 
-        Convert the given parameters to strings and send them via Pyro to the container.
+        Serialize the given parameters (binary or json, see ``protocol``) and send them via Pyro to the container.
         Read the result information and parse them.
 
         Parameters
@@ -301,26 +428,124 @@ class AbstractBenchmarkClient(metaclass=abc.ABCMeta):
         -------
         Dict
         """
+        return self._query(self.benchmark, 'objective_function_test', configuration, fidelity, rng, **kwargs)
 
-        kwargs_str = self._parse_kwargs(rng=rng, **kwargs)
-        f_str = self._parse_fidelities(fidelity)
+    def objective_function_batch(self, configurations: List[Union[np.ndarray, List, CS.Configuration, Dict]],
+                                 fidelities: Union[List[Dict], Dict, CS.Configuration, None] = None,
+                                 rng: Union[np.random.RandomState, int, None] = None,
+                                 n_workers: int = 1, **kwargs) -> Dict:
+        """
+        Evaluate a batch of configurations on the containerized benchmark with a single call.
 
-        if isinstance(configuration, np.ndarray):
-            configuration = configuration.tolist()
+        All queries are sent to the container in one message and the results are returned in one message. See also
+        :py:func:`~hpolib.abstract_benchmark.AbstractBenchmark.objective_function_batch`.
 
-        if isinstance(configuration, list):
-            c_str = json.dumps(configuration, indent=None)
-            json_str = self.benchmark.objective_function_test_list(c_str, f_str, kwargs_str)
-            return json.loads(json_str)
-        elif isinstance(configuration, CS.Configuration):
-            c_str = json.dumps(configuration.get_dictionary(), indent=None)
-        elif isinstance(configuration, dict):
-            c_str = json.dumps(configuration, indent=None)
+        Parameters
+        ----------
+        configurations : List[np.ndarray, List, CS.Configuration, Dict]
+        fidelities : List[Dict], Dict, CS.Configuration, None
+            Either one fidelity per configuration or a single fidelity, which is then used for all configurations.
+        rng : np.random.RandomState, int, None
+        n_workers : int
+            Number of threads, which evaluate the queries in the container. Use it only for thread-safe benchmarks.
+        kwargs : Dict
+            Passed to every call of the objective function.
 
+        Returns
+        -------
+        Dict
+            Results in a columnar layout: `function_value` and `cost` are np.ndarrays with one entry per
+            configuration. `info` maps each info key to the values of all configurations.
+        """
+        fidelities = AbstractBenchmark._broadcast_fidelities(configurations, fidelities)
+        if rng is not None:
+            kwargs['rng'] = self._cast_random_state_to_int(rng)
+
+        queries = [[self._parse_configuration(configuration), self._fidelity_as_dict(fidelity), kwargs]
+                   for configuration, fidelity in zip(configurations, fidelities)]
+
+        if not self._container_supports('objective_function_batch'):
+            # Older containers don't offer the batch call. Evaluate the configurations one by one.
+            logger.debug('Container does not support objective_function_batch. Fall back to single calls.')
+            results = [self.objective_function(configuration, fidelity=fidelity, **kwargs)
+                       for configuration, fidelity in zip(configurations, fidelities)]
+        elif self.protocol == transport.PROTOCOL:
+            payload = transport.pack([queries, n_workers])
+            results = transport.unpack(
+                self.benchmark.objective_function_batch_binary(payload, **self._handle_kwargs()))
         else:
-            raise ValueError(f'Type of config not understood: {type(configuration)}')
+            json_str = self.benchmark.objective_function_batch(json.dumps(queries, indent=None), n_workers,
+                                                               **self._handle_kwargs())
+            results = json.loads(json_str)
+
+        return AbstractBenchmark._results_to_columns(results)
+
+    def get_learning_curve(self, configuration: Union[np.ndarray, List, CS.Configuration, Dict],
+                           **kwargs) -> Dict[str, np.ndarray]:
+        """
+        Query the learning curves of a configuration with a single call, e.g. for the NAS-Bench-201 benchmarks.
+        See :py:func:`~hpolib.benchmarks.nas.nasbench_201.NasBench201BaseBenchmark.get_learning_curve`
+
+        Parameters
+        ----------
+        configuration : np.ndarray, List, CS.Configuration, Dict
+        kwargs : Dict
+            Arguments of the benchmark's `get_learning_curve`, e.g. data_seed, metrics or epochs.
+
+        Returns
+        -------
+        Dict[str, np.ndarray]
+        """
+        configuration = self._parse_configuration(configuration)
+        epochs = kwargs.get('epochs', None)
+        if isinstance(epochs, slice):
+            kwargs['epochs'] = {'start': epochs.start, 'stop': epochs.stop, 'step': epochs.step}
+
+        if self.protocol == transport.PROTOCOL:
+            payload = transport.pack([configuration, kwargs])
+            return transport.unpack(self.benchmark.get_learning_curve_binary(payload, **self._handle_kwargs()))
+
+        json_str = self.benchmark.get_learning_curve(json.dumps(configuration, indent=None),
+                                                     json.dumps(kwargs, indent=None), **self._handle_kwargs())
+        return {key: np.array(value) for key, value in json.loads(json_str).items()}
+
+    def get_oracle(self, **kwargs) -> Dict:
+        """
+        Return the best function value per fidelity of a tabular benchmark, e.g. to compute the regret.
+        See :py:func:`~hpolib.benchmarks.nas.nasbench_201.NasBench201BaseBenchmark.get_oracle`
+
+        Parameters
+        ----------
+        kwargs : Dict
+            Arguments of the benchmark's `get_oracle`, e.g. data_seed for NAS-Bench-201.
+
+        Returns
+        -------
+        Dict
+        """
+        json_str = self.benchmark.get_oracle(json.dumps(kwargs, indent=None), **self._handle_kwargs())
+        oracle = json.loads(json_str)
+        for key in ['function_value', 'cost']:
+            oracle[key] = np.array(oracle[key], dtype=float)
+        return oracle
+
+    def get_canonical_configuration(self, configuration: Union[np.ndarray, List, CS.Configuration, Dict]) -> Dict:
+        """
+        Map a configuration to the canonical representative of all equivalent configurations, e.g. for the
+        NAS-Bench-201 benchmarks.
+        See :py:func:`~hpolib.benchmarks.nas.nasbench_201.NasBench201BaseBenchmark.get_canonical_configuration`
+
+        Parameters
+        ----------
+        configuration : np.ndarray, List, CS.Configuration, Dict
 
-        json_str = self.benchmark.objective_function_test(c_str, f_str, kwargs_str)
+        Returns
+        -------
+        Dict
+        """
+        configuration = self._parse_configuration(configuration)
+        json_str = self.benchmark.get_canonical_configuration(json.dumps(configuration, indent=None),
+                                                              **self._handle_kwargs())
         return json.loads(json_str)
 
     def get_configuration_space(self, seed: Union[int, None] = None) -> CS.ConfigurationSpace:
@@ -341,7 +566,7 @@ class AbstractBenchmarkClient(metaclass=abc.ABCMeta):
             seed_dict['seed'] = seed
         seed_dict = json.dumps(seed_dict, indent=None)
         logger.debug(f'Client: seed_dict {seed_dict}')
-        json_str = self.benchmark.get_configuration_space(seed_dict)
+        json_str = self.benchmark.get_configuration_space(seed_dict, **self._handle_kwargs())
 
         config_space = csjson.read(json_str)
         if seed is not None:
@@ -366,7 +591,7 @@ class AbstractBenchmarkClient(metaclass=abc.ABCMeta):
             seed_dict['seed'] = seed
         seed_dict = json.dumps(seed_dict, indent=None)
         logger.debug(f'Client: seed_dict {seed_dict}')
-        json_str = self.benchmark.get_fidelity_space(seed_dict)
+        json_str = self.benchmark.get_fidelity_space(seed_dict, **self._handle_kwargs())
 
         fs = csjson.read(json_str)
         if seed is not None:
@@ -376,18 +601,122 @@ class AbstractBenchmarkClient(metaclass=abc.ABCMeta):
 
     def get_meta_information(self) -> Dict:
         """ Return the information about the benchmark. """
-        json_str = self.benchmark.get_meta_information()
+        json_str = self.benchmark.get_meta_information(**self._handle_kwargs())
         return json.loads(json_str)
 
+    def create_benchmark(self, rng: Union[np.random.RandomState, int, None] = None,
+                         **kwargs) -> 'AbstractBenchmarkClient':
+        """
+        Create a further benchmark in the container of this client. It uses the same container and connection as
+        this client, so no further container has to be started. Benchmarks with the same arguments share the loaded
+        data in the container (see `BenchmarkServer.create_benchmark`).
+
+        The created benchmark is removed from the container when it is deleted. The container keeps running until
+        this client and all created benchmarks are deleted.
+
+        Parameters
+        ----------
+        rng : np.random.RandomState, int, None
+        kwargs
+            Further arguments for the benchmark, e.g. the dataset. The container name and the benchmark are the
+            same as for this client.
+
+        Returns
+        -------
+        AbstractBenchmarkClient
+        """
+        if not self._container_supports('create_benchmark'):
+            raise NotImplementedError('The container does not support multiple benchmarks. Please update it.')
+
+        if rng is not None:
+            kwargs['rng'] = rng
+        handle = self.benchmark.create_benchmark(self._parse_benchmark_kwargs(**kwargs))
+
+        benchmark = copy.copy(self)
+        benchmark.handle = handle
+        benchmark._stopped = False
+        # Keep the client, which owns the container, alive.
+        benchmark._container_owner = self if self.handle is None else self._container_owner
+        return benchmark
+
+    def set_worker_pool(self, n_workers: int = 1, kind: Union[str, None] = None) -> Union[str, None]:
+        """
+        Evaluate the objective functions in the container by a pool of `n_workers` threads or processes. Then,
+        concurrent calls to the container, e.g. of `objective_function_batch` or from an AsyncBenchmarkClient with
+        several connections (`n_connections`), are evaluated in parallel. The pool is used by all benchmarks in the
+        container.
+        See :py:func:`~hpolib.container.server_abstract_benchmark.BenchmarkServer.set_worker_pool`
+
+        Parameters
+        ----------
+        n_workers : int
+            If 1, no pool is used.
+        kind : str, None
+            'thread' or 'process'. Defaults to 'thread' for tabular benchmarks and to 'process' otherwise.
+
+        Returns
+        -------
+        str, None
+            The kind of the pool or None if no pool is used.
+        """
+        if not self._container_supports('set_worker_pool'):
+            raise NotImplementedError('The container does not support a worker pool. Please update it.')
+        return self.benchmark.set_worker_pool(n_workers, kind)
+
+    def enable_shared_memory(self, threshold: Union[int, None] = 2**20) -> bool:
+        """
+        Receive large arrays in the results, e.g. learning curves, as read-only memory maps of files in the socket
+        directory instead of via the socket. The container writes each array larger than `threshold` bytes to a file.
+        The client maps the file and removes it immediately, so the data lives as long as the array. Files, which
+        were not read, are removed when the container is stopped. The setting applies to all benchmarks in the
+        container.
+
+        Parameters
+        ----------
+        threshold : int, None
+            Minimum size of an array in bytes. If None, disable it.
+
+        Returns
+        -------
+        bool
+            False if the binary protocol is not used, since the json protocol sends arrays as lists.
+        """
+        if self.protocol != transport.PROTOCOL or not self._container_supports('enable_shared_memory'):
+            logger.debug('Shared memory requires the binary protocol and an updated container.')
+            return False
+        return self.benchmark.enable_shared_memory(threshold)
+
     def __call__(self, configuration: Dict, **kwargs) -> Dict:
         """ Provides interface to use, e.g., SciPy optimizers """
         return self.objective_function(configuration, **kwargs)['function_value']
 
     def __del__(self):
-        self.benchmark.shutdown()
+        # Instances can be stopped explicitly, e.g. by the ContainerPool. Don't stop them a second time.
+        if getattr(self, '_stopped', False):
+            return
+        self._stopped = True
+
+        if getattr(self, 'handle', None) is not None:
+            # This benchmark was created in the container of another client. Only remove the benchmark.
+            try:
+                self.benchmark.destroy_benchmark(self.handle)
+            except Pyro4.errors.CommunicationError as e:
+                logger.debug(f'Could not destroy the benchmark {self.handle}: {e}')
+            return
+
+        try:
+            self.benchmark.shutdown()
+        except Pyro4.errors.CommunicationError as e:
+            # The server has crashed. Stop the instance anyway.
+            logger.debug(f'Could not shut down the server of instance {self.socket_id}: {e}')
         subprocess.run(f'singularity instance stop {self.socket_id}'.split())
         if (self.config.socket_dir / f'{self.socket_id}_unix.sock').exists():
             (self.config.socket_dir / f'{self.socket_id}_unix.sock').unlink()
+        if (self.config.socket_dir / f'{self.socket_id}_ready').exists():
+            (self.config.socket_dir / f'{self.socket_id}_ready').unlink()
+        # Arrays, which were sent by the container but not read (see `enable_shared_memory`)
+        for path in self.config.socket_dir.glob(f'{self.socket_id}_shm_*'):
+            path.unlink()
         # self.benchmark._pyroRelease()
 
     @staticmethod
@@ -0,0 +1,163 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+""" Non-blocking access to containerized benchmarks
+
+The AsyncBenchmarkClient wraps an already started AbstractBenchmarkClient. Calls to the objective functions return
+immediately with a concurrent.futures.Future. The calls are sent to the container by dedicated I/O threads, each of
+which owns its own Pyro4 proxy. Thus, a single process can keep many containers busy at the same time. With several
+I/O threads (`n_connections`), the calls to one container overlap. Then, the container evaluates them in parallel, if
+it has a worker pool (see `AbstractBenchmarkClient.set_worker_pool`).
+
+Usage:
+    benchmark = XGBoostBenchmark(task_id=167149)
+    async_benchmark = AsyncBenchmarkClient(benchmark, timeout=600)
+
+    future = async_benchmark.objective_function(configuration, fidelity={'subsample': 0.5})
+    result = future.result()
+
+    # In a coroutine:
+    result = await asyncio.wrap_future(async_benchmark.objective_function(configuration))
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Union, Dict, List
+
+import ConfigSpace as CS
+import Pyro4
+import numpy as np
+
+from hpolib.container.client_abstract_benchmark import AbstractBenchmarkClient
+
+logger = logging.getLogger('AsyncBenchmarkClient')
+
+
+class AsyncBenchmarkClient(object):
+
+    def __init__(self, client: AbstractBenchmarkClient, timeout: Union[float, None] = None, n_connections: int = 1):
+        """
+        Parameters
+        ----------
+        client : AbstractBenchmarkClient
+            A started containerized benchmark. The container stays owned by this client, e.g. it is stopped when the
+            client is deleted.
+        timeout : float, None
+            Default timeout in seconds for each call. If a call exceeds it, its future raises a
+            Pyro4.errors.TimeoutError. Note that the container finishes the running evaluation anyway.
+            If None, the calls don't time out.
+        n_connections : int
+            Number of I/O threads and thus of concurrent calls to the container. With 1 (default), the calls are sent
+            one after another.
+        """
+        self.client = client
+        self.timeout = timeout
+
+        self._executor = ThreadPoolExecutor(max_workers=n_connections)
+        self._local = threading.local()
+        self._proxies = []
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def objective_function(self, configuration: Union[np.ndarray, List, CS.Configuration, Dict],
+                           fidelity: Union[CS.Configuration, Dict, None] = None,
+                           rng: Union[np.random.RandomState, int, None] = None,
+                           timeout: Union[float, None] = None, **kwargs) -> Future:
+        """
+        Submit a call of the objective function of the containerized benchmark.
+        See :py:func:`~hpolib.container.client_abstract_benchmark.AbstractBenchmarkClient.objective_function`
+
+        Parameters
+        ----------
+        configuration : np.ndarray, List, CS.Configuration, Dict
+        fidelity : CS.Configuration, Dict, None
+        rng : np.random.RandomState, int, None
+        timeout : float, None
+            Timeout in seconds for this call. Defaults to the timeout of the AsyncBenchmarkClient.
+        kwargs : Dict
+
+        Returns
+        -------
+        Future
+            Resolves to the result dictionary. Calls, which are not started yet, can be cancelled with `cancel()`.
+        """
+        return self._submit('objective_function', configuration, fidelity, rng, timeout, **kwargs)
+
+    def objective_function_test(self, configuration: Union[np.ndarray, List, CS.Configuration, Dict],
+                                fidelity: Union[CS.Configuration, Dict, None] = None,
+                                rng: Union[np.random.RandomState, int, None] = None,
+                                timeout: Union[float, None] = None, **kwargs) -> Future:
+        """
+        Submit a call of the test objective function of the containerized benchmark.
+        See :py:func:`~hpolib.container.client_async_benchmark.AsyncBenchmarkClient.objective_function`
+        """
+        return self._submit('objective_function_test', configuration, fidelity, rng, timeout, **kwargs)
+
+    def _submit(self, function_name: str, configuration: Union[np.ndarray, List, CS.Configuration, Dict],
+                fidelity: Union[CS.Configuration, Dict, None], rng: Union[np.random.RandomState, int, None],
+                timeout: Union[float, None], **kwargs) -> Future:
+        # Draw the seed from a random state now. Otherwise, the random state is used concurrently by the I/O threads.
+        if rng is not None:
+            rng = self.client._cast_random_state_to_int(rng)
+        timeout = timeout if timeout is not None else self.timeout
+
+        with self._lock:
+            future = self._executor.submit(self._call, function_name, configuration, fidelity, rng, timeout,
+                                           **kwargs)
+            self._pending.add(future)
+        future.add_done_callback(self._remove_pending)
+        return future
+
+    def _call(self, function_name: str, configuration: Union[np.ndarray, List, CS.Configuration, Dict],
+              fidelity: Union[CS.Configuration, Dict, None], rng: Union[int, None], timeout: Union[float, None],
+              **kwargs) -> Dict:
+        """ Executed by an I/O thread. """
+        proxy = self._get_proxy()
+        proxy._pyroTimeout = timeout
+        try:
+            return self.client._query(proxy, function_name, configuration, fidelity, rng, **kwargs)
+        except Pyro4.errors.TimeoutError:
+            # The answer of the timed out call would be read by the next call. Use a new connection instead.
+            proxy._pyroRelease()
+            raise
+
+    def _get_proxy(self) -> Pyro4.Proxy:
+        # A Pyro4 proxy must not be shared between threads. Thus, each I/O thread creates its own.
+        proxy = getattr(self._local, 'proxy', None)
+        if proxy is None:
+            proxy = Pyro4.Proxy(self.client.uri)
+            proxy._pyroSerializer = self.client.benchmark._pyroSerializer
+            self._local.proxy = proxy
+            with self._lock:
+                self._proxies.append(proxy)
+        return proxy
+
+    def _remove_pending(self, future: Future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def cancel_pending(self) -> int:
+        """ Cancel all calls, which are not started yet. Returns the number of cancelled calls. """
+        with self._lock:
+            pending = list(self._pending)
+        return sum(future.cancel() for future in pending)
+
+    def close(self, wait: bool = True):
+        """
+        Cancel the calls, which are not started yet, and stop the I/O threads. The wrapped client and its container
+        are not stopped.
+        """
+        self.cancel_pending()
+        with self._lock:
+            proxies = list(self._proxies)
+        # Releasing a proxy waits for its running call. Thus, release them after the running calls in the I/O threads.
+        for proxy in proxies:
+            self._executor.submit(proxy._pyroRelease)
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
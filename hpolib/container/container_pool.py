@@ -0,0 +1,294 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+""" Pool of started containers
+
+Starting a container takes from seconds up to minutes. The ContainerPool keeps started instances of containerized
+benchmarks and leases them to the callers. Instances are grouped by the benchmark class and the arguments of the
+benchmark, so that an instance is only reused for the same benchmark. Each group holds up to `size` instances.
+
+Usage:
+    pool = ContainerPool(size=2)
+    pool.warm_up(CartpoleReduced, rng=1)  # Starts the containers in the background
+
+    with pool.lease(CartpoleReduced, rng=1) as benchmark:
+        result = benchmark.objective_function(configuration, fidelity={'budget': 5})
+
+    pool.close()
+
+Before an instance is leased, it is checked whether it is still responding. Instances which crashed during a lease are
+stopped and replaced in the background.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from contextlib import contextmanager
+from typing import Union, Dict, List, Type, Tuple
+
+import Pyro4
+
+from hpolib.container.client_abstract_benchmark import AbstractBenchmarkClient
+
+logger = logging.getLogger('ContainerPool')
+
+
+class _InstanceGroup(object):
+    """ The instances of a benchmark with the same arguments. """
+    def __init__(self, benchmark_class: Type[AbstractBenchmarkClient], kwargs: Dict):
+        self.benchmark_class = benchmark_class
+        self.kwargs = kwargs
+        self.idle = deque()
+        self.uses = {}
+        self.n_instances = 0
+
+
+class ContainerPool(object):
+
+    def __init__(self, size: int = 1, health_check: bool = True, health_check_timeout: float = 30,
+                 max_uses: Union[int, None] = None):
+        """
+        Parameters
+        ----------
+        size : int
+            Maximum number of instances per benchmark and arguments.
+        health_check : bool
+            If True, check before each lease that the instance is still responding (via `get_meta_information`).
+        health_check_timeout : float
+            Timeout for the health check in seconds.
+        max_uses : int, None
+            If given, instances are replaced after they were leased `max_uses` times.
+        """
+        assert size >= 1, 'The pool has to hold at least one instance'
+
+        self.size = size
+        self.health_check = health_check
+        self.health_check_timeout = health_check_timeout
+        self.max_uses = max_uses
+
+        self._groups = {}
+        self._leased = {}
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=size)
+        self._closed = False
+
+    def warm_up(self, benchmark_class: Type[AbstractBenchmarkClient], n_instances: Union[int, None] = None,
+                wait: bool = False, **kwargs) -> List[Future]:
+        """
+        Start instances in the background, so that a later `lease` does not have to wait for them.
+
+        Parameters
+        ----------
+        benchmark_class : Type[AbstractBenchmarkClient]
+            E.g. hpolib.container.benchmarks.rl.cartpole.CartpoleReduced
+        n_instances : int, None
+            Number of instances to start. It is capped such that the group holds at most `size` instances.
+            Defaults to `size`.
+        wait : bool
+            If True, block until the instances are started.
+        kwargs
+            Arguments for the benchmark, e.g. rng or container_source.
+
+        Returns
+        -------
+        List[Future]
+        """
+        n_instances = n_instances if n_instances is not None else self.size
+
+        with self._condition:
+            group = self._get_group(benchmark_class, kwargs)
+            futures = [self._start_in_background(group)
+                       for _ in range(min(n_instances, self.size - group.n_instances))]
+
+        if wait:
+            for future in futures:
+                future.result()
+        return futures
+
+    @contextmanager
+    def lease(self, benchmark_class: Type[AbstractBenchmarkClient], timeout: Union[float, None] = None, **kwargs):
+        """
+        Context manager to lease an instance of the benchmark. If the instance crashes (a Pyro4 communication error)
+        during the lease, it is stopped and replaced.
+
+        Parameters
+        ----------
+        benchmark_class : Type[AbstractBenchmarkClient]
+        timeout : float, None
+            Maximum time in seconds to wait for a free instance. Raises a TimeoutError if exceeded.
+        kwargs
+            Arguments for the benchmark.
+        """
+        client = self.acquire(benchmark_class, timeout=timeout, **kwargs)
+        broken = False
+        try:
+            yield client
+        except Pyro4.errors.CommunicationError:
+            broken = True
+            raise
+        finally:
+            self.release(client, broken=broken)
+
+    def acquire(self, benchmark_class: Type[AbstractBenchmarkClient], timeout: Union[float, None] = None,
+                **kwargs) -> AbstractBenchmarkClient:
+        """
+        Lease an instance of the benchmark. Prefer the context manager `lease`. An acquired instance has to be given
+        back with `release`.
+
+        If there is no idle instance and the group is not full yet, a new instance is started by the caller.
+        Otherwise, the call blocks until an instance is released.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise RuntimeError('The pool is closed')
+
+                group = self._get_group(benchmark_class, kwargs)
+                client = None
+                while len(group.idle) == 0 and group.n_instances >= self.size:
+                    remaining = deadline - time.time() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(f'No instance of {benchmark_class.__name__} available after {timeout}s')
+                    self._condition.wait(remaining)
+
+                if len(group.idle) != 0:
+                    client = group.idle.popleft()
+                else:
+                    group.n_instances += 1
+
+            if client is None:
+                client = self._start(group)
+            elif self.health_check and not self._is_healthy(client):
+                logger.warning(f'Instance {client.socket_id} of {benchmark_class.__name__} is not responding. '
+                               f'Replace it.')
+                self._remove(group, client, replace=True)
+                continue
+
+            self._claim(client)
+            with self._condition:
+                self._leased[id(client)] = group
+            return client
+
+    def release(self, client: AbstractBenchmarkClient, broken: bool = False):
+        """
+        Give a leased instance back to the pool.
+
+        Parameters
+        ----------
+        client : AbstractBenchmarkClient
+        broken : bool
+            If True, the instance is stopped and replaced by a new one.
+        """
+        with self._condition:
+            group = self._leased.pop(id(client))
+            group.uses[id(client)] = group.uses.get(id(client), 0) + 1
+            worn_out = self.max_uses is not None and group.uses[id(client)] >= self.max_uses
+
+            if not (broken or worn_out or self._closed):
+                group.idle.append(client)
+                self._condition.notify_all()
+                return
+
+        if broken:
+            logger.warning(f'Instance {client.socket_id} crashed. Replace it.')
+        self._remove(group, client, replace=not self._closed)
+
+    def close(self):
+        """ Stop all idle instances. Leased instances are stopped when they are released. """
+        with self._condition:
+            self._closed = True
+            idle = [(group, group.idle.popleft()) for group in self._groups.values() for _ in range(len(group.idle))]
+            self._condition.notify_all()
+
+        for group, client in idle:
+            self._remove(group, client, replace=False)
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _get_group(self, benchmark_class: Type[AbstractBenchmarkClient], kwargs: Dict) -> _InstanceGroup:
+        key = self._get_key(benchmark_class, kwargs)
+        if key not in self._groups:
+            self._groups[key] = _InstanceGroup(benchmark_class, kwargs)
+        return self._groups[key]
+
+    @staticmethod
+    def _get_key(benchmark_class: Type[AbstractBenchmarkClient], kwargs: Dict) -> Tuple[str, str]:
+        # Objects which are not json serializable, e.g. a random state, are compared by their identity.
+        return f'{benchmark_class.__module__}.{benchmark_class.__qualname__}', \
+            json.dumps(kwargs, sort_keys=True, default=repr)
+
+    def _start(self, group: _InstanceGroup) -> AbstractBenchmarkClient:
+        """ Start an instance. The caller has already reserved a place in the group. """
+        try:
+            return group.benchmark_class(**group.kwargs)
+        except Exception:
+            with self._condition:
+                group.n_instances -= 1
+                self._condition.notify_all()
+            raise
+
+    def _start_in_background(self, group: _InstanceGroup) -> Future:
+        """ Reserve a place in the group and start the instance in a background thread. Requires the lock. """
+        group.n_instances += 1
+
+        def start():
+            try:
+                client = self._start(group)
+            except Exception as e:
+                logger.exception(e)
+                raise
+
+            with self._condition:
+                if not self._closed:
+                    group.idle.append(client)
+                    self._condition.notify_all()
+                    return
+            self._remove(group, client, replace=False)
+
+        return self._executor.submit(start)
+
+    def _remove(self, group: _InstanceGroup, client: AbstractBenchmarkClient, replace: bool):
+        """ Stop an instance and, if requested, start a new one in the background. """
+        self._claim(client)
+        try:
+            client.__del__()
+        except Exception as e:
+            logger.debug(f'Exception while stopping the instance {client.socket_id}: {e}')
+
+        with self._condition:
+            group.uses.pop(id(client), None)
+            group.n_instances -= 1
+            if replace and not self._closed:
+                self._start_in_background(group)
+            self._condition.notify_all()
+
+    def _is_healthy(self, client: AbstractBenchmarkClient) -> bool:
+        self._claim(client)
+        proxy = client.benchmark
+        timeout = proxy._pyroTimeout
+        proxy._pyroTimeout = self.health_check_timeout
+        try:
+            client.get_meta_information()
+            return True
+        except Exception as e:
+            logger.debug(f'Health check of instance {client.socket_id} failed: {e}')
+            return False
+        finally:
+            proxy._pyroTimeout = timeout
+
+    @staticmethod
+    def _claim(client: AbstractBenchmarkClient):
+        # Pyro4 proxies belong to the thread which created them. Instances are started and used by different threads.
+        claim_ownership = getattr(client.benchmark, '_pyroClaimOwnership', None)
+        if claim_ownership is not None:
+            claim_ownership()
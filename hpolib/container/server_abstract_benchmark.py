@@ -7,19 +7,32 @@ BenchmarkServer defines the server side for the communication between the
 container (benchmark) and the client.
 It starts the Pyro4 server and awaits commands from the client. Make sure
 that all payloads are json-serializable.
+
+If the client supports it, the objective functions are also available via a binary protocol, which sends NumPy arrays
+as raw buffers (see hpolib.container.transport).
+
+Besides the benchmark created by `init_benchmark`, the server can host further benchmarks, which are addressed by a
+handle (see `create_benchmark`).
 """
 
 import argparse
+import copy
 import enum
 import json
 import logging
 import os
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Union, List, Dict
+from uuid import uuid1
 
 import Pyro4
 import numpy as np
 from ConfigSpace.read_and_write import json as csjson
 
 from hpolib.config import HPOlibConfig
+from hpolib.container import transport
+from hpolib.util import rng_helper
 
 # Read in the verbosity level from the environment variable HPOLIB_DEBUG
 log_level_str = os.environ.get('HPOLIB_DEBUG', 'false')
@@ -42,6 +55,16 @@ class BenchmarkEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, obj)
 
 
+# The benchmarks of the server. Processes of the worker pool inherit them when they are forked. See `set_worker_pool`.
+_worker_benchmarks = {}
+
+
+def _evaluate_in_worker(handle: Union[str, None], function_name: str, configuration: Union[Dict, List],
+                        fidelity: Dict, kwargs: Dict) -> Dict:
+    benchmark = _worker_benchmarks[handle]
+    return getattr(benchmark, function_name)(configuration=configuration, fidelity=fidelity, **kwargs)
+
+
 @Pyro4.expose
 @Pyro4.behavior(instance_mode="single")
 class BenchmarkServer:
@@ -50,7 +73,22 @@ class BenchmarkServer:
         config = HPOlibConfig()
         self.benchmark = None
 
+        # Further benchmarks, which are created by the client via `create_benchmark`. See there.
+        self.benchmarks = {}
+        self._shared = {}
+        self._registry_lock = threading.Lock()
+
+        # Optional pool of workers for the objective functions. See `set_worker_pool`.
+        self._worker_pool = None
+        self._worker_pool_kind = None
+        self._worker_pool_size = 1
+        self._worker_pool_stale = False
+
+        # Large arrays in the results are sent via files, if enabled. See `enable_shared_memory`.
+        self._shared_arrays = None
+
         self.socket_id = socket_id
+        self.socket_dir = config.socket_dir
         socket_path = config.socket_dir / (self.socket_id + "_unix.sock")
         if socket_path.exists():
             os.remove(socket_path)
@@ -58,6 +96,13 @@ class BenchmarkServer:
 
         _ = self.daemon.register(self, self.socket_id + ".unixsock")
 
+        # Signal the client that the server accepts calls. The file is created atomically, so the client does not have
+        # to poll the socket.
+        self.ready_file = config.socket_dir / (self.socket_id + "_ready")
+        tmp_file = config.socket_dir / (self.socket_id + "_ready.tmp")
+        tmp_file.write_text(str(os.getpid()))
+        os.replace(str(tmp_file), str(self.ready_file))
+
         # start the event loop of the server to wait for calls
         self.daemon.requestLoop(loopCondition=lambda: self.pyroRunning)
 
@@ -73,75 +118,365 @@ class BenchmarkServer:
                 self.benchmark = Benchmark(**kwargs)  # noqa: F821
             else:
                 self.benchmark = Benchmark()  # noqa: F821
+            self._worker_pool_stale = True
             logger.info('Server: Connected Successfully')
         except Exception as e:
             logger.exception(e)
 
-    def get_configuration_space(self, kwargs_str: str) -> str:
+    def create_benchmark(self, kwargs_str: str) -> str:
+        """
+        Create a further benchmark in this server and return its handle. The handle addresses the benchmark in the
+        other calls. Thus, a client can use many benchmarks via one container and one connection. The benchmark,
+        which was created by `init_benchmark`, has the handle None.
+
+        Benchmarks with the same arguments share the loaded data: The benchmark is constructed once as template, which
+        is never handed out. Each handle gets a shallow copy of it with its own copies of the mutable attributes (see
+        `AbstractBenchmark._instance_attributes`), e.g. the random state and the caches. If the benchmark class sets
+        `_rng_independent_data`, this holds also for benchmarks with different random states. Otherwise, benchmarks
+        without a fixed random state are always constructed.
+        """
+        logger.debug(f'Server: create_benchmark: kwargs_str: {kwargs_str}')
+
+        kwargs = json.loads(kwargs_str)
+        rng_value = kwargs.pop('rng', None)
+        rng = rng_value
+        if isinstance(rng_value, list):
+            (rnd0, rnd1, rnd2, rnd3, rnd4) = rng_value
+            rng = np.random.RandomState()
+            rng.set_state((rnd0, np.array(rnd1, dtype=np.uint32), rnd2, rnd3, rnd4))
+
+        rng_independent = getattr(Benchmark, '_rng_independent_data', False)  # noqa: F821
+        shareable = rng_independent or rng_value is not None
+        key = json.dumps([kwargs, None if rng_independent else rng_value], sort_keys=True)
+
+        with self._registry_lock:
+            if shareable:
+                if key not in self._shared:
+                    self._shared[key] = Benchmark(rng=rng, **kwargs)  # noqa: F821
+                benchmark = self._copy_benchmark(self._shared[key])
+                if rng_independent:
+                    benchmark.rng = rng_helper.get_rng(rng)
+            else:
+                benchmark = Benchmark(rng=rng, **kwargs)  # noqa: F821
+
+            handle = str(uuid1())
+            self.benchmarks[handle] = (key, benchmark)
+            self._worker_pool_stale = True
+
+        logger.debug(f'Server: Created benchmark {handle}. Number of benchmarks: {len(self.benchmarks)}')
+        return handle
+
+    @staticmethod
+    def _copy_benchmark(template):
+        """ Copy a benchmark, which shares the loaded data with the template, but not its mutable attributes. """
+        benchmark = copy.copy(template)
+        for attribute in getattr(template, '_instance_attributes', ('rng',)):
+            if hasattr(template, attribute):
+                setattr(benchmark, attribute, copy.deepcopy(getattr(template, attribute)))
+        return benchmark
+
+    def destroy_benchmark(self, handle: str):
+        """ Remove a benchmark, which was created by `create_benchmark`. """
+        logger.debug(f'Server: destroy_benchmark: handle: {handle}')
+
+        with self._registry_lock:
+            key, _ = self.benchmarks.pop(handle)
+            if all(key != other_key for other_key, _ in self.benchmarks.values()):
+                self._shared.pop(key, None)
+
+    def _get_benchmark(self, handle: Union[str, None] = None):
+        return self.benchmark if handle is None else self.benchmarks[handle][1]
+
+    def get_configuration_space(self, kwargs_str: str, handle: Union[str, None] = None) -> str:
         logger.debug(f'Server: get_config_space: kwargs_str: {kwargs_str}')
 
         kwargs = json.loads(kwargs_str)
         seed = kwargs.get('seed', None)
 
-        result = self.benchmark.get_configuration_space(seed=seed)
+        result = self._get_benchmark(handle).get_configuration_space(seed=seed)
         logger.debug(f'Server: Configspace: {result}')
         return csjson.write(result, indent=None)
 
-    def get_fidelity_space(self, kwargs_str: str) -> str:
+    def get_fidelity_space(self, kwargs_str: str, handle: Union[str, None] = None) -> str:
         logger.debug(f'Server: get_fidelity_space: kwargs_str: {kwargs_str}')
 
         kwargs = json.loads(kwargs_str)
         seed = kwargs.get('seed', None)
 
-        result = self.benchmark.get_fidelity_space(seed=seed)
+        result = self._get_benchmark(handle).get_fidelity_space(seed=seed)
         logger.debug(f'Server: Fidelity Space: {result}')
         return csjson.write(result, indent=None)
 
-    def objective_function_list(self, c_str: str, f_str: str, kwargs_str: str) -> str:
+    def objective_function_list(self, c_str: str, f_str: str, kwargs_str: str,
+                                handle: Union[str, None] = None) -> str:
         configuration = json.loads(c_str)
         fidelity = json.loads(f_str)
         kwargs = json.loads(kwargs_str)
 
-        result = self.benchmark.objective_function(configuration=configuration, fidelity=fidelity, **kwargs)
+        result = self._evaluate(handle, 'objective_function', configuration, fidelity, kwargs)
         return json.dumps(result, indent=None, cls=BenchmarkEncoder)
 
-    def objective_function_test_list(self, c_str: str, f_str: str, kwargs_str: str) -> str:
+    def objective_function_test_list(self, c_str: str, f_str: str, kwargs_str: str,
+                                     handle: Union[str, None] = None) -> str:
         configuration = json.loads(c_str)
         fidelity = json.loads(f_str)
         kwargs = json.loads(kwargs_str)
 
-        result = self.benchmark.objective_function_test(configuration=configuration, fidelity=fidelity, **kwargs)
+        result = self._evaluate(handle, 'objective_function_test', configuration, fidelity, kwargs)
         return json.dumps(result, indent=None, cls=BenchmarkEncoder)
 
-    def objective_function(self, c_str: str, f_str: str, kwargs_str: str) -> str:
+    def objective_function(self, c_str: str, f_str: str, kwargs_str: str, handle: Union[str, None] = None) -> str:
         logger.debug(f'Server: objective_function: c_str: {c_str} f_str: {f_str} kwargs_str: {kwargs_str}')
 
         configuration = json.loads(c_str)
         fidelity = json.loads(f_str)
         kwargs = json.loads(kwargs_str)
 
-        result = self.benchmark.objective_function(configuration=configuration, fidelity=fidelity, **kwargs)
+        result = self._evaluate(handle, 'objective_function', configuration, fidelity, kwargs)
         return json.dumps(result, indent=None, cls=BenchmarkEncoder)
 
-    def objective_function_test(self, c_str: str, f_str: str, kwargs_str: str) -> str:
+    def objective_function_test(self, c_str: str, f_str: str, kwargs_str: str,
+                                handle: Union[str, None] = None) -> str:
         logger.debug(f'Server: objective_function: c_str: {c_str} f_str: {f_str} kwargs_str: {kwargs_str}')
 
         configuration = json.loads(c_str)
         fidelity = json.loads(f_str)
         kwargs = json.loads(kwargs_str)
 
-        result = self.benchmark.objective_function_test(configuration=configuration, fidelity=fidelity, **kwargs)
+        result = self._evaluate(handle, 'objective_function_test', configuration, fidelity, kwargs)
+        return json.dumps(result, indent=None, cls=BenchmarkEncoder)
+
+    def objective_function_batch(self, queries_str: str, n_workers: int = 1, handle: Union[str, None] = None) -> str:
+        logger.debug(f'Server: objective_function_batch: n_workers: {n_workers}')
+
+        queries = json.loads(queries_str)
+        results = self._evaluate_batch(handle, queries, n_workers)
+        return json.dumps(results, indent=None, cls=BenchmarkEncoder)
+
+    def objective_function_batch_binary(self, payload: bytes, handle: Union[str, None] = None) -> bytes:
+        logger.debug('Server: objective_function_batch_binary')
+
+        queries, n_workers = transport.unpack(payload)
+        results = self._evaluate_batch(handle, queries, n_workers)
+        return transport.pack(results, self._shared_arrays)
+
+    def _evaluate_batch(self, handle: Union[str, None], queries: List, n_workers: int = 1) -> List[Dict]:
+        """
+        Evaluate a list of queries (configuration, fidelity, kwargs) with the objective function. If a worker pool is
+        set (see `set_worker_pool`), the queries are distributed over its workers. Otherwise, if `n_workers` is
+        larger than 1, they are distributed over a thread pool. This requires a thread-safe benchmark, e.g. a
+        tabular benchmark or a benchmark, which releases the GIL during training.
+        """
+        if self._worker_pool_kind is not None:
+            futures = [self._submit(handle, 'objective_function', *query) for query in queries]
+            return [future.result() for future in futures]
+
+        benchmark = self._get_benchmark(handle)
+
+        def evaluate(query):
+            configuration, fidelity, kwargs = query
+            return benchmark.objective_function(configuration=configuration, fidelity=fidelity, **kwargs)
+
+        if n_workers is None or n_workers <= 1 or len(queries) <= 1:
+            return [evaluate(query) for query in queries]
+
+        with ThreadPoolExecutor(max_workers=min(n_workers, len(queries))) as pool:
+            return list(pool.map(evaluate, queries))
+
+    def set_worker_pool(self, n_workers: int = 1, kind: Union[str, None] = None) -> Union[str, None]:
+        """
+        Evaluate the objective functions in a pool of `n_workers` workers. Then, concurrent calls, e.g. from many
+        clients or of `objective_function_batch`, are evaluated in parallel.
+
+        Parameters
+        ----------
+        n_workers : int
+            Number of workers. If it is 1, the calls are evaluated directly by the server (default).
+        kind : str, None
+            'thread' or 'process'. Threads suffice for tabular benchmarks, which only look up the results. CPU-bound
+            benchmarks, like the XGBoostBenchmark, need processes. The processes are forked from the server after the
+            benchmarks are loaded, so they don't load the data again. Since each process has a copy of the random
+            state, the server draws a seed for each call, which is sent without `rng`.
+            The processes don't share any other state of the benchmarks with the server or with each other. Thus,
+            calls which read or change this state, e.g. which shuffle the data or use a cache, are evaluated by the
+            server itself (see `AbstractBenchmark._uses_instance_state`).
+            Defaults to 'thread' for benchmarks, which set `_deterministic`, and to 'process' otherwise.
+
+        Returns
+        -------
+        str, None
+            The kind of the pool or None if no pool is used.
+        """
+        if kind is None:
+            kind = 'thread' if getattr(Benchmark, '_deterministic', False) else 'process'  # noqa: F821
+        assert kind in ['thread', 'process'], f'Unknown kind of worker pool: {kind}'
+
+        with self._registry_lock:
+            self._shutdown_worker_pool()
+            if n_workers > 1:
+                self._worker_pool_kind = kind
+                self._worker_pool_size = n_workers
+
+        logger.info(f'Server: Worker pool: {self._worker_pool_kind}, number of workers: {n_workers}')
+        return self._worker_pool_kind
+
+    def _shutdown_worker_pool(self):
+        """ Requires the registry lock. """
+        if self._worker_pool is not None:
+            self._worker_pool.shutdown(wait=False)
+        self._worker_pool = None
+        self._worker_pool_kind = None
+
+    def _get_worker_pool(self) -> Executor:
+        """ Requires the registry lock. Starts the pool if necessary. """
+        if self._worker_pool_kind == 'process' and self._worker_pool_stale and self._worker_pool is not None:
+            # The processes don't know the benchmarks, which were created after they were forked.
+            self._worker_pool.shutdown(wait=False)
+            self._worker_pool = None
+
+        if self._worker_pool is None:
+            if self._worker_pool_kind == 'thread':
+                self._worker_pool = ThreadPoolExecutor(max_workers=self._worker_pool_size)
+            else:
+                # The workers inherit the benchmarks of the server when they are forked.
+                global _worker_benchmarks
+                _worker_benchmarks = {handle: benchmark for handle, (_, benchmark) in self.benchmarks.items()}
+                _worker_benchmarks[None] = self.benchmark
+                self._worker_pool = ProcessPoolExecutor(max_workers=self._worker_pool_size)
+            self._worker_pool_stale = False
+        return self._worker_pool
+
+    def _submit(self, handle: Union[str, None], function_name: str, configuration: Union[Dict, List],
+                fidelity: Dict, kwargs: Dict) -> Future:
+        """ Submit a call of an objective function to the worker pool. """
+        benchmark = self._get_benchmark(handle)
+        uses_instance_state = getattr(benchmark, '_uses_instance_state', None)
+        if self._worker_pool_kind == 'process' and uses_instance_state is not None and uses_instance_state(**kwargs):
+            return self._evaluate_on_server(benchmark, function_name, configuration, fidelity, kwargs)
+
+        with self._registry_lock:
+            pool = self._get_worker_pool()
+
+        if self._worker_pool_kind == 'thread':
+            return pool.submit(getattr(benchmark, function_name),
+                               configuration=configuration, fidelity=fidelity, **kwargs)
+
+        # Otherwise, all processes would draw the same random numbers from their copy of the random state.
+        if kwargs.get('rng', None) is None:
+            kwargs = dict(kwargs, rng=int(benchmark.rng.randint(0, 2**31 - 1)))
+        return pool.submit(_evaluate_in_worker, handle, function_name, configuration, fidelity, kwargs)
+
+    def _evaluate_on_server(self, benchmark, function_name: str, configuration: Union[Dict, List], fidelity: Dict,
+                            kwargs: Dict) -> Future:
+        """
+        Evaluate a call, which reads or changes the state of the benchmark, by the server instead of by a process of
+        the worker pool. The processes are forked again for the next call, so that they inherit the changed state.
+        """
+        future = Future()
+        try:
+            future.set_result(getattr(benchmark, function_name)(configuration=configuration, fidelity=fidelity,
+                                                                **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+
+        with self._registry_lock:
+            self._worker_pool_stale = True
+        return future
+
+    def _evaluate(self, handle: Union[str, None], function_name: str, configuration: Union[Dict, List],
+                  fidelity: Dict, kwargs: Dict) -> Dict:
+        """ Call an objective function of a benchmark. Uses the worker pool if it is set. """
+        if self._worker_pool_kind is not None:
+            return self._submit(handle, function_name, configuration, fidelity, kwargs).result()
+
+        benchmark = self._get_benchmark(handle)
+        return getattr(benchmark, function_name)(configuration=configuration, fidelity=fidelity, **kwargs)
+
+    def transport_protocols(self) -> List[str]:
+        """ Returns the protocols, which are supported by this server. Json is always available. """
+        return [transport.PROTOCOL, 'json'] if transport.is_available() else ['json']
+
+    def objective_function_binary(self, payload: bytes, handle: Union[str, None] = None) -> bytes:
+        logger.debug('Server: objective_function_binary')
+
+        configuration, fidelity, kwargs = transport.unpack(payload)
+        result = self._evaluate(handle, 'objective_function', configuration, fidelity, kwargs)
+        return transport.pack(result, self._shared_arrays)
+
+    def objective_function_test_binary(self, payload: bytes, handle: Union[str, None] = None) -> bytes:
+        logger.debug('Server: objective_function_test_binary')
+
+        configuration, fidelity, kwargs = transport.unpack(payload)
+        result = self._evaluate(handle, 'objective_function_test', configuration, fidelity, kwargs)
+        return transport.pack(result, self._shared_arrays)
+
+    def get_learning_curve(self, c_str: str, kwargs_str: str, handle: Union[str, None] = None) -> str:
+        """ Query the learning curves of a configuration, if the benchmark offers `get_learning_curve`. """
+        logger.debug(f'Server: get_learning_curve: c_str: {c_str} kwargs_str: {kwargs_str}')
+
+        configuration = json.loads(c_str)
+        kwargs = self._parse_learning_curve_kwargs(json.loads(kwargs_str))
+        result = self._get_benchmark(handle).get_learning_curve(configuration=configuration, **kwargs)
+        return json.dumps(result, indent=None, cls=BenchmarkEncoder)
+
+    def get_learning_curve_binary(self, payload: bytes, handle: Union[str, None] = None) -> bytes:
+        logger.debug('Server: get_learning_curve_binary')
+
+        configuration, kwargs = transport.unpack(payload)
+        kwargs = self._parse_learning_curve_kwargs(kwargs)
+        result = self._get_benchmark(handle).get_learning_curve(configuration=configuration, **kwargs)
+        return transport.pack(result, self._shared_arrays)
+
+    def get_oracle(self, kwargs_str: str, handle: Union[str, None] = None) -> str:
+        """ Return the best function value per fidelity, if the benchmark is tabular. """
+        logger.debug(f'Server: get_oracle: kwargs_str: {kwargs_str}')
+
+        kwargs = json.loads(kwargs_str)
+        result = self._get_benchmark(handle).get_oracle(**kwargs)
+        return json.dumps(result, indent=None, cls=BenchmarkEncoder)
+
+    def get_canonical_configuration(self, c_str: str, handle: Union[str, None] = None) -> str:
+        """ Map a configuration to its canonical representative, if the benchmark offers this. """
+        logger.debug(f'Server: get_canonical_configuration: c_str: {c_str}')
+
+        configuration = json.loads(c_str)
+        result = self._get_benchmark(handle).get_canonical_configuration(configuration=configuration)
         return json.dumps(result, indent=None, cls=BenchmarkEncoder)
 
-    def get_meta_information(self):
+    @staticmethod
+    def _parse_learning_curve_kwargs(kwargs: Dict) -> Dict:
+        """ The client sends a slice of epochs as dictionary. """
+        if isinstance(kwargs.get('epochs', None), dict):
+            kwargs['epochs'] = slice(kwargs['epochs']['start'], kwargs['epochs']['stop'], kwargs['epochs']['step'])
+        return kwargs
+
+    def enable_shared_memory(self, threshold: Union[int, None] = 2**20) -> bool:
+        """
+        Send arrays in the results of the binary protocol, which are larger than `threshold` bytes, as memory-mapped
+        files in the socket directory instead of via the socket. If `threshold` is None, disable it.
+        Returns False if the binary protocol is not available.
+        """
+        if not transport.is_available():
+            return False
+
+        self._shared_arrays = None if threshold is None \
+            else transport.SharedArrayWriter(self.socket_dir, f'{self.socket_id}_shm_', threshold)
+        logger.debug(f'Server: Send arrays larger than {threshold} bytes via files')
+        return True
+
+    def get_meta_information(self, handle: Union[str, None] = None):
         logger.debug('Server: get_meta_info called')
-        return json.dumps(self.benchmark.get_meta_information(), indent=None)
+        return json.dumps(self._get_benchmark(handle).get_meta_information(), indent=None)
 
     @Pyro4.oneway   # in case call returns much later than daemon.shutdown
     def shutdown(self):
         logger.debug('Server: Shutting down...')
         Pyro4.config.COMMTIMEOUT = 0.5
         self.pyroRunning = False
+        with self._registry_lock:
+            self._shutdown_worker_pool()
+        if self.ready_file.exists():
+            self.ready_file.unlink()
         self.daemon.shutdown()
 
 
@@ -0,0 +1,120 @@
+""" Binary transport for the communication between the BenchmarkServer and the AbstractBenchmarkClient.
+
+The payloads are packed with msgpack. NumPy arrays are sent as a msgpack extension type, which contains the dtype, the
+shape and the raw buffer of the array. Thus, they are not converted to (nested) lists as with json. On the receiving
+side, the arrays are read-only views on the received buffer. NumPy scalars are sent as their Python equivalent and
+enums as string, as with the json encoder of the server.
+
+Client and server negotiate the protocol on connect (see `BenchmarkServer.transport_protocols`). If msgpack is not
+installed on one side or the container does not support it yet, json is used.
+
+Large arrays can bypass the socket: The server writes them to .npy files in the socket directory and sends only their
+path (see `SharedArrayWriter`). The client maps the files as read-only memory maps and removes them right away. Thus,
+the data stays available until the array is garbage collected, but no file is left behind.
+"""
+
+import base64
+import enum
+import functools
+import os
+from pathlib import Path
+from typing import Any, Union, Dict
+from uuid import uuid4
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+PROTOCOL = 'msgpack'
+NUMPY_EXT_TYPE = 1
+SHARED_ARRAY_EXT_TYPE = 2
+
+
+class SharedArrayWriter(object):
+    def __init__(self, directory: Union[str, Path], prefix: str, threshold: int):
+        """
+        Writes arrays, which are larger than `threshold`, to files instead of sending them via the socket.
+
+        Parameters
+        ----------
+        directory : str, Path
+            Directory, which is visible to the client and the container, e.g. the socket directory.
+        prefix : str
+            Prefix of the files. Allows to remove files, which were not read by the client.
+        threshold : int
+            Minimum size of an array in bytes.
+        """
+        assert threshold > 0, 'Arrays of size 0 can not be memory-mapped'
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.threshold = threshold
+
+    def write(self, array: np.ndarray) -> str:
+        """ Write the array to a new file and return its path. """
+        path = self.directory / f'{self.prefix}{uuid4().hex}.npy'
+        np.save(str(path), array)
+        return str(path)
+
+
+def is_available() -> bool:
+    """ Returns True if msgpack is installed. """
+    return msgpack is not None
+
+
+def pack(obj: Any, shared_arrays: Union[SharedArrayWriter, None] = None) -> bytes:
+    """
+    Serialize an object, e.g. the arguments or the result of an objective function. If `shared_arrays` is given,
+    large arrays are written to files.
+    """
+    return msgpack.packb(obj, default=functools.partial(_encode, shared_arrays=shared_arrays), use_bin_type=True)
+
+
+def unpack(data: Union[bytes, Dict]) -> Any:
+    """ Deserialize an object, which was packed with `pack`. """
+    return msgpack.unpackb(to_bytes(data), ext_hook=_decode, raw=False, strict_map_key=False)
+
+
+def to_bytes(data: Union[bytes, bytearray, memoryview, Dict]) -> bytes:
+    """
+    Helper function to get the raw bytes of a Pyro4 message. Pyro's serpent serializer transfers bytes as dictionary
+    {'data': <base64 encoded>, 'encoding': 'base64'}. The marshal serializer transfers them as they are.
+    """
+    if isinstance(data, dict) and data.get('encoding') == 'base64':
+        return base64.b64decode(data['data'])
+    if isinstance(data, (bytearray, memoryview)):
+        return bytes(data)
+    return data
+
+
+def _encode(obj: Any, shared_arrays: Union[SharedArrayWriter, None] = None) -> Any:
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.hasobject:
+            return obj.tolist()
+        if shared_arrays is not None and obj.nbytes >= shared_arrays.threshold:
+            return msgpack.ExtType(SHARED_ARRAY_EXT_TYPE, msgpack.packb(shared_arrays.write(obj), use_bin_type=True))
+        array = np.require(obj, requirements='C')
+        return msgpack.ExtType(NUMPY_EXT_TYPE, msgpack.packb([array.dtype.str, list(array.shape), array.data],
+                                                             use_bin_type=True))
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, enum.Enum):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj)} is not serializable')
+
+
+def _decode(code: int, data: bytes) -> Any:
+    if code == NUMPY_EXT_TYPE:
+        dtype, shape, buffer = msgpack.unpackb(data, raw=False)
+        return np.frombuffer(buffer, dtype=np.dtype(dtype)).reshape(shape)
+    if code == SHARED_ARRAY_EXT_TYPE:
+        path = msgpack.unpackb(data, raw=False)
+        array = np.load(path, mmap_mode='r')
+        # The memory map stays valid after the file is removed.
+        os.unlink(path)
+        return array
+    return msgpack.ExtType(code, data)
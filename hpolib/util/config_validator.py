@@ -0,0 +1,171 @@
+""" Fast validation of configurations on plain dictionaries.
+
+Creating a ConfigSpace.Configuration and calling `check_configuration` is expensive compared to a lookup in a
+tabular benchmark. The ConfigurationValidator compiles the configuration space once into simple checks for bounds,
+choices and conditions, which are then applied directly to a dictionary or an array.
+
+Configuration spaces with forbidden clauses or hyperparameter types, which are not supported here, are checked with
+ConfigSpace instead (see `ConfigurationValidator.is_supported`).
+"""
+
+import logging
+from numbers import Integral, Real
+from typing import Union, Dict, Callable, Any
+
+import ConfigSpace
+import numpy as np
+from ConfigSpace.conditions import AndConjunction, OrConjunction, EqualsCondition, NotEqualsCondition, \
+    InCondition, GreaterThanCondition, LessThanCondition
+from ConfigSpace.hyperparameters import UniformFloatHyperparameter, UniformIntegerHyperparameter, \
+    CategoricalHyperparameter, OrdinalHyperparameter, Constant
+
+logger = logging.getLogger('ConfigurationValidator')
+
+
+class ConfigurationValidator(object):
+
+    def __init__(self, configuration_space: ConfigSpace.ConfigurationSpace):
+        """
+        Compiled checks for a configuration space.
+
+        Parameters
+        ----------
+        configuration_space : ConfigSpace.ConfigurationSpace
+        """
+        self.configuration_space = configuration_space
+        self.hyperparameter_names = configuration_space.get_hyperparameter_names()
+        self.is_supported = len(configuration_space.get_forbiddens()) == 0
+
+        self._value_checks = {}
+        for hyperparameter in configuration_space.get_hyperparameters():
+            check = _compile_hyperparameter(hyperparameter)
+            if check is None:
+                logger.debug(f'Hyperparameter {hyperparameter.name} is not supported. Use ConfigSpace instead.')
+                self.is_supported = False
+            self._value_checks[hyperparameter.name] = check
+
+        # A hyperparameter is active if all its conditions are fulfilled.
+        self._conditions = {}
+        for condition in configuration_space.get_conditions():
+            check = _compile_condition(condition)
+            if check is None:
+                logger.debug(f'Condition {condition} is not supported. Use ConfigSpace instead.')
+                self.is_supported = False
+            child = condition.get_descendant_literal_conditions()[0].child.name \
+                if isinstance(condition, (AndConjunction, OrConjunction)) else condition.child.name
+            self._conditions.setdefault(child, []).append(check)
+
+        self.default_values = configuration_space.get_default_configuration().get_dictionary()
+
+    def to_dict(self, configuration: Union[np.ndarray, ConfigSpace.Configuration, Dict]) -> Dict:
+        """ Helper function to cast a configuration to a dictionary. Arrays follow the order of the hyperparameters. """
+        if isinstance(configuration, dict):
+            return configuration
+        if isinstance(configuration, ConfigSpace.Configuration):
+            return configuration.get_dictionary()
+        if isinstance(configuration, np.ndarray):
+            return {name: configuration[i] for i, name in enumerate(self.hyperparameter_names)}
+        raise TypeError(f'Configuration has to be from type np.ndarray, dict, or ConfigSpace.Configuration but '
+                        f'was {type(configuration)}')
+
+    def check(self, configuration: Union[np.ndarray, ConfigSpace.Configuration, Dict]):
+        """
+        Check that all values are legal, that all active hyperparameters are given and that no inactive
+        hyperparameter is given.
+
+        Raises
+        ------
+        ValueError
+            If the configuration is not valid.
+        """
+        values = self.to_dict(configuration)
+
+        if not self.is_supported:
+            self.configuration_space.check_configuration(ConfigSpace.Configuration(self.configuration_space, values))
+            return
+
+        for name in values:
+            if name not in self._value_checks:
+                raise ValueError(f'Hyperparameter {name} does not exist in the configuration space')
+
+        for name in self.hyperparameter_names:
+            is_active = all(condition(values) for condition in self._conditions.get(name, []))
+
+            if name not in values:
+                if is_active:
+                    raise ValueError(f'Active hyperparameter {name} not specified')
+                continue
+
+            if not is_active:
+                raise ValueError(f'Inactive hyperparameter {name} must not be specified')
+
+            if not self._value_checks[name](values[name]):
+                raise ValueError(f'Trying to set illegal value {values[name]} (type {type(values[name])}) for '
+                                 f'hyperparameter {self.configuration_space.get_hyperparameter(name)}')
+
+    def complete(self, values: Union[Dict, ConfigSpace.Configuration, None]) -> Dict:
+        """ Fill in the default values for the missing hyperparameters, e.g. of a fidelity. """
+        if values is None:
+            return self.default_values.copy()
+        if isinstance(values, ConfigSpace.Configuration):
+            values = values.get_dictionary()
+        if not isinstance(values, dict):
+            raise TypeError(f'Configuration has to be from type dict or ConfigSpace.Configuration but '
+                            f'was {type(values)}')
+        return {name: values.get(name, default) for name, default in self.default_values.items()}
+
+
+def _compile_hyperparameter(hyperparameter) -> Union[Callable[[Any], bool], None]:
+    """ Returns a function, which checks if a value is legal for the hyperparameter or None if not supported. """
+    if isinstance(hyperparameter, UniformIntegerHyperparameter):
+        lower, upper = hyperparameter.lower, hyperparameter.upper
+        return lambda value: isinstance(value, Integral) and not isinstance(value, bool) and lower <= value <= upper
+
+    if isinstance(hyperparameter, UniformFloatHyperparameter):
+        lower, upper = hyperparameter.lower, hyperparameter.upper
+        return lambda value: isinstance(value, Real) and not isinstance(value, bool) and lower <= value <= upper
+
+    if isinstance(hyperparameter, CategoricalHyperparameter):
+        choices = hyperparameter.choices
+        return lambda value: value in choices
+
+    if isinstance(hyperparameter, OrdinalHyperparameter):
+        sequence = hyperparameter.sequence
+        return lambda value: value in sequence
+
+    if isinstance(hyperparameter, Constant):
+        constant = hyperparameter.value
+        return lambda value: value == constant
+
+    return None
+
+
+def _compile_condition(condition) -> Union[Callable[[Dict], bool], None]:
+    """ Returns a function, which evaluates the condition on a dictionary or None if not supported. """
+    if isinstance(condition, (AndConjunction, OrConjunction)):
+        components = [_compile_condition(component) for component in condition.components]
+        if any(component is None for component in components):
+            return None
+        if isinstance(condition, AndConjunction):
+            return lambda values: all(component(values) for component in components)
+        return lambda values: any(component(values) for component in components)
+
+    # An inactive parent does not fulfill any condition.
+    parent = condition.parent.name
+    if isinstance(condition, EqualsCondition):
+        value = condition.value
+        return lambda values: parent in values and values[parent] == value
+    if isinstance(condition, NotEqualsCondition):
+        value = condition.value
+        return lambda values: parent in values and values[parent] != value
+    if isinstance(condition, InCondition):
+        in_values = condition.values
+        return lambda values: parent in values and values[parent] in in_values
+    if isinstance(condition, GreaterThanCondition):
+        value = condition.value
+        return lambda values: parent in values and values[parent] > value
+    if isinstance(condition, LessThanCondition):
+        value = condition.value
+        return lambda values: parent in values and values[parent] < value
+
+    return None
@@ -10,14 +10,23 @@ hpolib.util.openml_data_manager.
 """
 
 import abc
+import base64
 import gzip
+import hashlib
+import json
 import logging
+import os
 import pickle
+import shutil
+import struct
 import tarfile
-from io import BytesIO
+from functools import lru_cache
+from itertools import product
 from pathlib import Path
-from typing import Tuple, Dict
-from urllib.request import urlretrieve, urlopen
+from typing import Tuple, Dict, List, Union, Iterator
+from urllib.parse import urlparse
+from urllib.error import HTTPError
+from urllib.request import urlretrieve, urlopen, Request
 from zipfile import ZipFile
 from time import time
 
@@ -444,7 +453,11 @@ class NASBench_201Data(DataManager):
     For more information about the metric, have a look in the benchmark docstrings.
     """
 
-    def __init__(self, dataset: str):
+    # Version of the layout of the compiled arrays. Increase it whenever the layout changes, so that arrays of an
+    # older layout are compiled again instead of being reused (see `load_arrays`).
+    ARRAY_VERSION = 1
+
+    def __init__(self, dataset: str, source: Union[str, Path, None] = None, sha256: Union[str, None] = None):
         """
         Init the NasbenchData Manager.
 
@@ -452,14 +465,25 @@ class NASBench_201Data(DataManager):
         ----------
         dataset : str
             One of cifar10, cifar10-valid, cifar100, ImageNet16-120
+        source : str, Path, None
+            Location of the zip archive. Either an url (http(s):// or file://) or a path to a local mirror of the
+            archive. Defaults to the archive hosted on automl.org.
+        sha256 : str, None
+            If given, the sha256 checksum of the archive is verified before extracting it. The size of a downloaded
+            archive is always checked against the size reported by the source.
         """
         assert dataset in ['cifar10', 'cifar10-valid', 'cifar100', 'ImageNet16-120']
 
         super(NASBench_201Data, self).__init__()
 
+        self.dataset = dataset
         self.files = self.get_files_per_dataset(dataset)
         self._save_dir = hpolib.config_file.data_dir / "nasbench_201"
-        self._url_source = 'https://www.automl.org/wp-content/uploads/2020/08/nasbench_201_data_v1.1.zip'
+        self._array_dir = self._save_dir / f'arrays_v{self.ARRAY_VERSION}'
+        self._url_source = str(source) if source is not None \
+            else 'https://www.automl.org/wp-content/uploads/2020/08/nasbench_201_data_v1.1.zip'
+        self._sha256 = sha256
+        self._chunk_size = 2 ** 20
         self.data = {}
 
         self.create_save_directory(self._save_dir)
@@ -467,15 +491,42 @@ class NASBench_201Data(DataManager):
     @staticmethod
     def get_seeds_metrics():
         from itertools import product
-        seeds = [777, 888, 999]
+        seeds = NASBench_201Data.get_seeds()
         metrics = NASBench_201Data.get_metrics()
         return product(seeds, metrics)
 
+    @staticmethod
+    def get_seeds():
+        return [777, 888, 999]
+
     @staticmethod
     def get_metrics():
         return ['train_acc1es', 'train_losses', 'train_times',
                 'eval_acc1es', 'eval_times', 'eval_losses']
 
+    @staticmethod
+    def get_operations():
+        return ['none', 'skip_connect', 'nor_conv_1x1', 'nor_conv_3x3', 'avg_pool_3x3']
+
+    @staticmethod
+    def get_edges():
+        """ The edges of a cell as (to-node, from-node). This is also the order of the edges in an arch string. """
+        return [(1, 0), (2, 0), (2, 1), (3, 0), (3, 1), (3, 2)]
+
+    @staticmethod
+    def get_num_architectures():
+        return len(NASBench_201Data.get_operations()) ** len(NASBench_201Data.get_edges())
+
+    @staticmethod
+    def arch_str_to_index(arch_str: str) -> int:
+        """
+        Encode an arch string, e.g. '|nor_conv_3x3~0|+|none~0|avg_pool_3x3~1|+|...~0|...~1|...~2|', as integer.
+        The operation on the k-th edge (see get_edges) is the k-th digit of the index in base 5.
+        """
+        operations = NASBench_201Data.get_operations()
+        ops = [edge.split('~')[0] for node in arch_str.split('+') for edge in node.strip('|').split('|')]
+        return sum(operations.index(op) * len(operations) ** k for k, op in enumerate(ops))
+
     @staticmethod
     def get_files_per_dataset(dataset):
         seeds_metrics = NASBench_201Data.get_seeds_metrics()
@@ -485,19 +536,129 @@ class NASBench_201Data(DataManager):
     @lockutils.synchronized('not_thread_process_safe', external=True,
                             lock_path=f'{hpolib.config_file.cache_dir}/lock_nasbench_201_data', delay=0.5)
     def _download(self):
-        # Check if data is already downloaded. If a single file is missing, we have to download the complete zip again.
+        # Check if data is already downloaded. If a single file is missing, we have to extract it again.
         # Use a file lock to ensure that no two processes try to download the same files at the same time.
-        file_is_missing = not all([(self._save_dir / 'data' / file).exists() for file in self.files])
+        missing_files = [file for file in self.files if not (self._save_dir / 'data' / file).exists()]
 
-        if not file_is_missing:
+        if len(missing_files) == 0:
             self.logger.debug('NasBench201DataManager: Data already downloaded')
         else:
             self.logger.info(f'NasBench201DataManager: Start downloading data from {self._url_source} '
                              f'to {self._save_dir}')
 
-            with urlopen(self._url_source) as zip_archive:
-                with ZipFile(BytesIO(zip_archive.read())) as zip_file:
-                    zip_file.extractall(self._save_dir)
+            archive = self._get_archive()
+            self._extract(archive, missing_files)
+
+    def _get_archive(self) -> Path:
+        """
+        Returns the path to the zip archive. Local mirrors are used in place. Remote archives are streamed chunk-wise
+        to a '.part' file in the save directory. If such a file is left over from an interrupted download, the
+        download is resumed, given that the server supports range requests. Otherwise, it starts from the beginning.
+        If the part file is complete already, the server refuses the range (416) and the part file is used as it is.
+        The finished archive is kept in the save directory, so that the other datasets can be extracted from it
+        without downloading it again.
+        """
+        url = urlparse(self._url_source)
+        if url.scheme not in ['http', 'https', 'ftp', 'file']:
+            archive = Path(self._url_source)
+            self._verify_checksum(archive)
+            return archive
+
+        archive = self._save_dir / Path(url.path).name
+        if archive.exists():
+            self.logger.debug(f'NasBench201DataManager: Use already downloaded archive {archive}')
+            return archive
+
+        part_file = archive.with_name(archive.name + '.part')
+        offset = part_file.stat().st_size if part_file.exists() else 0
+
+        try:
+            total_size = self._download_part(part_file, offset)
+        except HTTPError as e:
+            # The server refuses a range, which starts at the end of the archive. Then, the part file is complete.
+            if e.code != 416 or offset == 0:
+                raise
+            self.logger.debug('NasBench201DataManager: The left-over download is already complete.')
+            total_size = self._get_total_size(e.headers)
+
+        try:
+            size = part_file.stat().st_size
+            if total_size is not None and size != total_size:
+                raise ValueError(f'The size of {part_file} ({size} bytes) does not match the size of the archive '
+                                 f'({total_size} bytes). Please retry the download.')
+            self._verify_checksum(part_file)
+        except ValueError:
+            part_file.unlink()
+            raise
+
+        part_file.replace(archive)
+        return archive
+
+    def _download_part(self, part_file: Path, offset: int) -> Union[int, None]:
+        """
+        Append the archive from byte `offset` on to the part file. If the source does not support range requests, the
+        part file is overwritten with the whole archive. Returns the size of the archive, if the source reports it.
+        """
+        request = Request(self._url_source)
+        if offset > 0:
+            request.add_header('Range', f'bytes={offset}-')
+
+        with urlopen(request) as response:
+            if offset > 0 and response.getcode() != 206:
+                self.logger.debug('NasBench201DataManager: Source does not support resuming. Restart the download.')
+                offset = 0
+            elif offset > 0:
+                self.logger.info(f'NasBench201DataManager: Resume download at byte {offset}')
+
+            with part_file.open('ab' if offset > 0 else 'wb') as fh:
+                shutil.copyfileobj(response, fh, self._chunk_size)
+
+            return self._get_total_size(response.headers, offset)
+
+    @staticmethod
+    def _get_total_size(headers, offset: int = 0) -> Union[int, None]:
+        """ Size of the archive from the headers 'Content-Range: bytes <range>/<size>' or 'Content-Length'. """
+        content_range = headers.get('Content-Range', None)
+        if content_range is not None:
+            size = content_range.rsplit('/', 1)[-1].strip()
+            return int(size) if size.isdigit() else None
+
+        content_length = headers.get('Content-Length', None)
+        return offset + int(content_length) if content_length is not None and content_length.isdigit() else None
+
+    def _verify_checksum(self, file: Path):
+        if self._sha256 is None:
+            return
+
+        sha256 = hashlib.sha256()
+        with file.open('rb') as fh:
+            for chunk in iter(lambda: fh.read(self._chunk_size), b''):
+                sha256.update(chunk)
+
+        if sha256.hexdigest() != self._sha256.lower():
+            raise ValueError(f'Checksum of {file} does not match. Expected {self._sha256}, '
+                             f'but got {sha256.hexdigest()}')
+
+    def _extract(self, archive: Path, files: List[str]):
+        """
+        Extract the given files from the archive to the data directory. Each member is streamed to a temporary file,
+        which is renamed after it is complete. The zip module verifies the crc of each member while reading it.
+        """
+        data_dir = self._save_dir / 'data'
+        self.create_save_directory(data_dir)
+
+        with ZipFile(archive) as zip_file:
+            members = {Path(member).name: member for member in zip_file.namelist()}
+
+            not_in_archive = [file for file in files if file not in members]
+            if len(not_in_archive) != 0:
+                raise FileNotFoundError(f'The archive {archive} does not contain the files {not_in_archive}')
+
+            for file in files:
+                tmp_file = data_dir / (file + '.tmp')
+                with zip_file.open(members[file]) as source, tmp_file.open('wb') as target:
+                    shutil.copyfileobj(source, target, self._chunk_size)
+                tmp_file.replace(data_dir / file)
 
     def _load(self) -> Dict:
         """ Load the data from the file system """
@@ -520,3 +681,718 @@ class NASBench_201Data(DataManager):
         self.logger.info(f'NasBench201DataManager: Data successfully loaded after {time() - t:.2f}')
 
         return self.data
+
+    def load_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Loads the data as dense arrays.
+
+        For each metric, the returned dictionary contains a float32 array of shape [architecture, seed, epoch].
+        The architecture axis is indexed by `arch_str_to_index`, the seed axis follows `get_seeds`. The metrics
+        'train_times' and 'eval_times' are stored as cumulative sums over the epochs. Missing entries are NaN.
+
+        The arrays are compiled only once per dataset and stored as .npy files in the data directory. Afterwards,
+        they are opened read-only as memory maps, so that the pickled data is not touched again and several processes
+        share the same pages in the os page cache.
+        """
+        self.logger.debug('NasBench201DataManager: Starting to load arrays')
+        t = time()
+
+        if not self._arrays_exist():
+            self._convert_to_arrays()
+
+        self.data = {metric: np.load(str(self._get_array_file(metric)), mmap_mode='r')
+                     for metric in NASBench_201Data.get_metrics()}
+        self.logger.info(f'NasBench201DataManager: Arrays successfully loaded after {time() - t:.2f}')
+        return self.data
+
+    def _get_array_file(self, metric: str) -> Path:
+        return self._array_dir / f'nb201_{self.dataset}_{metric}.npy'
+
+    def _arrays_exist(self) -> bool:
+        return all(self._get_array_file(metric).exists() for metric in NASBench_201Data.get_metrics())
+
+    # The lock needs its own name. Otherwise, it shares the (not reentrant) semaphore with the lock of `_download`.
+    @lockutils.synchronized('not_thread_process_safe_arrays', external=True,
+                            lock_path=f'{hpolib.config_file.cache_dir}/lock_nasbench_201_arrays', delay=0.5)
+    def _convert_to_arrays(self):
+        # Another process may have converted the data while we were waiting for the lock.
+        if self._arrays_exist():
+            self.logger.debug('NasBench201DataManager: Arrays already compiled')
+            return
+
+        data = self.load()
+        self.data = None
+
+        t = time()
+        arrays = self._compile_arrays(data)
+        del data
+
+        self.create_save_directory(self._array_dir)
+        for metric, array in arrays.items():
+            # Write to a temporary file first and rename it afterwards. Thus, a crashed conversion never leaves a
+            # truncated array behind.
+            array_file = self._get_array_file(metric)
+            tmp_file = array_file.with_suffix('.npy.tmp')
+            with tmp_file.open('wb') as fh:
+                np.save(fh, array)
+            tmp_file.replace(array_file)
+
+        self.logger.info(f'NasBench201DataManager: Data compiled to arrays after {time() - t:.2f}')
+
+    @staticmethod
+    def _compile_arrays(data: Dict) -> Dict[str, np.ndarray]:
+        """ Transform the nested dictionaries {(seed, metric): {arch_str: [values per epoch]}} to arrays. """
+        seeds = NASBench_201Data.get_seeds()
+        n_epochs = max(len(values) for metric_data in data.values() for values in metric_data.values())
+
+        arch_indices = {}
+        arrays = {}
+        for metric in NASBench_201Data.get_metrics():
+            array = np.full((NASBench_201Data.get_num_architectures(), len(seeds), n_epochs), np.nan,
+                            dtype=np.float32)
+
+            for seed_index, seed in enumerate(seeds):
+                for arch_str, values in data[(seed, metric)].items():
+                    if arch_str not in arch_indices:
+                        arch_indices[arch_str] = NASBench_201Data.arch_str_to_index(arch_str)
+                    array[arch_indices[arch_str], seed_index, :len(values)] = values
+
+            if metric.endswith('_times'):
+                array = np.cumsum(array, axis=2, dtype=np.float64).astype(np.float32)
+            arrays[metric] = array
+        return arrays
+
+
+class NASBench_201ArchitectureIndex(object):
+    """
+    Bidirectional index between the configurations, the integer indices and the arch strings of the 15625
+    architectures in NASBench201. The index of an architecture is the base-5 encoding of its operations (see
+    `NASBench_201Data.arch_str_to_index`), i.e. the position in the data arrays.
+
+    Besides, the index maps each architecture to a canonical representative. Architectures which compute the same
+    function are collapsed: edges with the operation 'none' or without input are dropped, skip connections pass their
+    input through and the inputs of a node are summed in arbitrary order. Thus, e.g., swapping the two intermediate
+    nodes or changing the operation of an edge which does not reach the output node leads to the same canonical
+    architecture. The canonical representative is the architecture with the smallest index in its group. Note that
+    the results in the tables still differ between the architectures of a group, since each one was trained separately.
+
+    The index is built only once and stored in the nasbench_201 data directory.
+    """
+
+    def __init__(self, save_dir: Union[Path, str, None] = None):
+        """
+        Parameters
+        ----------
+        save_dir : Path, str, None
+            Directory of the stored index. Defaults to the nasbench_201 directory in the hpolib data directory.
+        """
+        self.logger = logging.getLogger('NASBench_201ArchitectureIndex')
+
+        self._save_dir = Path(save_dir) if save_dir is not None else hpolib.config_file.data_dir / 'nasbench_201'
+        self._index_file = self._save_dir / 'nb201_architecture_index.npz'
+
+        self.op_names = NASBench_201Data.get_operations()
+        self.edge_names = [f'{i}<-{j}' for i, j in NASBench_201Data.get_edges()]
+        self._op_ids = {op: i for i, op in enumerate(self.op_names)}
+        self._powers = [len(self.op_names) ** k for k in range(len(self.edge_names))]
+
+        self.operations, self.arch_strs, self.canonical = self._load()
+        self._arch_str_to_index = {arch_str: index for index, arch_str in enumerate(self.arch_strs)}
+
+    def __len__(self) -> int:
+        return len(self.arch_strs)
+
+    def config_to_index(self, configuration: Dict) -> int:
+        """ Index of a configuration, e.g. {'1<-0': 'nor_conv_3x3', '2<-0': 'none', ...}. """
+        return sum(self._op_ids[configuration[edge]] * power for edge, power in zip(self.edge_names, self._powers))
+
+    def arch_str_to_index(self, arch_str: str) -> int:
+        return self._arch_str_to_index[arch_str]
+
+    def index_to_arch_str(self, index: int) -> str:
+        return self.arch_strs[index]
+
+    def index_to_config(self, index: int) -> Dict:
+        return {edge: self.op_names[op] for edge, op in zip(self.edge_names, self.operations[index])}
+
+    def canonical_index(self, index: int) -> int:
+        """ Index of the canonical representative of the architecture. """
+        return int(self.canonical[index])
+
+    def get_unique_indices(self) -> np.ndarray:
+        """ Indices of the canonical architectures, i.e. one architecture per group of equivalent architectures. """
+        return np.flatnonzero(self.canonical == np.arange(len(self.canonical)))
+
+    def _load(self) -> Tuple[np.ndarray, List[str], np.ndarray]:
+        if self._index_file.exists():
+            with np.load(str(self._index_file)) as index:
+                operations, arch_strs, canonical = index['operations'], index['arch_strs'], index['canonical']
+            if len(operations) == NASBench_201Data.get_num_architectures():
+                self.logger.debug(f'Load the architecture index from {self._index_file}')
+                return operations, arch_strs.tolist(), canonical
+            self.logger.warning(f'The architecture index in {self._index_file} is incomplete. Build it again.')
+
+        t = time()
+        operations, arch_strs, canonical = self._build()
+        self.logger.debug(f'Built the architecture index after {time() - t:.2f}s')
+
+        self._save_dir.mkdir(parents=True, exist_ok=True)
+        # Several processes may build the index at the same time. Each one writes its own temporary file.
+        tmp_file = self._index_file.with_name(f'{self._index_file.name}.{os.getpid()}.tmp')
+        with tmp_file.open('wb') as fh:
+            np.savez(fh, operations=operations, arch_strs=np.array(arch_strs), canonical=canonical)
+        tmp_file.replace(self._index_file)
+        return operations, arch_strs, canonical
+
+    def _build(self) -> Tuple[np.ndarray, List[str], np.ndarray]:
+        n_ops, n_edges = len(self.op_names), len(self.edge_names)
+
+        # The k-th column is the k-th digit of the index in base 5.
+        operations = np.array(list(product(range(n_ops), repeat=n_edges)), dtype=np.int8)[:, ::-1]
+
+        arch_strs = []
+        canonical = np.empty(len(operations), dtype=np.int32)
+        canonical_forms = {}
+        for index, ops in enumerate(operations):
+            op_names = [self.op_names[op] for op in ops]
+            arch_strs.append(self._get_arch_str(op_names))
+            canonical[index] = canonical_forms.setdefault(self._get_canonical_form(op_names), index)
+
+        return np.ascontiguousarray(operations), arch_strs, canonical
+
+    @staticmethod
+    def _get_arch_str(op_names: List[str]) -> str:
+        nodes = {}
+        for op, (i, j) in zip(op_names, NASBench_201Data.get_edges()):
+            nodes.setdefault(i, []).append(f'{op}~{j}')
+        return '+'.join('|' + '|'.join(edges) + '|' for _, edges in sorted(nodes.items()))
+
+    @staticmethod
+    def _get_canonical_form(op_names: List[str]) -> str:
+        """
+        Describe the function, which is computed by the cell, as string. Adapted from `Structure.to_unique_str` in
+        https://github.com/D-X-Y/AutoDL-Projects/blob/master/lib/models/cell_searchs/genotypes.py
+        """
+        zero = '#'
+        nodes = {0: '0'}
+        inputs = {}
+        for op, (i, j) in zip(op_names, NASBench_201Data.get_edges()):
+            inputs.setdefault(i, []).append((op, j))
+
+        for i in sorted(inputs):
+            terms = []
+            for op, j in inputs[i]:
+                if op == 'none' or nodes[j] == zero:
+                    continue
+                terms.append(nodes[j] if op == 'skip_connect' else f'({nodes[j]})@{op}')
+            nodes[i] = '+'.join(sorted(terms)) if len(terms) != 0 else zero
+        return nodes[max(nodes)]
+
+
+class FCNetData(DataManager):
+    """ Loads the tabular data of the FCNet benchmarks (https://github.com/automl/nas_benchmarks).
+
+    The data is provided as one hdf5 file per data set, see
+    http://ml4aad.org/wp-content/uploads/2019/01/fcnet_tabular_benchmarks.tar.gz
+    Each file contains a group per configuration, which is stored under its json representation. The group contains
+    the validation mse of 4 runs for 100 epochs and the total runtime per run.
+
+    The hdf5 files are converted only once to dense arrays. A configuration is indexed by the ordinal encoding of its
+    9 hyperparameters (see `config_to_index`).
+    """
+
+    # Version of the layout of the compiled arrays. See `NASBench_201Data.ARRAY_VERSION`.
+    # 2: float64 instead of float32, as in the hdf5 files.
+    ARRAY_VERSION = 2
+
+    def __init__(self, dataset: str, data_path: Union[Path, str] = './fcnet_tabular_benchmarks/'):
+        """
+        Parameters
+        ----------
+        dataset : str
+            One of slice_localization, protein_structure, naval_propulsion, parkinsons_telemonitoring
+        data_path : Path, str
+            Path to the folder, which contains the hdf5 files.
+        """
+        assert dataset in FCNetData.get_datasets(), \
+            f'Unknown data set {dataset}. Choose from {FCNetData.get_datasets()}'
+
+        super(FCNetData, self).__init__()
+
+        self.dataset = dataset
+        self.data_path = Path(data_path)
+        self._array_dir = hpolib.config_file.data_dir / 'fcnet_tabular_benchmarks' / f'arrays_v{self.ARRAY_VERSION}'
+        self.data = {}
+
+    @staticmethod
+    def get_datasets() -> List[str]:
+        return ['slice_localization', 'protein_structure', 'naval_propulsion', 'parkinsons_telemonitoring']
+
+    @staticmethod
+    def get_hyperparameters() -> Dict[str, List]:
+        """ The hyperparameters with their values. The order of the hyperparameters defines the encoding. """
+        return {'activation_fn_1': ['tanh', 'relu'],
+                'activation_fn_2': ['tanh', 'relu'],
+                'batch_size': [8, 16, 32, 64],
+                'dropout_1': [0.0, 0.3, 0.6],
+                'dropout_2': [0.0, 0.3, 0.6],
+                'init_lr': [5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 1e-1],
+                'lr_schedule': ['cosine', 'const'],
+                'n_units_1': [16, 32, 64, 128, 256, 512],
+                'n_units_2': [16, 32, 64, 128, 256, 512]}
+
+    @staticmethod
+    def get_metrics() -> List[str]:
+        return ['valid_mse', 'runtime']
+
+    @staticmethod
+    def get_num_configurations() -> int:
+        return int(np.prod([len(values) for values in FCNetData.get_hyperparameters().values()]))
+
+    @staticmethod
+    def config_to_index(configuration: Dict) -> int:
+        """
+        Encode a configuration as index into the arrays. The position of a value in the list of values of its
+        hyperparameter is a digit of a mixed radix number. The last hyperparameter is the least significant digit.
+        """
+        index = 0
+        for name, values in _FCNET_VALUE_INDICES.items():
+            index = index * len(values) + values[configuration[name]]
+        return index
+
+    @staticmethod
+    def index_to_config(index: int) -> Dict:
+        hyperparameters = FCNetData.get_hyperparameters()
+        value_indices = np.unravel_index(index, [len(values) for values in hyperparameters.values()])
+        return {name: values[value_index]
+                for (name, values), value_index in zip(hyperparameters.items(), value_indices)}
+
+    def _get_hdf5_file(self) -> Path:
+        return self.data_path / f'fcnet_{self.dataset}_data.hdf5'
+
+    def load(self) -> Dict[str, np.ndarray]:
+        """
+        Loads the data as dense arrays.
+
+        The returned dictionary contains the float64 arrays
+            valid_mse : shape [configuration, run, epoch]
+            runtime : shape [configuration, run] - Time to train the network for all 100 epochs.
+        The configuration axis is indexed by `config_to_index`. Missing entries are NaN.
+
+        The arrays are compiled only once per data set and stored as .npy files in the data directory. Afterwards,
+        they are opened read-only as memory maps.
+        """
+        self.logger.debug('FCNetDataManager: Starting to load arrays')
+        t = time()
+
+        if not self._arrays_exist():
+            self._convert_to_arrays()
+
+        self.data = {metric: np.load(str(self._get_array_file(metric)), mmap_mode='r')
+                     for metric in FCNetData.get_metrics()}
+        self.logger.info(f'FCNetDataManager: Arrays successfully loaded after {time() - t:.2f}')
+        return self.data
+
+    def _get_array_file(self, metric: str) -> Path:
+        return self._array_dir / f'fcnet_{self.dataset}_{metric}.npy'
+
+    def _arrays_exist(self) -> bool:
+        return all(self._get_array_file(metric).exists() for metric in FCNetData.get_metrics())
+
+    @lockutils.synchronized('not_thread_process_safe_fcnet_arrays', external=True,
+                            lock_path=f'{hpolib.config_file.cache_dir}/lock_fcnet_arrays', delay=0.5)
+    def _convert_to_arrays(self):
+        # Another process may have converted the data while we were waiting for the lock.
+        if self._arrays_exist():
+            self.logger.debug('FCNetDataManager: Arrays already compiled')
+            return
+
+        hdf5_file = self._get_hdf5_file()
+        if not hdf5_file.exists():
+            raise FileNotFoundError(f'The data file {hdf5_file} does not exist. Please download the data from '
+                                    f'http://ml4aad.org/wp-content/uploads/2019/01/fcnet_tabular_benchmarks.tar.gz')
+
+        self.logger.info(f'FCNetDataManager: Convert {hdf5_file} to arrays')
+        t = time()
+        arrays = self._compile_arrays(hdf5_file)
+
+        self.create_save_directory(self._array_dir)
+        for metric, array in arrays.items():
+            # Write to a temporary file first and rename it afterwards. Thus, a crashed conversion never leaves a
+            # truncated array behind.
+            array_file = self._get_array_file(metric)
+            tmp_file = array_file.with_suffix('.npy.tmp')
+            with tmp_file.open('wb') as fh:
+                np.save(fh, array)
+            tmp_file.replace(array_file)
+
+        self.logger.info(f'FCNetDataManager: Data compiled to arrays after {time() - t:.2f}')
+
+    @staticmethod
+    def _compile_arrays(hdf5_file: Path) -> Dict[str, np.ndarray]:
+        """ Read the group of each configuration from the hdf5 file and write it to its position in the arrays. """
+        import h5py
+
+        n_configurations = FCNetData.get_num_configurations()
+        valid_mse, runtime = None, None
+
+        with h5py.File(str(hdf5_file), 'r') as data:
+            for key in data.keys():
+                configuration = json.loads(key)
+                # The floats in the keys may not be bitwise equal to the values. Use the closest value.
+                configuration = {name: values[int(np.argmin([abs(value - configuration[name]) for value in values]))]
+                                 if isinstance(configuration[name], float) else configuration[name]
+                                 for name, values in FCNetData.get_hyperparameters().items()}
+                index = FCNetData.config_to_index(configuration)
+
+                group_valid_mse = data[key]['valid_mse'][()]
+                group_runtime = data[key]['runtime'][()]
+                if valid_mse is None:
+                    valid_mse = np.full((n_configurations, ) + group_valid_mse.shape, np.nan, dtype=np.float64)
+                    runtime = np.full((n_configurations, ) + group_runtime.shape, np.nan, dtype=np.float64)
+
+                valid_mse[index] = group_valid_mse
+                runtime[index] = group_runtime
+
+        return {'valid_mse': valid_mse, 'runtime': runtime}
+
+
+# Position of each value in the list of values of its hyperparameter. See `FCNetData.config_to_index`
+_FCNET_VALUE_INDICES = {name: {value: i for i, value in enumerate(values)}
+                        for name, values in FCNetData.get_hyperparameters().items()}
+
+
+class NASBench_101Data(DataManager):
+    """ Loads the tabular data of NASBench101 (https://github.com/google-research/nasbench) without TensorFlow.
+
+    The data is provided as tfrecord file (nasbench_full.tfrecord), which contains one record per model, budget and
+    run. The file is converted only once to a compact index of the models and dense arrays of the metrics:
+        module_hash : S16 [model] - Binary md5 graph hash of the model (see `hash_module`). The models are sorted by
+            their hash, so that a model is found by binary search.
+        adjacency : uint32 [model] - Bit mask of the upper triangular adjacency matrix (padded to VERTICES vertices).
+        operations : int8 [model, VERTICES] - Codes of the operations in `[INPUT] + get_operations() + [OUTPUT]`.
+            Padded with -1.
+        trainable_parameters : int32 [model]
+        train_accuracy, validation_accuracy, test_accuracy, training_time : float64 [model, budget, run]
+            The final metrics of each run. Missing runs are NaN.
+    The arrays are stored as .npy files in the data directory and opened read-only as memory maps.
+    """
+
+    VERTICES = 7
+    MAX_EDGES = 9
+    N_RUNS = 3
+    INPUT = 'input'
+    OUTPUT = 'output'
+    # Version of the layout of the compiled arrays. See `NASBench_201Data.ARRAY_VERSION`.
+    ARRAY_VERSION = 1
+
+    def __init__(self, data_path: Union[Path, str] = './'):
+        """
+        Parameters
+        ----------
+        data_path : Path, str
+            Path to the folder, which contains the nasbench_full.tfrecord.
+        """
+        super(NASBench_101Data, self).__init__()
+
+        self.data_path = Path(data_path)
+        self._array_dir = hpolib.config_file.data_dir / 'nasbench_101' / f'arrays_v{self.ARRAY_VERSION}'
+        self.data = {}
+
+        self._get_model_index = lru_cache(maxsize=2 ** 16)(self._lookup_model_index)
+        self._triu_indices = np.triu_indices(NASBench_101Data.VERTICES, k=1)
+
+    @staticmethod
+    def get_budgets() -> List[int]:
+        return [4, 12, 36, 108]
+
+    @staticmethod
+    def get_operations() -> List[str]:
+        """ The operations of the intermediate nodes in the order of `available_ops` in the nasbench config. """
+        return ['conv3x3-bn-relu', 'conv1x1-bn-relu', 'maxpool3x3']
+
+    @staticmethod
+    def get_all_operations() -> List[str]:
+        return [NASBench_101Data.INPUT] + NASBench_101Data.get_operations() + [NASBench_101Data.OUTPUT]
+
+    @staticmethod
+    def get_metrics() -> List[str]:
+        return ['train_accuracy', 'validation_accuracy', 'test_accuracy', 'training_time']
+
+    @staticmethod
+    def get_index_arrays() -> List[str]:
+        return ['module_hash', 'adjacency', 'operations', 'trainable_parameters']
+
+    @staticmethod
+    def prune(matrix: np.ndarray, ops: List[str]) -> Union[Tuple[np.ndarray, List[str]], None]:
+        """
+        Remove the nodes, which are not on a path from the input to the output (see `nasbench.api.ModelSpec`).
+        Returns None, if the input is not connected to the output.
+        """
+        matrix = np.asarray(matrix, dtype=np.int8)
+        n_vertices = len(matrix)
+
+        # The nodes are sorted topologically. A node is reachable, if one of its predecessors is reachable.
+        from_input = np.zeros(n_vertices, dtype=bool)
+        from_input[0] = True
+        for v in range(1, n_vertices):
+            from_input[v] = np.any(from_input[:v] & (matrix[:v, v] > 0))
+
+        to_output = np.zeros(n_vertices, dtype=bool)
+        to_output[-1] = True
+        for v in range(n_vertices - 2, -1, -1):
+            to_output[v] = np.any(to_output[v + 1:] & (matrix[v, v + 1:] > 0))
+
+        keep = np.flatnonzero(from_input & to_output)
+        if len(keep) < 2:
+            return None
+        return matrix[np.ix_(keep, keep)], [ops[i] for i in keep]
+
+    @staticmethod
+    def hash_module(matrix: np.ndarray, ops: List[str]) -> str:
+        """
+        Compute the isomorphism invariant md5 hash of a (pruned) cell, which identifies the model in NASBench101.
+        Same as `nasbench.api.ModelSpec.hash_spec` with `nasbench.lib.graph_util.hash_module`.
+        """
+        operations = NASBench_101Data.get_operations()
+        labeling = [-1] + [operations.index(op) for op in ops[1:-1]] + [-2]
+
+        n_vertices = len(matrix)
+        in_edges = np.sum(matrix, axis=0).tolist()
+        out_edges = np.sum(matrix, axis=1).tolist()
+
+        hashes = [hashlib.md5(str(h).encode('utf-8')).hexdigest() for h in zip(out_edges, in_edges, labeling)]
+        for _ in range(n_vertices):
+            hashes = [hashlib.md5((''.join(sorted(hashes[w] for w in range(n_vertices) if matrix[w, v])) + '|'
+                                   + ''.join(sorted(hashes[w] for w in range(n_vertices) if matrix[v, w])) + '|'
+                                   + hashes[v]).encode('utf-8')).hexdigest()
+                      for v in range(n_vertices)]
+        return hashlib.md5(str(sorted(hashes)).encode('utf-8')).hexdigest()
+
+    def get_model_index(self, matrix: np.ndarray, ops: List[str]) -> int:
+        """
+        Look up the position of a cell in the arrays. The cell is pruned and hashed first. Returns -1, if the cell is
+        not a valid model of NASBench101, e.g. if it has too many edges. Requires that the data is loaded.
+
+        Hashing a cell is comparatively slow. Thus, the last 2^16 lookups are cached.
+        """
+        return self._get_model_index(np.asarray(matrix, dtype=np.int8).tobytes(), tuple(ops))
+
+    def _lookup_model_index(self, matrix_bytes: bytes, ops: Tuple[str]) -> int:
+        matrix = np.frombuffer(matrix_bytes, dtype=np.int8).reshape(len(ops), len(ops))
+        pruned = self.prune(matrix, list(ops))
+        if pruned is None:
+            return -1
+
+        matrix, ops = pruned
+        if len(ops) > NASBench_101Data.VERTICES or np.sum(matrix) > NASBench_101Data.MAX_EDGES \
+                or ops[0] != NASBench_101Data.INPUT or ops[-1] != NASBench_101Data.OUTPUT \
+                or any(op not in NASBench_101Data.get_operations() for op in ops[1:-1]):
+            return -1
+
+        return self._get_index_by_hash(self.hash_module(matrix, ops))
+
+    def _get_index_by_hash(self, module_hash: str) -> int:
+        module_hashes = self.data['module_hash']
+        key = np.array(bytes.fromhex(module_hash), dtype=module_hashes.dtype)
+        index = int(np.searchsorted(module_hashes, key))
+        if index == len(module_hashes) or module_hashes[index] != key:
+            return -1
+        return index
+
+    def get_module_hashes(self) -> List[str]:
+        """ The hex hashes of all models in the order of the arrays. Requires that the data is loaded. """
+        # Don't convert the items of the S16 array to bytes directly. Numpy strips trailing zero bytes.
+        raw = self.data['module_hash'].tobytes()
+        return [raw[i:i + 16].hex() for i in range(0, len(raw), 16)]
+
+    def index_to_spec(self, index: int) -> Tuple[np.ndarray, List[str]]:
+        """ Return the (pruned) adjacency matrix and the operations of the model at the given position. """
+        codes = self.data['operations'][index]
+        n_vertices = int(np.sum(codes >= 0))
+
+        adjacency = int(self.data['adjacency'][index])
+        matrix = np.zeros((NASBench_101Data.VERTICES, NASBench_101Data.VERTICES), dtype=np.int8)
+        matrix[self._triu_indices] = [(adjacency >> i) & 1 for i in range(len(self._triu_indices[0]))]
+
+        all_operations = NASBench_101Data.get_all_operations()
+        return matrix[:n_vertices, :n_vertices], [all_operations[code] for code in codes[:n_vertices]]
+
+    def _get_tfrecord_file(self) -> Path:
+        return self.data_path / 'nasbench_full.tfrecord'
+
+    def load(self) -> Dict[str, np.ndarray]:
+        """
+        Loads the index and the metrics as memory-mapped arrays. They are compiled from the tfrecord file, if they do
+        not exist yet. See the class description for the content.
+        """
+        self.logger.debug('NASBench101DataManager: Starting to load arrays')
+        t = time()
+
+        if not self._arrays_exist():
+            self._convert_to_arrays()
+
+        self.data = {name: np.load(str(self._get_array_file(name)), mmap_mode='r')
+                     for name in NASBench_101Data.get_index_arrays() + NASBench_101Data.get_metrics()}
+        self.logger.info(f'NASBench101DataManager: Arrays successfully loaded after {time() - t:.2f}')
+        return self.data
+
+    def _get_array_file(self, name: str) -> Path:
+        return self._array_dir / f'nasbench_101_{name}.npy'
+
+    def _arrays_exist(self) -> bool:
+        return all(self._get_array_file(name).exists()
+                   for name in NASBench_101Data.get_index_arrays() + NASBench_101Data.get_metrics())
+
+    @lockutils.synchronized('not_thread_process_safe_nasbench_101_arrays', external=True,
+                            lock_path=f'{hpolib.config_file.cache_dir}/lock_nasbench_101_arrays', delay=0.5)
+    def _convert_to_arrays(self):
+        # Another process may have converted the data while we were waiting for the lock.
+        if self._arrays_exist():
+            self.logger.debug('NASBench101DataManager: Arrays already compiled')
+            return
+
+        tfrecord_file = self._get_tfrecord_file()
+        if not tfrecord_file.exists():
+            raise FileNotFoundError(f'The data file {tfrecord_file} does not exist. Please download the data from '
+                                    f'https://storage.googleapis.com/nasbench/nasbench_full.tfrecord')
+
+        self.logger.info(f'NASBench101DataManager: Convert {tfrecord_file} to arrays. This takes a few minutes.')
+        t = time()
+        arrays = self._compile_arrays(tfrecord_file)
+
+        self.create_save_directory(self._array_dir)
+        for name, array in arrays.items():
+            # Write to a temporary file first and rename it afterwards. Thus, a crashed conversion never leaves a
+            # truncated array behind.
+            array_file = self._get_array_file(name)
+            tmp_file = array_file.with_suffix('.npy.tmp')
+            with tmp_file.open('wb') as fh:
+                np.save(fh, array)
+            tmp_file.replace(array_file)
+
+        self.logger.info(f'NASBench101DataManager: Data compiled to arrays after {time() - t:.2f}')
+
+    @staticmethod
+    def _compile_arrays(tfrecord_file: Path) -> Dict[str, np.ndarray]:
+        """
+        Read the records of the tfrecord file one by one. Each record is a json list of the module hash, the budget,
+        the adjacency matrix as string of 0 and 1, the comma separated operations and the base64 encoded
+        `ModelMetrics` protobuf message (see nasbench/lib/model_metrics.proto) of one run.
+        """
+        budgets = {budget: i for i, budget in enumerate(NASBench_101Data.get_budgets())}
+        op_codes = {op: i for i, op in enumerate(NASBench_101Data.get_all_operations())}
+        triu_indices = np.triu_indices(NASBench_101Data.VERTICES, k=1)
+        bit_values = np.left_shift(1, np.arange(len(triu_indices[0]), dtype=np.int64))
+
+        rows = {}
+        arrays = NASBench_101Data._allocate_arrays(0)
+
+        for record in _iter_tfrecord(tfrecord_file):
+            module_hash, budget, raw_adjacency, raw_operations, raw_metrics = json.loads(record.decode('utf-8'))
+            metrics = _parse_protobuf(base64.b64decode(raw_metrics))
+
+            row = rows.get(module_hash)
+            if row is None:
+                row = rows[module_hash] = len(rows)
+                if row == len(arrays['n_runs']):
+                    # Grow the arrays by doubling their size.
+                    grown = NASBench_101Data._allocate_arrays(max(2 * row, 2 ** 16))
+                    for name, array in arrays.items():
+                        grown[name][:row] = array
+                    arrays = grown
+
+                dim = int(np.sqrt(len(raw_adjacency)))
+                matrix = np.zeros((NASBench_101Data.VERTICES, NASBench_101Data.VERTICES), dtype=np.int64)
+                matrix[:dim, :dim] = np.array([int(e) for e in raw_adjacency]).reshape(dim, dim)
+
+                arrays['module_hash'][row] = bytes.fromhex(module_hash)
+                arrays['adjacency'][row] = np.sum(matrix[triu_indices] * bit_values)
+                arrays['operations'][row, :dim] = [op_codes[op] for op in raw_operations.split(',')]
+                arrays['trainable_parameters'][row] = metrics.get(2, [0])[0]
+
+            # The evaluation data contains the metrics at the start (0), the half (1) and the end (2) of training.
+            final_evaluation = _parse_protobuf(metrics[1][2])
+            budget_index = budgets[budget]
+            run = arrays['n_runs'][row, budget_index]
+            arrays['n_runs'][row, budget_index] += 1
+            for name, field in [('training_time', 2), ('train_accuracy', 3), ('validation_accuracy', 4),
+                                ('test_accuracy', 5)]:
+                arrays[name][row, budget_index, run] = final_evaluation.get(field, [0.])[0]
+
+        del arrays['n_runs']
+        n_models = len(rows)
+        order = np.argsort(arrays['module_hash'][:n_models])
+        return {name: array[:n_models][order] for name, array in arrays.items()}
+
+    @staticmethod
+    def _allocate_arrays(size: int) -> Dict[str, np.ndarray]:
+        n_budgets = len(NASBench_101Data.get_budgets())
+        arrays = {'module_hash': np.zeros(size, dtype='S16'),
+                  'adjacency': np.zeros(size, dtype=np.uint32),
+                  'operations': np.full((size, NASBench_101Data.VERTICES), -1, dtype=np.int8),
+                  'trainable_parameters': np.zeros(size, dtype=np.int32),
+                  'n_runs': np.zeros((size, n_budgets), dtype=np.int8)}
+        for metric in NASBench_101Data.get_metrics():
+            arrays[metric] = np.full((size, n_budgets, NASBench_101Data.N_RUNS), np.nan)
+        return arrays
+
+
+def _iter_tfrecord(tfrecord_file: Path) -> Iterator[bytes]:
+    """
+    Iterate over the records of a tfrecord file without TensorFlow. Each record is stored as
+        uint64 length, uint32 masked crc32c of the length, byte data[length], uint32 masked crc32c of the data
+    The checksums are not verified.
+    """
+    with tfrecord_file.open('rb') as fh:
+        while True:
+            header = fh.read(12)
+            if not header:
+                return
+            if len(header) < 12:
+                raise ValueError(f'The tfrecord file {tfrecord_file} is truncated')
+            length, = struct.unpack('<Q', header[:8])
+            data = fh.read(length)
+            if len(data) < length or len(fh.read(4)) < 4:
+                raise ValueError(f'The tfrecord file {tfrecord_file} is truncated')
+            yield data
+
+
+def _read_varint(buffer: bytes, position: int) -> Tuple[int, int]:
+    value, shift = 0, 0
+    while True:
+        byte = buffer[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, position
+
+
+def _parse_protobuf(buffer: bytes) -> Dict[int, List]:
+    """
+    Minimal decoder of the protobuf wire format, which is sufficient for the messages of NASBench101. Returns the
+    values of each field number. Varints are returned as int, 64 bit values as double, 32 bit values as float and
+    length delimited values (strings and nested messages) as bytes.
+    """
+    fields = {}
+    position = 0
+    while position < len(buffer):
+        key, position = _read_varint(buffer, position)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, position = _read_varint(buffer, position)
+        elif wire_type == 1:
+            value, = struct.unpack_from('<d', buffer, position)
+            position += 8
+        elif wire_type == 2:
+            length, position = _read_varint(buffer, position)
+            value = buffer[position:position + length]
+            position += length
+        elif wire_type == 5:
+            value, = struct.unpack_from('<f', buffer, position)
+            position += 4
+        else:
+            raise ValueError(f'Unsupported wire type {wire_type} of field {field}')
+        fields.setdefault(field, []).append(value)
+    return fields
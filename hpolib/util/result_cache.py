@@ -0,0 +1,202 @@
+""" Cache for the results of (deterministic) benchmark evaluations.
+
+The cache consists of two tiers: A small in-memory LRU cache per process and a persistent SQLite database, which is
+shared by all processes and survives restarts of an optimizer. Both tiers are addressed by a key, which is a hash over
+the benchmark, its version, the queried function and all arguments of the query (see `ResultCache.get_key`).
+
+Usage:
+    benchmark = Cifar10ValidNasBench201Benchmark()
+    benchmark.enable_result_cache()
+    benchmark.objective_function(configuration)  # Evaluated and stored
+    benchmark.objective_function(configuration)  # Read from the cache
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Union, Dict, Any
+
+import hpolib
+
+logger = logging.getLogger('ResultCache')
+
+
+class ResultCache(object):
+
+    def __init__(self, cache_dir: Union[Path, str, None] = None, memory_size: int = 1024,
+                 max_disk_size: Union[int, None] = 2 ** 30, use_disk: bool = True):
+        """
+        Two-tier cache for the results of benchmark evaluations.
+
+        Parameters
+        ----------
+        cache_dir : Path, str, None
+            Directory for the SQLite database. Defaults to `hpolib.config_file.cache_dir / 'results'`.
+        memory_size : int
+            Maximum number of results in the in-memory LRU cache. Set it to 0 to disable the in-memory tier.
+        max_disk_size : int, None
+            Maximum size of the stored results in bytes. If the database grows larger, the least recently used
+            results are removed. If None, the size is not limited.
+        use_disk : bool
+            If False, only the in-memory tier is used.
+        """
+        self.memory_size = memory_size
+        self.max_disk_size = max_disk_size
+        self.use_disk = use_disk
+
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else hpolib.config_file.cache_dir / 'results'
+        self.db_file = self.cache_dir / 'results.sqlite'
+
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self._connection = None
+        self._connection_pid = None
+
+        if self.use_disk:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def get_key(**kwargs) -> str:
+        """
+        Compute the key of a query. The keyword arguments are serialized to a canonical json string (sorted keys,
+        tuples as lists, NumPy types as their Python equivalent), which is then hashed with sha256.
+
+        Returns
+        -------
+        str
+        """
+        serialized = json.dumps(kwargs, sort_keys=True, separators=(',', ':'), default=_to_json)
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Union[Dict, None]:
+        """ Returns a copy of the cached result or None, if the key is not in the cache. """
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                return pickle.loads(value)
+
+            if not self.use_disk:
+                return None
+
+            connection = self._get_connection()
+            row = connection.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+
+            with connection:
+                connection.execute('UPDATE results SET last_access = ? WHERE key = ?', (time.time(), key))
+
+            value = bytes(row[0])
+            self._add_to_memory(key, value)
+            return pickle.loads(value)
+
+    def set(self, key: str, result: Dict):
+        """ Stores the result in both tiers. """
+        value = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+
+        with self._lock:
+            self._add_to_memory(key, value)
+
+            if not self.use_disk:
+                return
+
+            connection = self._get_connection()
+            with connection:
+                connection.execute('INSERT OR REPLACE INTO results (key, value, size, last_access) '
+                                   'VALUES (?, ?, ?, ?)', (key, sqlite3.Binary(value), len(value), time.time()))
+                self._evict(connection)
+
+    def clear(self):
+        """ Removes all results from both tiers. """
+        with self._lock:
+            self._memory.clear()
+            if self.use_disk:
+                connection = self._get_connection()
+                with connection:
+                    connection.execute('DELETE FROM results')
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            if key in self._memory:
+                return True
+            if not self.use_disk:
+                return False
+            return self._get_connection().execute('SELECT 1 FROM results WHERE key = ?', (key,)).fetchone() \
+                is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            if not self.use_disk:
+                return len(self._memory)
+            return self._get_connection().execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def _add_to_memory(self, key: str, value: bytes):
+        if self.memory_size <= 0:
+            return
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _evict(self, connection: sqlite3.Connection):
+        if self.max_disk_size is None:
+            return
+
+        total_size = connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total_size <= self.max_disk_size:
+            return
+
+        # Remove the least recently used results until the database is below its size limit again.
+        rows = connection.execute('SELECT key, size FROM results ORDER BY last_access ASC, rowid ASC').fetchall()
+        removed_keys = []
+        for key, size in rows:
+            if total_size <= self.max_disk_size:
+                break
+            removed_keys.append((key,))
+            total_size -= size
+
+        connection.executemany('DELETE FROM results WHERE key = ?', removed_keys)
+        logger.debug(f'Removed {len(removed_keys)} results from the cache')
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # A SQLite connection must not be shared with a forked child process. Open a new one in this case.
+        if self._connection is None or self._connection_pid != os.getpid():
+            self._connection = sqlite3.connect(str(self.db_file), timeout=60, check_same_thread=False)
+            self._connection_pid = os.getpid()
+            with self._connection:
+                self._connection.execute('CREATE TABLE IF NOT EXISTS results '
+                                         '(key TEXT PRIMARY KEY, value BLOB, size INTEGER, last_access REAL)')
+                self._connection.execute('CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)')
+        return self._connection
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_lock'] = None
+        state['_connection'] = None
+        state['_connection_pid'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+
+def _to_json(obj: Any) -> Any:
+    """ Helper function to serialize objects which are not supported by json, e.g. NumPy arrays and scalars. """
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, 'item'):
+        return obj.item()
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj, key=repr)
+    if isinstance(obj, Path):
+        return str(obj)
+    raise TypeError(f'Object of type {type(obj)} can not be used as part of a cache key')
@@ -0,0 +1,198 @@
+""" Export of the tables of tabular benchmarks.
+
+Tabular benchmarks, e.g. NAS-Bench-201, look up the results of the configurations in a table. To analyze the table as a
+whole (e.g. to compute the regret of optimizers), it is exported as columnar file with one row per configuration,
+fidelity and seed. The rows are written in chunks, so that the table never has to be held in memory.
+
+Supported formats:
+    - npz: One array per column. Readable with `np.load`. No further dependencies.
+    - parquet, arrow (Arrow IPC file): Require pyarrow.
+
+Columns with few distinct strings, e.g. the operations of a cell, are stored as integer codes. For npz, the values of
+the codes are in the array `<column>.categories`. For parquet and arrow, they are dictionary encoded. Meta information,
+e.g. the name of the benchmark, is stored as json in the array `__metadata__` or the schema metadata, respectively.
+"""
+
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Union, Dict, List
+from zipfile import ZipFile, ZIP_DEFLATED
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+logger = logging.getLogger('TableUtils')
+
+FORMATS = {'.npz': 'npz', '.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow'}
+
+
+def get_table_format(path: Union[Path, str], table_format: Union[str, None] = None) -> str:
+    """ Return the format of the table. Defaults to the format given by the suffix of the path. """
+    if table_format is None:
+        suffix = Path(path).suffix
+        assert suffix in FORMATS, f'Can not infer the format of {path}. Use one of the suffixes {list(FORMATS)}'
+        table_format = FORMATS[suffix]
+
+    assert table_format in set(FORMATS.values()), \
+        f'Unknown format {table_format}. Choose from {sorted(set(FORMATS.values()))}'
+    return table_format
+
+
+class TableWriter(object):
+
+    def __init__(self, path: Union[Path, str], table_format: Union[str, None] = None,
+                 categories: Union[Dict[str, List[str]], None] = None, metadata: Union[Dict, None] = None):
+        """
+        Writes a table chunk-wise to a columnar file. The file is written to a temporary file first, which is renamed
+        on `close`. Thus, an interrupted export never leaves a truncated table behind.
+
+        Usage:
+            with TableWriter('table.parquet', categories={'op': ['conv', 'pool']}) as writer:
+                writer.write({'op': np.array([0, 1]), 'loss': np.array([0.5, 0.4])})
+
+        Parameters
+        ----------
+        path : Path, str
+            Path of the table.
+        table_format : str, None
+            One of 'npz', 'parquet', 'arrow'. Defaults to the format given by the suffix of the path.
+        categories : Dict[str, List[str]], None
+            Columns, which are given as integer codes, and the values of the codes.
+        metadata : Dict, None
+            Json serializable meta information, which is stored with the table.
+        """
+        self.path = Path(path)
+        self.table_format = get_table_format(path, table_format)
+        self.categories = categories if categories is not None else {}
+        self.metadata = metadata if metadata is not None else {}
+
+        if self.table_format in ['parquet', 'arrow'] and pa is None:
+            raise ImportError(f'Exporting tables as {self.table_format} requires pyarrow. Install it via '
+                              f'`pip install pyarrow` or use the npz format.')
+
+        self.n_rows = 0
+        self._tmp_path = self.path.with_name(f'.{self.path.name}.{os.getpid()}.tmp')
+        self._dtypes = None
+        self._writer = None
+        self._sink = None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.table_format == 'npz':
+            # The columns are streamed to one raw file per column. They are packed into the npz archive on `close`,
+            # when the number of rows is known.
+            self._tmp_path.mkdir()
+
+    def write(self, columns: Dict[str, np.ndarray]):
+        """ Append rows to the table. All chunks have to contain the same columns with the same length. """
+        lengths = {len(column) for column in columns.values()}
+        assert len(lengths) == 1, f'The columns have different lengths {lengths}'
+
+        columns = {name: np.ascontiguousarray(column) for name, column in columns.items()}
+        if self._dtypes is None:
+            self._dtypes = {name: column.dtype for name, column in columns.items()}
+        assert list(columns) == list(self._dtypes), \
+            f'The chunk has the columns {list(columns)}, but the table has the columns {list(self._dtypes)}'
+        columns = {name: column.astype(self._dtypes[name], copy=False) for name, column in columns.items()}
+
+        if self.table_format == 'npz':
+            for name, column in columns.items():
+                with (self._tmp_path / self._get_column_file(name)).open('ab') as fh:
+                    fh.write(column.tobytes())
+        else:
+            self._write_record_batch(columns)
+
+        self.n_rows += lengths.pop()
+
+    def close(self):
+        """ Finish the table and move it to its final location. """
+        if self.table_format == 'npz':
+            self._write_npz()
+            shutil.rmtree(self._tmp_path)
+        else:
+            if self._writer is None:
+                raise ValueError('The table is empty')
+            self._writer.close()
+            if self._sink is not None:
+                self._sink.close()
+            self._tmp_path.replace(self.path)
+
+        logger.info(f'Exported {self.n_rows} rows to {self.path}')
+
+    def abort(self):
+        """ Discard the table. """
+        if self._writer is not None:
+            self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+
+        if self._tmp_path.is_dir():
+            shutil.rmtree(self._tmp_path)
+        elif self._tmp_path.exists():
+            self._tmp_path.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    @staticmethod
+    def _get_column_file(name: str) -> str:
+        # Column names may contain characters, which are not allowed in file names, e.g. '1<-0'.
+        return f'{name.encode().hex()}.bin'
+
+    def _write_npz(self):
+        if self._dtypes is None:
+            raise ValueError('The table is empty')
+
+        tmp_file = self._tmp_path / 'table.npz'
+        with ZipFile(str(tmp_file), mode='w', compression=ZIP_DEFLATED, allowZip64=True) as zip_file:
+            for name, dtype in self._dtypes.items():
+                with zip_file.open(f'{name}.npy', mode='w', force_zip64=True) as fh, \
+                        (self._tmp_path / self._get_column_file(name)).open('rb') as column:
+                    np.lib.format.write_array_header_1_0(fh, {'descr': np.lib.format.dtype_to_descr(dtype),
+                                                              'fortran_order': False,
+                                                              'shape': (self.n_rows,)})
+                    shutil.copyfileobj(column, fh, 2 ** 20)
+
+            small_arrays = {f'{name}.categories': np.array(values) for name, values in self.categories.items()}
+            small_arrays['__metadata__'] = np.array(json.dumps(self.metadata))
+            for name, array in small_arrays.items():
+                with zip_file.open(f'{name}.npy', mode='w') as fh:
+                    np.lib.format.write_array(fh, array)
+
+        tmp_file.replace(self.path)
+
+    def _write_record_batch(self, columns: Dict[str, np.ndarray]):
+        arrays = []
+        for name, column in columns.items():
+            if name in self.categories:
+                arrays.append(pa.DictionaryArray.from_arrays(pa.array(column), pa.array(self.categories[name])))
+            else:
+                arrays.append(pa.array(column))
+        batch = pa.RecordBatch.from_arrays(arrays, list(columns))
+
+        if self._writer is None:
+            schema = batch.schema.with_metadata({'hpolib': json.dumps(self.metadata)})
+            if self.table_format == 'parquet':
+                self._writer = pq.ParquetWriter(str(self._tmp_path), schema)
+            else:
+                self._sink = pa.OSFile(str(self._tmp_path), 'wb')
+                self._writer = pa.ipc.new_file(self._sink, schema)
+
+        if self.table_format == 'parquet':
+            self._writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self._writer.write_batch(batch)
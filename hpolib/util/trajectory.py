@@ -0,0 +1,142 @@
+""" Recorder for the queries of a benchmark.
+
+The wrapped tabular benchmarks of https://github.com/automl/nas_benchmarks append each query to python lists to track
+the trajectory of an optimizer. HPOlib queries them without this side effect. If the trajectory is needed, it can be
+recorded explicitly (see `AbstractBenchmark.enable_trajectory_recorder`).
+
+The TrajectoryRecorder stores the queries in preallocated numpy arrays. They grow by doubling their size up to
+`max_size`. Afterwards, they are used as a ring buffer, i.e. the oldest queries are overwritten.
+
+Usage:
+    benchmark = SliceLocalizationBenchmark()
+    benchmark.enable_trajectory_recorder(max_size=10000)
+    benchmark.objective_function(configuration)
+    trajectory = benchmark.trajectory.get_trajectory()
+"""
+
+from typing import Union, Dict, List
+
+import ConfigSpace as CS
+import numpy as np
+
+
+class TrajectoryRecorder(object):
+
+    def __init__(self, configuration_space: CS.ConfigurationSpace,
+                 fidelity_space: Union[CS.ConfigurationSpace, None] = None,
+                 initial_size: int = 1024, max_size: Union[int, None] = None):
+        """
+        Parameters
+        ----------
+        configuration_space : CS.ConfigurationSpace
+            The configurations are stored in their vector representation (see `CS.Configuration.get_array`).
+        fidelity_space : CS.ConfigurationSpace, None
+            If given, the fidelities are stored in their vector representation, too.
+        initial_size : int
+            Number of queries, for which memory is allocated at the beginning.
+        max_size : int, None
+            Maximum number of stored queries. If it is reached, the oldest queries are overwritten.
+            If None, the buffer grows without limit.
+        """
+        assert initial_size > 0, 'The initial size has to be positive'
+        assert max_size is None or max_size > 0, 'The maximum size has to be positive'
+
+        self.configuration_space = configuration_space
+        self.fidelity_space = fidelity_space
+        self.max_size = max_size
+
+        self.n_recorded = 0
+        self._start = 0
+        self._size = 0
+        self._buffers = self._allocate(initial_size if max_size is None else min(initial_size, max_size))
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buffers['function_value'])
+
+    def record(self, configuration: Union[Dict, CS.Configuration], fidelity: Union[Dict, None],
+               function_value: float, cost: float):
+        """ Append a query to the trajectory. """
+        if self._size == self.capacity and (self.max_size is None or self.capacity < self.max_size):
+            self._grow()
+
+        position = (self._start + self._size) % self.capacity
+        if self._size == self.capacity:
+            # The buffer is full. Overwrite the oldest query.
+            self._start = (self._start + 1) % self.capacity
+        else:
+            self._size += 1
+
+        self._buffers['configuration'][position] = self._to_array(self.configuration_space, configuration)
+        if self.fidelity_space is not None:
+            self._buffers['fidelity'][position] = self._to_array(self.fidelity_space, fidelity)
+        self._buffers['function_value'][position] = function_value
+        self._buffers['cost'][position] = cost
+        self._buffers['index'][position] = self.n_recorded
+        self.n_recorded += 1
+
+    def record_batch(self, configurations: List[Union[Dict, CS.Configuration]], fidelities: List[Union[Dict, None]],
+                     function_values: np.ndarray, costs: np.ndarray):
+        """ Append several queries to the trajectory. """
+        for configuration, fidelity, function_value, cost in zip(configurations, fidelities, function_values, costs):
+            self.record(configuration, fidelity, function_value, cost)
+
+    def get_trajectory(self) -> Dict[str, np.ndarray]:
+        """
+        Return the stored queries in the order of recording. The arrays are copies.
+
+        Returns
+        -------
+        Dict -
+            index : np.ndarray - Number of the query. Queries which were overwritten are missing.
+            configuration : np.ndarray - Vector representation of the configurations
+            fidelity : np.ndarray - Vector representation of the fidelities (if the fidelity space is given)
+            function_value : np.ndarray
+            cost : np.ndarray
+            incumbent_value : np.ndarray - Best function value so far (among the stored queries)
+            cumulative_cost : np.ndarray - Cost so far (among the stored queries)
+        """
+        order = (self._start + np.arange(self._size)) % self.capacity
+        trajectory = {name: buffer[order] for name, buffer in self._buffers.items()}
+        trajectory['incumbent_value'] = np.minimum.accumulate(trajectory['function_value'])
+        trajectory['cumulative_cost'] = np.cumsum(trajectory['cost'])
+        return trajectory
+
+    def reset(self):
+        """ Remove all queries. The allocated memory is kept. """
+        self.n_recorded = 0
+        self._start = 0
+        self._size = 0
+
+    def _allocate(self, size: int) -> Dict[str, np.ndarray]:
+        buffers = {'index': np.empty(size, dtype=np.int64),
+                   'configuration': np.empty((size, len(self.configuration_space.get_hyperparameters())),
+                                             dtype=np.float64),
+                   'function_value': np.empty(size, dtype=np.float64),
+                   'cost': np.empty(size, dtype=np.float64)}
+        if self.fidelity_space is not None:
+            buffers['fidelity'] = np.empty((size, len(self.fidelity_space.get_hyperparameters())), dtype=np.float64)
+        return buffers
+
+    def _grow(self):
+        """ Double the capacity (up to `max_size`) and move the queries to the beginning of the new buffers. """
+        size = self.capacity * 2 if self.max_size is None else min(self.capacity * 2, self.max_size)
+        order = (self._start + np.arange(self._size)) % self.capacity
+
+        buffers = self._allocate(size)
+        for name, buffer in self._buffers.items():
+            buffers[name][:self._size] = buffer[order]
+
+        self._buffers = buffers
+        self._start = 0
+
+    @staticmethod
+    def _to_array(space: CS.ConfigurationSpace, values: Union[Dict, CS.Configuration, None]) -> np.ndarray:
+        if values is None:
+            return np.full(len(space.get_hyperparameters()), np.nan)
+        if isinstance(values, CS.Configuration):
+            return values.get_array()
+        return CS.Configuration(space, values=values).get_array()
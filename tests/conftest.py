@@ -0,0 +1,62 @@
+import threading
+import time
+
+import numpy as np
+import Pyro4
+import pytest
+
+
+class FakeProxy:
+    """ Replaces the Pyro4 proxy of a container. """
+    _pyroSerializer = None
+    _pyroTimeout = None
+
+
+class FakeClient:
+    """ Replaces a started container and the connection to it. """
+    uri = 'PYRO:fake.unixsock@./u:/tmp/fake_unix.sock'
+    started = []
+    lock = threading.Lock()
+
+    def __init__(self, rng=None, start_time=0):
+        time.sleep(start_time)
+        self.rng = rng
+        self.socket_id = f'fake_{len(self.started)}'
+        self.benchmark = FakeProxy()
+        self.healthy = True
+        self.stopped = False
+        self.threads = set()
+        self.release = threading.Event()
+        with self.lock:
+            self.started.append(self)
+
+    def get_meta_information(self):
+        if not self.healthy:
+            raise Pyro4.errors.ConnectionClosedError('Connection lost')
+        return {'name': 'fake'}
+
+    def objective_function(self, configuration):
+        if not self.healthy:
+            raise Pyro4.errors.ConnectionClosedError('Connection lost')
+        return {'function_value': configuration['x'], 'cost': 1}
+
+    def _query(self, proxy, function_name, configuration, fidelity=None, rng=None, **kwargs):
+        self.threads.add(threading.current_thread())
+        if kwargs.get('block', False):
+            self.release.wait()
+        return {'function_value': configuration['x'], 'cost': 1,
+                'info': {'function_name': function_name, 'rng': rng, 'timeout': proxy._pyroTimeout}}
+
+    @staticmethod
+    def _cast_random_state_to_int(rng):
+        return rng.randint(0, 100000) if isinstance(rng, np.random.RandomState) else rng
+
+    def __del__(self):
+        self.stopped = True
+
+
+@pytest.fixture
+def fake_client():
+    """ The class of the fake client. The list of its started instances is reset for each test. """
+    FakeClient.started = []
+    return FakeClient
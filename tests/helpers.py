@@ -0,0 +1,57 @@
+from typing import Dict, Union
+
+import ConfigSpace as CS
+import numpy as np
+
+from hpolib.abstract_benchmark import AbstractBenchmark
+
+
+class DummyBenchmark(AbstractBenchmark):
+    """ A cheap benchmark with one hyperparameter `x` and one fidelity `budget`. It counts its evaluations. """
+
+    def __init__(self, rng=None):
+        super(DummyBenchmark, self).__init__(rng=rng)
+        self.n_evaluations = 0
+
+    @AbstractBenchmark._configuration_as_dict
+    @AbstractBenchmark._check_configuration
+    @AbstractBenchmark._check_fidelity
+    @AbstractBenchmark._record_trajectory
+    @AbstractBenchmark._cache_result
+    def objective_function(self, configuration: Union[Dict, CS.Configuration], fidelity: Union[Dict, None] = None,
+                           rng: Union[np.random.RandomState, int, None] = None, **kwargs) -> Dict:
+        self.n_evaluations += 1
+        return {'function_value': configuration['x'] * fidelity['budget'],
+                'cost': fidelity['budget'],
+                'info': {'fidelity': fidelity}}
+
+    def objective_function_test(self, configuration, fidelity=None, rng=None, **kwargs):
+        raise NotImplementedError()
+
+    @staticmethod
+    def get_configuration_space(seed: Union[int, None] = None) -> CS.ConfigurationSpace:
+        cs = CS.ConfigurationSpace(seed=seed)
+        cs.add_hyperparameter(CS.UniformFloatHyperparameter('x', lower=0, upper=1))
+        return cs
+
+    @staticmethod
+    def get_fidelity_space(seed: Union[int, None] = None) -> CS.ConfigurationSpace:
+        fidel_space = CS.ConfigurationSpace(seed=seed)
+        fidel_space.add_hyperparameter(CS.UniformIntegerHyperparameter('budget', lower=1, upper=10, default_value=10))
+        return fidel_space
+
+    @staticmethod
+    def get_meta_information() -> Dict:
+        return {}
+
+
+def get_synthetic_data():
+    """ A small synthetic binary data set with a categorical column and a column with missing values. It has the
+    format of `get_data` of the OpenML benchmarks. """
+    rs = np.random.RandomState(1)
+    X = rs.rand(300, 4)
+    X[:, 2] = rs.randint(3, size=300)
+    y = ((X[:, 0] + X[:, 2] / 2 + 0.3 * rs.rand(300)) > 1.2).astype(int)
+    X[rs.rand(300) < 0.1, 1] = np.nan
+    return X[:200], y[:200], X[200:250], y[200:250], X[250:], y[250:], \
+        ['numerical', 'numerical', 'categorical', 'numerical']
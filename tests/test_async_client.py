@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+from hpolib.container.client_async_benchmark import AsyncBenchmarkClient
+
+
+def test_async_client(fake_client):
+    client = fake_client()
+
+    with AsyncBenchmarkClient(client, timeout=10) as async_client:
+        futures = [async_client.objective_function({'x': i}, rng=i) for i in range(5)]
+        results = [future.result() for future in futures]
+
+        assert [result['function_value'] for result in results] == list(range(5))
+        assert [result['info']['rng'] for result in results] == list(range(5))
+        assert all(result['info']['timeout'] == 10 for result in results)
+
+        # All calls are sent by the same I/O thread, not by the calling thread.
+        assert len(client.threads) == 1
+        assert threading.current_thread() not in client.threads
+
+        result = async_client.objective_function_test({'x': 1}, rng=np.random.RandomState(1), timeout=1).result()
+        assert result['info']['function_name'] == 'objective_function_test'
+        assert isinstance(result['info']['rng'], int)
+        assert result['info']['timeout'] == 1
+
+        async def main():
+            return await asyncio.wrap_future(async_client.objective_function({'x': 3}))
+        assert asyncio.get_event_loop().run_until_complete(main())['function_value'] == 3
+
+
+def test_async_client_cancel(fake_client):
+    client = fake_client()
+    async_client = AsyncBenchmarkClient(client)
+
+    running = async_client.objective_function({'x': 1}, block=True)
+    queued = [async_client.objective_function({'x': 2}) for _ in range(3)]
+    time.sleep(0.1)
+
+    assert queued[0].cancel()
+    assert async_client.cancel_pending() == 2
+    assert all(future.cancelled() for future in queued)
+    assert not running.cancel()
+
+    client.release.set()
+    assert running.result()['function_value'] == 1
+    async_client.close()
+
+
+def test_async_client_connections(fake_client):
+    client = fake_client()
+
+    with AsyncBenchmarkClient(client, n_connections=3) as async_client:
+        # The blocking calls are sent concurrently by three I/O threads, each with its own proxy.
+        futures = [async_client.objective_function({'x': i}, block=True) for i in range(3)]
+        time.sleep(0.1)
+        assert len(client.threads) == 3
+        assert not any(future.done() for future in futures)
+
+        client.release.set()
+        assert [future.result()['function_value'] for future in futures] == [0, 1, 2]
+        assert len(async_client._proxies) == 3
@@ -5,9 +5,11 @@ import numpy as np
 import pytest
 from ConfigSpace import ConfigurationSpace
 from ConfigSpace import UniformFloatHyperparameter, UniformIntegerHyperparameter, \
-    CategoricalHyperparameter
+    CategoricalHyperparameter, OrdinalHyperparameter, EqualsCondition, InCondition, OrConjunction, \
+    ForbiddenEqualsClause
 
 from hpolib.abstract_benchmark import AbstractBenchmark
+from hpolib.util.config_validator import ConfigurationValidator
 
 
 class TestCheckUnittest(unittest.TestCase):
@@ -112,3 +114,102 @@ class TestCheckUnittest2(unittest.TestCase):
 
         result = tmp(self=self.foo, configuration=np.array([0.5, 1.5, 2.5]))
         assert np.array_equal(result, np.array([0.5, 1.5, 2.5]))
+
+
+class TestCheckFastUnittest(unittest.TestCase):
+
+    def setUp(self):
+        class Dummy():
+            _validate = 'fast'
+
+            configuration_space = ConfigurationSpace(seed=1)
+            flt = UniformFloatHyperparameter("flt", lower=0.0, upper=1.0)
+            cat = CategoricalHyperparameter("cat", choices=(1, "a"))
+            itg = UniformIntegerHyperparameter("itg", lower=0, upper=10)
+            ord = OrdinalHyperparameter("ord", sequence=["s", "m", "l"])
+            configuration_space.add_hyperparameters([flt, cat, itg, ord])
+            configuration_space.add_condition(OrConjunction(EqualsCondition(ord, cat, "a"),
+                                                            InCondition(ord, itg, [9, 10])))
+
+            fidelity_space = ConfigurationSpace(seed=1)
+            f1 = UniformFloatHyperparameter("f_flt", lower=0.0, upper=1.0)
+            f2 = CategoricalHyperparameter("f_cat", choices=(1, "a"))
+            f3 = UniformIntegerHyperparameter("f_itg", lower=0, upper=10)
+            fidelity_space.add_hyperparameters([f1, f2, f3])
+
+        self.foo = Dummy()
+
+    def test_config_decorator(self):
+        @AbstractBenchmark._check_configuration
+        def tmp(_, configuration: Dict, **kwargs):
+            return configuration
+
+        tmp(self=self.foo, configuration={"flt": 0.2, "cat": 1, "itg": 1})
+        tmp(self=self.foo, configuration={"flt": 0.2, "cat": "a", "itg": 1, "ord": "m"})
+        tmp(self=self.foo, configuration={"flt": 0.2, "cat": 1, "itg": 10, "ord": "m"})
+        for _ in range(10):
+            tmp(self=self.foo, configuration=self.foo.configuration_space.sample_configuration())
+
+        invalid_configurations = [{"flt": 0.2, "cat": 1},  # missing
+                                  {"flt": 2.0, "cat": 1, "itg": 1},  # out of bounds
+                                  {"flt": 0.2, "cat": 1, "itg": 1.0},  # float for an integer
+                                  {"flt": 0.2, "cat": "b", "itg": 1},  # unknown choice
+                                  {"flt": 0.2, "cat": 1, "itg": 1, "ord": "m"},  # inactive
+                                  {"flt": 0.2, "cat": "a", "itg": 1},  # active, but missing
+                                  {"flt": 0.2, "cat": 1, "itg": 1, "unknown": 1}]
+        for configuration in invalid_configurations:
+            with pytest.raises(ValueError):
+                tmp(self=self.foo, configuration=configuration)
+
+            # The fast path agrees with ConfigSpace
+            self.foo._validate = 'full'
+            with pytest.raises(ValueError):
+                tmp(self=self.foo, configuration=configuration)
+            self.foo._validate = 'fast'
+
+        with pytest.raises(TypeError):
+            tmp(self=self.foo, configuration=[0.2, 1])
+
+        self.foo._validate = 'off'
+        tmp(self=self.foo, configuration={"flt": 2.0, "cat": 1, "itg": 1})
+
+    def test_fidel_decorator(self):
+        @AbstractBenchmark._check_fidelity
+        def tmp(_, configuration: Dict, fidelity: Dict, **kwargs):
+            return configuration, fidelity, kwargs
+
+        default_fidel = dict(self.foo.fidelity_space.get_default_configuration())
+
+        _, ret, _ = tmp(self=self.foo, configuration={}, fidelity={"f_cat": 1})
+        self.assertEqual(ret, default_fidel)
+
+        _, ret, _ = tmp(self=self.foo, configuration={}, fidelity={"f_itg": 1})
+        self.assertEqual(ret, {**default_fidel, "f_itg": 1})
+
+        # The cached default fidelity is not changed by the call
+        _, ret, _ = tmp(self=self.foo, configuration={})
+        self.assertEqual(ret, default_fidel)
+        ret["f_itg"] = 1
+        _, ret, _ = tmp(self=self.foo, configuration={})
+        self.assertEqual(ret, default_fidel)
+
+        with pytest.raises(ValueError):
+            tmp(self=self.foo, configuration={}, f_cat=1)
+        with pytest.raises(ValueError):
+            tmp(self=self.foo, configuration={}, fidelity={"f_cat": "b"})
+        with pytest.raises(TypeError):
+            tmp(self=self.foo, configuration={}, fidelity=[0.1])
+
+
+def test_configuration_validator_fallback():
+    configuration_space = ConfigurationSpace(seed=1)
+    cat = CategoricalHyperparameter("cat", choices=("a", "b"))
+    configuration_space.add_hyperparameter(cat)
+    configuration_space.add_forbidden_clause(ForbiddenEqualsClause(cat, "b"))
+
+    validator = ConfigurationValidator(configuration_space)
+    assert not validator.is_supported
+
+    validator.check({"cat": "a"})
+    with pytest.raises(ValueError):
+        validator.check({"cat": "b"})
@@ -0,0 +1,89 @@
+import threading
+
+import Pyro4
+import pytest
+
+from hpolib.container.container_pool import ContainerPool
+
+
+def test_container_pool_reuse(fake_client):
+    with ContainerPool(size=2) as pool:
+        futures = pool.warm_up(fake_client, wait=True, rng=1)
+        assert len(futures) == 2
+        assert len(fake_client.started) == 2
+
+        # The group is already full
+        assert pool.warm_up(fake_client, rng=1) == []
+
+        for i in range(5):
+            with pool.lease(fake_client, rng=1) as benchmark:
+                assert benchmark.objective_function({'x': i})['function_value'] == i
+        assert len(fake_client.started) == 2
+
+        # Other arguments are a different group
+        with pool.lease(fake_client, rng=2) as benchmark:
+            assert benchmark.rng == 2
+        assert len(fake_client.started) == 3
+
+        with pool.lease(fake_client, rng=1) as first:
+            with pool.lease(fake_client, rng=1) as second:
+                assert first is not second
+                with pytest.raises(TimeoutError):
+                    pool.acquire(fake_client, timeout=0.1, rng=1)
+
+    assert all(client.stopped for client in fake_client.started)
+
+
+def test_container_pool_wait_for_release(fake_client):
+    with ContainerPool(size=1) as pool:
+        client = pool.acquire(fake_client, rng=1)
+        threading.Timer(0.2, pool.release, args=(client,)).start()
+
+        with pool.lease(fake_client, timeout=10, rng=1) as benchmark:
+            assert benchmark is client
+
+
+def test_container_pool_crash(fake_client):
+    with ContainerPool(size=1) as pool:
+        with pytest.raises(Pyro4.errors.ConnectionClosedError):
+            with pool.lease(fake_client, rng=1) as benchmark:
+                benchmark.healthy = False
+                benchmark.objective_function({'x': 1})
+        crashed = fake_client.started[0]
+        assert crashed.stopped
+
+        # The crashed instance is replaced in the background
+        with pool.lease(fake_client, timeout=10, rng=1) as benchmark:
+            assert benchmark is not crashed
+            assert benchmark.objective_function({'x': 1})['function_value'] == 1
+
+        # Instances, which do not respond anymore, are detected by the health check
+        fake_client.started[1].healthy = False
+        with pool.lease(fake_client, timeout=10, rng=1) as benchmark:
+            assert benchmark is not fake_client.started[1]
+            assert benchmark.healthy
+        assert fake_client.started[1].stopped
+        assert len(fake_client.started) == 3
+
+
+def test_container_pool_max_uses(fake_client):
+    with ContainerPool(size=1, max_uses=2) as pool:
+        for _ in range(4):
+            with pool.lease(fake_client, timeout=10, rng=1):
+                pass
+        assert sum(client.stopped for client in fake_client.started) == 2
+
+
+def test_container_pool_close(fake_client):
+    pool = ContainerPool(size=2)
+    pool.warm_up(fake_client, rng=1, start_time=0.1)
+    client = pool.acquire(fake_client, rng=1, start_time=0.1)
+    pool.close()
+
+    # Leased instances are stopped when they are released
+    assert not client.stopped
+    pool.release(client)
+    assert all(client.stopped for client in fake_client.started)
+
+    with pytest.raises(RuntimeError):
+        pool.acquire(fake_client, rng=1)
@@ -1,7 +1,10 @@
+import numpy as np
 import pytest
 import hpolib
-from hpolib.util.data_manager import NASBench_201Data
+from hpolib.util.data_manager import NASBench_201Data, NASBench_201ArchitectureIndex, FCNetData, NASBench_101Data
 import shutil
+import contextlib
+import threading
 from multiprocessing import Pool
 
 
@@ -49,7 +52,7 @@ def test_nasbench_201_load():
     assert len(data) == len(list(NASBench_201Data.get_seeds_metrics()))
     assert len(data) == 3 * len(NASBench_201Data.get_metrics())
     assert (hpolib.config_file.data_dir / "nasbench_201").exists()
-    assert len(list((hpolib.config_file.data_dir / "nasbench_201" / "data").glob('*.pkl'))) == 72
+    assert len(list((hpolib.config_file.data_dir / "nasbench_201" / "data").glob('*.pkl'))) == 18
     assert not (hpolib.config_file.data_dir / "nasbench_201_data_v1.1.zip").exists()
 
     data_manager.data = None
@@ -57,3 +60,333 @@ def test_nasbench_201_load():
     data_manager = NASBench_201Data(dataset='cifar100')
     data = data_manager.load()
     assert len(data) == 3 * len(NASBench_201Data.get_metrics())
+
+
+def test_nasbench_201_arch_str_to_index():
+    assert NASBench_201Data.arch_str_to_index('|none~0|+|none~0|none~1|+|none~0|none~1|none~2|') == 0
+    assert NASBench_201Data.arch_str_to_index('|skip_connect~0|+|none~0|none~1|+|none~0|none~1|none~2|') == 1
+    assert NASBench_201Data.arch_str_to_index('|none~0|+|none~0|none~1|+|none~0|none~1|avg_pool_3x3~2|') == 4 * 5 ** 5
+    assert NASBench_201Data.arch_str_to_index(
+        '|avg_pool_3x3~0|+|avg_pool_3x3~0|avg_pool_3x3~1|+|avg_pool_3x3~0|avg_pool_3x3~1|avg_pool_3x3~2|') \
+        == NASBench_201Data.get_num_architectures() - 1
+
+
+def test_nasbench_201_architecture_index(tmp_path):
+    index = NASBench_201ArchitectureIndex(save_dir=tmp_path)
+    assert (tmp_path / 'nb201_architecture_index.npz').exists()
+    assert len(index) == NASBench_201Data.get_num_architectures()
+
+    for arch_index in [0, 1, 777, 4 * 5 ** 5, len(index) - 1]:
+        arch_str = index.index_to_arch_str(arch_index)
+        assert NASBench_201Data.arch_str_to_index(arch_str) == arch_index
+        assert index.arch_str_to_index(arch_str) == arch_index
+        assert index.config_to_index(index.index_to_config(arch_index)) == arch_index
+
+    assert index.index_to_arch_str(1) == '|skip_connect~0|+|none~0|none~1|+|none~0|none~1|none~2|'
+    assert index.index_to_config(4 * 5 ** 5)['3<-2'] == 'avg_pool_3x3'
+
+    # Swapping the intermediate nodes leads to the same cell
+    config = {'1<-0': 'nor_conv_3x3', '2<-0': 'avg_pool_3x3', '2<-1': 'none',
+              '3<-0': 'none', '3<-1': 'skip_connect', '3<-2': 'nor_conv_1x1'}
+    swapped = {'1<-0': 'avg_pool_3x3', '2<-0': 'nor_conv_3x3', '2<-1': 'none',
+               '3<-0': 'none', '3<-1': 'nor_conv_1x1', '3<-2': 'skip_connect'}
+    assert index.canonical_index(index.config_to_index(config)) \
+        == index.canonical_index(index.config_to_index(swapped))
+
+    # Edges which do not reach the output node do not matter
+    dead_edge = dict(config, **{'2<-0': 'nor_conv_3x3', '3<-2': 'none'})
+    no_edge = dict(dead_edge, **{'2<-0': 'none'})
+    assert index.canonical_index(index.config_to_index(dead_edge)) \
+        == index.canonical_index(index.config_to_index(no_edge))
+    assert index.canonical_index(index.config_to_index(config)) \
+        != index.canonical_index(index.config_to_index(no_edge))
+
+    # All cells without a path to the output node compute zero
+    assert index.canonical_index(len(index) - 1) == len(index) - 1
+    assert index.canonical_index(index.arch_str_to_index('|avg_pool_3x3~0|+|none~0|none~1|+|none~0|none~1|none~2|')) \
+        == 0
+
+    unique = index.get_unique_indices()
+    assert 0 < len(unique) < len(index)
+    assert all(index.canonical_index(arch_index) == arch_index for arch_index in unique)
+
+    # The second index is loaded from the file
+    loaded = NASBench_201ArchitectureIndex(save_dir=tmp_path)
+    assert loaded.arch_strs == index.arch_strs
+    assert np.array_equal(loaded.canonical, index.canonical)
+
+
+def test_nasbench_201_load_arrays():
+    data_manager = NASBench_201Data(dataset='cifar10-valid')
+    arrays = data_manager.load_arrays()
+
+    assert set(arrays.keys()) == set(NASBench_201Data.get_metrics())
+    for array in arrays.values():
+        assert array.shape == (15625, 3, 200)
+        assert array.dtype == np.float32
+
+    # Times are stored as cumulative sums over the epochs
+    assert np.all(np.diff(arrays['train_times'][:10], axis=2) >= 0)
+
+
+def test_nasbench_201_load_arrays_memmap():
+    data_manager = NASBench_201Data(dataset='cifar10-valid')
+    arrays = data_manager.load_arrays()
+
+    for metric, array in arrays.items():
+        assert data_manager._get_array_file(metric).exists()
+        assert isinstance(array, np.memmap)
+        assert not array.flags.writeable
+
+    # The second call reads the converted arrays and does not touch the pickled data anymore.
+    data_manager = NASBench_201Data(dataset='cifar10-valid')
+    data_manager.load = None
+    arrays_2 = data_manager.load_arrays()
+    assert np.array_equal(arrays['eval_acc1es'][:10], arrays_2['eval_acc1es'][:10], equal_nan=True)
+
+
+def _create_nasbench_201_archive(path):
+    from zipfile import ZipFile
+    import pickle
+
+    with ZipFile(path, 'w') as zip_file:
+        for dataset in ['cifar10', 'cifar100']:
+            for file in NASBench_201Data.get_files_per_dataset(dataset):
+                content = pickle.dumps({'|none~0|+|none~0|none~1|+|none~0|none~1|none~2|': [1.0]})
+                zip_file.writestr(f'data/{file}', content)
+
+
+def test_nasbench_201_download_offline(tmp_path):
+    import hashlib
+
+    archive = tmp_path / 'nasbench_201_data_v1.1.zip'
+    _create_nasbench_201_archive(archive)
+    sha256 = hashlib.sha256(archive.read_bytes()).hexdigest()
+
+    data_manager = NASBench_201Data(dataset='cifar100', source=archive.as_uri(), sha256=sha256)
+    data_manager._save_dir = tmp_path / 'nasbench_201'
+    data_manager.create_save_directory(data_manager._save_dir)
+
+    # A left-over partial download is discarded since the source does not support resuming.
+    (data_manager._save_dir / 'nasbench_201_data_v1.1.zip.part').write_bytes(b'broken')
+
+    data = data_manager.load()
+    assert len(data) == 3 * len(NASBench_201Data.get_metrics())
+    # Only the files of the requested dataset are extracted
+    extracted = list((data_manager._save_dir / 'data').iterdir())
+    assert len(extracted) == 18
+    assert all([file.name.startswith('nb201_cifar100') for file in extracted])
+    assert (data_manager._save_dir / 'nasbench_201_data_v1.1.zip').exists()
+    assert not (data_manager._save_dir / 'nasbench_201_data_v1.1.zip.part').exists()
+
+    # Local mirror and a wrong checksum
+    data_manager = NASBench_201Data(dataset='cifar10', source=archive, sha256='0' * 64)
+    data_manager._save_dir = tmp_path / 'nasbench_201'
+    with pytest.raises(ValueError):
+        data_manager.load()
+
+    data_manager._sha256 = None
+    data_manager.load()
+    assert len(list((data_manager._save_dir / 'data').iterdir())) == 36
+
+
+@contextlib.contextmanager
+def _serve_with_ranges(content: bytes):
+    """ Serve the content via http. Supports range requests as the server of the archive. """
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            start = int(self.headers.get('Range', 'bytes=0-')[len('bytes='):].rstrip('-'))
+            if start >= len(content):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(content)}')
+                self.end_headers()
+                return
+            self.send_response(206 if start > 0 else 200)
+            if start > 0:
+                self.send_header('Content-Range', f'bytes {start}-{len(content) - 1}/{len(content)}')
+            self.send_header('Content-Length', str(len(content) - start))
+            self.end_headers()
+            self.wfile.write(content[start:])
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}/nasbench_201_data_v1.1.zip'
+    finally:
+        server.shutdown()
+
+
+def test_nasbench_201_download_resume(tmp_path):
+    archive = tmp_path / 'nasbench_201_data_v1.1.zip'
+    _create_nasbench_201_archive(archive)
+    content = archive.read_bytes()
+
+    with _serve_with_ranges(content) as url:
+        data_manager = NASBench_201Data(dataset='cifar10', source=url)
+        data_manager._save_dir = tmp_path / 'nasbench_201'
+        data_manager.create_save_directory(data_manager._save_dir)
+        part_file = data_manager._save_dir / 'nasbench_201_data_v1.1.zip.part'
+
+        # The partial download is resumed, a complete one is used as it is.
+        for part in [content[:len(content) // 2], content]:
+            part_file.write_bytes(part)
+            downloaded = data_manager._get_archive()
+            assert downloaded.read_bytes() == content
+            assert not part_file.exists()
+            downloaded.unlink()
+
+        # The part file is larger than the archive
+        part_file.write_bytes(content + b'broken')
+        with pytest.raises(ValueError):
+            data_manager._get_archive()
+        assert not part_file.exists()
+
+
+def test_fcnet_config_to_index():
+    assert FCNetData.get_num_configurations() == 62208
+
+    first = {name: values[0] for name, values in FCNetData.get_hyperparameters().items()}
+    last = {name: values[-1] for name, values in FCNetData.get_hyperparameters().items()}
+    assert FCNetData.config_to_index(first) == 0
+    assert FCNetData.config_to_index(last) == FCNetData.get_num_configurations() - 1
+
+    for index in [0, 1, 1234, 62207]:
+        assert FCNetData.config_to_index(FCNetData.index_to_config(index)) == index
+
+    # The last hyperparameter is the least significant digit
+    assert FCNetData.config_to_index(dict(first, n_units_2=32)) == 1
+
+
+def test_fcnet_compile_arrays(tmp_path, monkeypatch):
+    import json
+    h5py = pytest.importorskip('h5py')
+
+    configuration = FCNetData.index_to_config(1234)
+    # The keys of the original data contain e.g. 5 * 1e-2 instead of 0.05
+    key = json.dumps(dict(configuration, init_lr=configuration['init_lr'] * (1 + 1e-12)), sort_keys=True)
+    valid_mse = np.random.RandomState(0).rand(4, 100)
+
+    with h5py.File(str(tmp_path / 'fcnet_naval_propulsion_data.hdf5'), 'w') as data:
+        data.create_group(key)
+        data[key]['valid_mse'] = valid_mse
+        data[key]['runtime'] = np.arange(4)
+
+    monkeypatch.setattr(hpolib.config_file, 'data_dir', tmp_path / 'data')
+    arrays = FCNetData(dataset='naval_propulsion', data_path=tmp_path).load()
+    assert arrays['valid_mse'].shape == (62208, 4, 100)
+    assert arrays['valid_mse'].dtype == np.float64
+    assert np.array_equal(arrays['valid_mse'][1234], valid_mse)
+    assert np.array_equal(arrays['runtime'][1234], np.arange(4))
+    assert np.isnan(arrays['runtime'][1233]).all()
+    assert (tmp_path / 'data' / 'fcnet_tabular_benchmarks' / f'arrays_v{FCNetData.ARRAY_VERSION}'
+            / 'fcnet_naval_propulsion_runtime.npy').exists()
+
+    with pytest.raises(FileNotFoundError):
+        FCNetData(dataset='protein_structure', data_path=tmp_path).load()
+
+
+def test_nasbench_101_hash():
+    # The cell of the nasbench README. The reference hash was computed with nasbench.api.ModelSpec.hash_spec
+    matrix = np.array([[0, 1, 1, 1, 0, 1, 0],
+                       [0, 0, 0, 0, 0, 0, 1],
+                       [0, 0, 0, 0, 0, 0, 1],
+                       [0, 0, 0, 0, 1, 0, 0],
+                       [0, 0, 0, 0, 0, 0, 1],
+                       [0, 0, 0, 0, 0, 0, 1],
+                       [0, 0, 0, 0, 0, 0, 0]])
+    ops = ['input', 'conv1x1-bn-relu', 'conv3x3-bn-relu', 'conv3x3-bn-relu', 'conv3x3-bn-relu', 'maxpool3x3',
+           'output']
+    assert NASBench_101Data.hash_module(*NASBench_101Data.prune(matrix, ops)) == '28cfc7874f6d200472e1a9dcd8650aa0'
+
+    # Node 3 is not connected to the output, node 4 not to the input
+    matrix = np.zeros((7, 7), dtype=np.int8)
+    matrix[[0, 1, 2, 5, 0, 4], [1, 2, 5, 6, 3, 6]] = 1
+    pruned_matrix, pruned_ops = NASBench_101Data.prune(matrix, ops)
+    assert pruned_ops == ['input', 'conv1x1-bn-relu', 'conv3x3-bn-relu', 'maxpool3x3', 'output']
+    assert pruned_matrix.sum() == 4
+
+    matrix[0, 1] = 0
+    assert NASBench_101Data.prune(matrix, ops) is None
+
+
+def _encode_varint(value):
+    encoded = b''
+    while value > 0x7f:
+        encoded += bytes([value & 0x7f | 0x80])
+        value >>= 7
+    return encoded + bytes([value])
+
+
+def _write_nasbench_101_tfrecord(path, records):
+    import base64
+    import json
+    import struct
+
+    with path.open('wb') as fh:
+        for module_hash, budget, matrix, ops, trainable_parameters, final_metrics in records:
+            evaluations = b''
+            for metrics in [(0., 0., 0., 0.), (1., 0.5, 0.5, 0.5), final_metrics]:
+                evaluation = b''.join(struct.pack('<Bd', field << 3 | 1, value)
+                                      for field, value in zip([2, 3, 4, 5], metrics))
+                evaluations += bytes([1 << 3 | 2]) + _encode_varint(len(evaluation)) + evaluation
+            model_metrics = evaluations + bytes([2 << 3]) + _encode_varint(trainable_parameters)
+
+            data = json.dumps([module_hash, budget, ''.join(str(e) for e in np.ravel(matrix)), ','.join(ops),
+                               base64.b64encode(model_metrics).decode('ascii')]).encode('utf-8')
+            fh.write(struct.pack('<QI', len(data), 0) + data + struct.pack('<I', 0))
+
+
+def test_nasbench_101_compile_arrays(tmp_path, monkeypatch):
+    matrix = np.zeros((5, 5), dtype=np.int8)
+    matrix[[0, 1, 2, 3], [1, 2, 3, 4]] = 1
+    ops = ['input', 'conv3x3-bn-relu', 'conv3x3-bn-relu', 'maxpool3x3', 'output']
+    full_matrix = np.triu(np.ones((7, 7), dtype=np.int8), k=1)
+    full_ops = ['input'] + ['conv1x1-bn-relu'] * 5 + ['output']
+
+    records = []
+    for budget in [4, 12, 36, 108]:
+        for run in range(3):
+            records.append(('a7566f2090f0f83d77330a8c572c6402', budget, matrix, ops, 12345,
+                            (budget * 10. + run, 0.7, 0.8 + run / 100, 0.9)))
+            records.append(('0' * 32, budget, full_matrix, full_ops, 99, (1., 0.1, 0.2, 0.3)))
+    _write_nasbench_101_tfrecord(tmp_path / 'nasbench_full.tfrecord', records)
+
+    monkeypatch.setattr(hpolib.config_file, 'data_dir', tmp_path / 'data')
+    data_manager = NASBench_101Data(data_path=tmp_path)
+    arrays = data_manager.load()
+
+    assert arrays['validation_accuracy'].shape == (2, 4, 3)
+    assert data_manager.get_module_hashes() == ['0' * 32, 'a7566f2090f0f83d77330a8c572c6402']
+    assert np.array_equal(arrays['trainable_parameters'], [99, 12345])
+
+    # The cell is found, although its unpruned form has dead nodes
+    cell = np.zeros((7, 7), dtype=np.int8)
+    cell[[0, 1, 2, 4, 0], [1, 2, 4, 6, 5]] = 1
+    cell_ops = ['input', 'conv3x3-bn-relu', 'conv3x3-bn-relu', 'conv1x1-bn-relu', 'maxpool3x3', 'conv1x1-bn-relu',
+                'output']
+    index = data_manager.get_model_index(cell, cell_ops)
+    assert index == 1
+    assert np.allclose(arrays['training_time'][index, 1], [120, 121, 122])
+    assert np.allclose(arrays['validation_accuracy'][index, 3], [0.8, 0.81, 0.82])
+    assert np.allclose(arrays['test_accuracy'][index], 0.9)
+
+    stored_matrix, stored_ops = data_manager.index_to_spec(index)
+    assert np.array_equal(stored_matrix, matrix) and stored_ops == ops
+    stored_matrix, stored_ops = data_manager.index_to_spec(0)
+    assert np.array_equal(stored_matrix, full_matrix) and stored_ops == full_ops
+
+    # Too many edges
+    assert data_manager.get_model_index(full_matrix, full_ops) == -1
+    # Not in the data
+    cell_ops[1] = 'conv1x1-bn-relu'
+    assert data_manager.get_model_index(cell, cell_ops) == -1
+
+    with pytest.raises(FileNotFoundError):
+        monkeypatch.setattr(hpolib.config_file, 'data_dir', tmp_path / 'other')
+        NASBench_101Data(data_path=tmp_path / 'other').load()
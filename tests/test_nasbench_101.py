@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from hpolib.benchmarks.nas.nasbench_101 import NASCifar10ABenchmark, NASCifar10BBenchmark, NASCifar10CBenchmark, \
+    N_EDGES, MAX_EDGES, VERTICES, INPUT, OUTPUT, CONV1X1, CONV3X3, MAXPOOL3X3
+
+OPS = {f'op_node_{i}': op for i, op in enumerate([CONV3X3, CONV1X1, MAXPOOL3X3, CONV3X3, CONV1X1])}
+EXPECTED_OPS = [INPUT, CONV3X3, CONV1X1, MAXPOOL3X3, CONV3X3, CONV1X1, OUTPUT]
+
+
+def _expected_matrix(edges):
+    matrix = np.zeros([VERTICES, VERTICES], dtype=np.int8)
+    for x, y in edges:
+        matrix[x, y] = 1
+    return matrix
+
+
+# The cell 0 -> 1 -> 2 -> 6 leaves the nodes 3, 4 and 5 unconnected. It is still a valid configuration, since the
+# unconnected nodes are pruned when the model is looked up.
+CHAIN = [(0, 1), (1, 2), (2, 6)]
+
+
+def test_nasbench101_a_matrix_and_ops():
+    # The edges are the upper triangular matrix in row-major order: (0, 1), ..., (0, 6), (1, 2), ..., (5, 6)
+    config = {f'edge_{i}': 0 for i in range(N_EDGES)}
+    config.update({'edge_0': 1, 'edge_6': 1, 'edge_14': 1}, **OPS)
+
+    matrix, ops = NASCifar10ABenchmark._get_matrix_and_ops(config)
+    assert np.array_equal(matrix, _expected_matrix(CHAIN))
+    assert ops == EXPECTED_OPS
+
+    # Too many edges
+    config.update({f'edge_{i}': 1 for i in range(MAX_EDGES + 1)})
+    assert NASCifar10ABenchmark._get_matrix_and_ops(config) is None
+
+
+def test_nasbench101_b_matrix_and_ops():
+    # The hyperparameters are positions in the bit list of nasbench. The first position is the most significant bit
+    # and bit x + y * (y - 1) / 2 encodes the edge x -> y: (0, 1) -> 20, (1, 2) -> 18, (2, 6) -> 3, (0, 6) -> 5.
+    config = {f'edge_{i}': 20 for i in range(MAX_EDGES)}
+    config.update({'edge_1': 18, 'edge_2': 3}, **OPS)
+
+    matrix, ops = NASCifar10BBenchmark._get_matrix_and_ops(config)
+    assert np.array_equal(matrix, _expected_matrix(CHAIN))
+    assert ops == EXPECTED_OPS
+
+    config['edge_3'] = 5
+    matrix, _ = NASCifar10BBenchmark._get_matrix_and_ops(config)
+    assert np.array_equal(matrix, _expected_matrix(CHAIN + [(0, 6)]))
+
+
+def test_nasbench101_c_matrix_and_ops():
+    # The `num_edges` edges with the highest values are present.
+    config = {f'edge_{i}': 0.01 * i for i in range(N_EDGES)}
+    config.update({'edge_0': 0.9, 'edge_6': 0.8, 'edge_14': 0.7, 'edge_5': 0.6, 'num_edges': 3}, **OPS)
+
+    matrix, ops = NASCifar10CBenchmark._get_matrix_and_ops(config)
+    assert np.array_equal(matrix, _expected_matrix(CHAIN))
+    assert ops == EXPECTED_OPS
+
+    config['num_edges'] = 4
+    matrix, _ = NASCifar10CBenchmark._get_matrix_and_ops(config)
+    assert np.array_equal(matrix, _expected_matrix(CHAIN + [(0, 6)]))
+
+    config['num_edges'] = 0
+    matrix, _ = NASCifar10CBenchmark._get_matrix_and_ops(config)
+    assert matrix.sum() == 0
+
+
+@pytest.mark.parametrize('benchmark', [NASCifar10ABenchmark, NASCifar10BBenchmark, NASCifar10CBenchmark])
+def test_nasbench101_sampled_configurations(benchmark):
+    # Only the A encoding can exceed the maximal number of edges.
+    cs = benchmark.get_configuration_space(seed=1)
+    for config in cs.sample_configuration(100):
+        graph = benchmark._get_matrix_and_ops(config.get_dictionary())
+        if benchmark is not NASCifar10ABenchmark:
+            assert graph is not None
+        if graph is not None:
+            matrix, ops = graph
+            assert matrix.sum() <= MAX_EDGES
+            assert np.array_equal(matrix, np.triu(matrix, k=1))
+            assert ops[0] == INPUT and ops[-1] == OUTPUT
@@ -145,3 +145,100 @@ def test_nasbench201_config():
 
     struct_str = struct.tostr()
     assert struct_str == '|avg_pool_3x3~0|+|none~0|nor_conv_3x3~1|+|nor_conv_3x3~0|nor_conv_3x3~1|skip_connect~2|'
+
+
+def test_nasbench201_batch():
+    b = Cifar10NasBench201Benchmark(rng=0)
+
+    cs = b.get_configuration_space(seed=0)
+    configs = [cs.sample_configuration() for _ in range(5)]
+    fidelities = [{'epoch': 199}, {'epoch': 100}, {'epoch': 0}, {'epoch': 199}, {'epoch': 50}]
+
+    results = b.objective_function_batch(configurations=configs, fidelities=fidelities, data_seed=(777, 888))
+    assert results['function_value'].shape == (5, )
+    assert results['cost'].shape == (5, )
+    assert len(results['info']['fidelity']) == 5
+
+    for i, (config, fidelity) in enumerate(zip(configs, fidelities)):
+        result = b.objective_function(configuration=config, fidelity=fidelity, data_seed=(777, 888))
+        assert result['function_value'] == pytest.approx(results['function_value'][i])
+        assert result['cost'] == pytest.approx(results['cost'][i])
+        assert result['info']['eval_precision'] == pytest.approx(results['info']['eval_precision'][i])
+        assert result['info']['eval_cost'] == pytest.approx(results['info']['eval_cost'][i])
+
+    results = b.objective_function_batch(configurations=configs)
+    assert all(fidelity == {'epoch': 199} for fidelity in results['info']['fidelity'])
+
+    with pytest.raises(ValueError):
+        b.objective_function_batch(configurations=configs, fidelities=fidelities[:2])
+
+
+def test_nasbench201_learning_curve():
+    b = Cifar10ValidNasBench201Benchmark(rng=0)
+
+    config = b.get_configuration_space(seed=0).sample_configuration()
+    curves = b.get_learning_curve(config, data_seed=(777, 888), metrics=['train_acc1es', 'train_times'])
+    assert set(curves.keys()) == {'train_acc1es', 'train_times'}
+    assert curves['train_acc1es'].shape == (2, 200)
+
+    for epoch in [0, 100, 199]:
+        result = b.objective_function(configuration=config, fidelity={'epoch': epoch}, data_seed=(777, 888))
+        assert result['function_value'] == pytest.approx(100 - curves['train_acc1es'][:, epoch].mean())
+        assert result['cost'] == pytest.approx(curves['train_times'][:, epoch].sum())
+
+    curves = b.get_learning_curve(config, data_seed=777, epochs=slice(10, 20))
+    assert len(curves) == 6
+    assert curves['eval_losses'].shape == (1, 10)
+
+    # The epochs are checked as the fidelity of the objective function
+    for epochs in [[0, 200], [-1], slice(190, 210)]:
+        with pytest.raises(ValueError):
+            b.get_learning_curve(config, epochs=epochs)
+
+
+def test_nasbench201_canonical_configuration():
+    b = Cifar10ValidNasBench201Benchmark(rng=0)
+
+    config = {'1<-0': 'nor_conv_3x3', '2<-0': 'avg_pool_3x3', '2<-1': 'none',
+              '3<-0': 'none', '3<-1': 'skip_connect', '3<-2': 'nor_conv_1x1'}
+    swapped = {'1<-0': 'avg_pool_3x3', '2<-0': 'nor_conv_3x3', '2<-1': 'none',
+               '3<-0': 'none', '3<-1': 'nor_conv_1x1', '3<-2': 'skip_connect'}
+
+    canonical = b.get_canonical_configuration(config)
+    assert canonical == b.get_canonical_configuration(swapped)
+    assert canonical in [config, swapped]
+    assert b.get_canonical_configuration(canonical) == canonical
+
+
+def test_nasbench201_oracle():
+    b = Cifar10ValidNasBench201Benchmark(rng=0)
+
+    oracle = b.get_oracle()
+    assert len(oracle['function_value']) == 200
+    for epoch in [0, 199]:
+        result = b.objective_function(oracle['configuration'][epoch], fidelity={'epoch': epoch})
+        assert result['function_value'] == oracle['function_value'][epoch]
+
+        config = b.get_configuration_space(seed=epoch).sample_configuration()
+        assert b.objective_function(config, fidelity={'epoch': epoch})['function_value'] \
+            >= oracle['function_value'][epoch]
+
+    oracle = b.get_oracle(test=True)
+    result = b.objective_function_test(oracle['configuration'][199])
+    assert result['function_value'] == oracle['function_value'][199]
+
+
+def test_nasbench201_export_table(tmp_path):
+    import numpy as np
+    b = Cifar10ValidNasBench201Benchmark(rng=0)
+
+    b.export_table(tmp_path / 'table.npz', data_seed=777)
+    with np.load(str(tmp_path / 'table.npz')) as table:
+        assert len(table['epoch']) == 15625 * 200
+        assert table['arch_index'][-1] == 15624
+
+        row = 200 * 777 + 13
+        config = {edge: str(table[f'{edge}.categories'][table[edge][row]]) for edge in ['1<-0', '2<-0', '2<-1',
+                                                                                        '3<-0', '3<-1', '3<-2']}
+        result = b.objective_function(config, fidelity={'epoch': int(table['epoch'][row])}, data_seed=777)
+        assert result['function_value'] == pytest.approx(100 - table['train_acc1es'][row])
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from hpolib.util.result_cache import ResultCache
+from tests.helpers import DummyBenchmark
+
+
+def test_result_cache_key():
+    key = ResultCache.get_key(configuration={'a': 1, 'b': 'c'}, arguments={'data_seed': (777, 888)})
+    assert key == ResultCache.get_key(arguments={'data_seed': [777, 888]}, configuration={'b': 'c', 'a': 1})
+    assert key == ResultCache.get_key(configuration={'a': np.int64(1), 'b': 'c'},
+                                      arguments={'data_seed': np.array([777, 888])})
+    assert key != ResultCache.get_key(configuration={'a': 2, 'b': 'c'}, arguments={'data_seed': (777, 888)})
+
+    with pytest.raises(TypeError):
+        ResultCache.get_key(configuration=object())
+
+
+def test_result_cache_memory_tier():
+    cache = ResultCache(memory_size=2, use_disk=False)
+
+    cache.set('a', {'function_value': 1})
+    cache.set('b', {'function_value': 2})
+    assert cache.get('a') == {'function_value': 1}
+
+    # 'b' is the least recently used entry
+    cache.set('c', {'function_value': 3})
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache
+    assert len(cache) == 2
+
+    # Results are returned as copies
+    cache.get('a')['function_value'] = 5
+    assert cache.get('a') == {'function_value': 1}
+
+
+def test_result_cache_disk_tier(tmp_path):
+    cache = ResultCache(cache_dir=tmp_path, memory_size=0)
+    cache.set('a', {'function_value': 1, 'info': {'values': np.arange(3)}})
+
+    # A new cache instance reads the stored results
+    cache = ResultCache(cache_dir=tmp_path, memory_size=0)
+    result = cache.get('a')
+    assert result['function_value'] == 1
+    assert np.array_equal(result['info']['values'], np.arange(3))
+    assert cache.get('b') is None
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_result_cache_eviction(tmp_path):
+    cache = ResultCache(cache_dir=tmp_path, memory_size=0, max_disk_size=2500)
+    for i in range(5):
+        cache.set(str(i), {'function_value': i, 'info': {'data': b'x' * 1000}})
+
+    assert len(cache) == 2
+    assert '3' in cache and '4' in cache
+    assert '0' not in cache
+
+
+def test_cache_result_decorator(tmp_path):
+    benchmark = DummyBenchmark(rng=1)
+
+    # By default, nothing is cached
+    benchmark.objective_function({'x': 0.5}, rng=1)
+    benchmark.objective_function({'x': 0.5}, rng=1)
+    assert benchmark.n_evaluations == 2
+
+    benchmark.enable_result_cache(ResultCache(cache_dir=tmp_path))
+    result = benchmark.objective_function({'x': 0.5}, rng=1)
+    result_2 = benchmark.objective_function({'x': 0.5}, rng=1)
+    assert benchmark.n_evaluations == 3
+    assert result == result_2 == {'function_value': 5.0, 'cost': 10, 'info': {'fidelity': {'budget': 10}}}
+
+    # Missing fidelities are filled in before the lookup
+    benchmark.objective_function({'x': 0.5}, fidelity={'budget': 10}, rng=1)
+    assert benchmark.n_evaluations == 3
+
+    # Other fidelity, other seed, or a call without a fixed seed
+    benchmark.objective_function({'x': 0.5}, fidelity={'budget': 5}, rng=1)
+    benchmark.objective_function({'x': 0.5}, rng=2)
+    benchmark.objective_function({'x': 0.5})
+    benchmark.objective_function({'x': 0.5}, rng=np.random.RandomState(1))
+    assert benchmark.n_evaluations == 7
+
+    # Deterministic benchmarks ignore the random state
+    benchmark.enable_result_cache(ResultCache(cache_dir=tmp_path), deterministic=True)
+    benchmark.objective_function({'x': 0.25})
+    benchmark.objective_function({'x': 0.25}, rng=3)
+    assert benchmark.n_evaluations == 8
+
+    benchmark.disable_result_cache()
+    benchmark.objective_function({'x': 0.25})
+    assert benchmark.n_evaluations == 9
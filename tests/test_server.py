@@ -1,3 +1,4 @@
+import contextlib
 import importlib
 import logging
 import os
@@ -59,6 +60,330 @@ def test_benchmark_encoder():
     assert array_str == '[1, 2, 3, 4]'
 
 
+
+def test_server_objective_function_batch():
+    from hpolib.container.server_abstract_benchmark import BenchmarkServer
+    from hpolib.container import transport
+    import json
+
+    class Dummy:
+        def objective_function(self, configuration, fidelity=None, **kwargs):
+            return {'function_value': configuration['x'] * fidelity['budget'], 'cost': 1,
+                    'info': {'kwargs': kwargs}}
+
+    # Don't start the pyro daemon
+    server = BenchmarkServer.__new__(BenchmarkServer)
+    server.benchmark = Dummy()
+    server._worker_pool_kind = None
+    server._shared_arrays = None
+
+    queries = [[{'x': i}, {'budget': 2}, {'rng': i}] for i in range(5)]
+    for n_workers in [1, 3]:
+        results = json.loads(server.objective_function_batch(json.dumps(queries), n_workers))
+        assert [result['function_value'] for result in results] == [0, 2, 4, 6, 8]
+        assert [result['info']['kwargs']['rng'] for result in results] == [0, 1, 2, 3, 4]
+
+    if transport.is_available():
+        results = transport.unpack(server.objective_function_batch_binary(transport.pack([queries, 2])))
+        assert [result['function_value'] for result in results] == [0, 2, 4, 6, 8]
+
+
+def test_server_ready_file():
+    import subprocess
+    import threading
+    from uuid import uuid1
+
+    import Pyro4
+    from hpolib.config import HPOlibConfig
+    from hpolib.container.client_abstract_benchmark import AbstractBenchmarkClient
+    from hpolib.container.server_abstract_benchmark import BenchmarkServer
+
+    socket_dir = HPOlibConfig().socket_dir
+    socket_id = str(uuid1())
+    ready_file = socket_dir / f'{socket_id}_ready'
+    socket_file = socket_dir / f'{socket_id}_unix.sock'
+
+    process = subprocess.Popen(['sleep', '30'])
+    thread = threading.Thread(target=BenchmarkServer, args=(socket_id,), daemon=True)
+    thread.start()
+    try:
+        AbstractBenchmarkClient._wait_for_server(process, ready_file, socket_file, max_wait=10)
+        assert ready_file.read_text() == str(os.getpid())
+
+        proxy = Pyro4.Proxy(f'PYRO:{socket_id}.unixsock@./u:{socket_file}')
+        proxy.shutdown()
+        thread.join(timeout=10)
+        assert not ready_file.exists()
+    finally:
+        process.kill()
+        if socket_file.exists():
+            socket_file.unlink()
+
+
+def test_wait_for_server(tmp_path):
+    import subprocess
+    import threading
+    import pytest
+    from hpolib.container.client_abstract_benchmark import AbstractBenchmarkClient
+
+    ready_file = tmp_path / 'ready'
+    socket_file = tmp_path / 'socket'
+
+    process = subprocess.Popen(['sleep', '30'])
+    try:
+        threading.Timer(0.1, ready_file.touch).start()
+        AbstractBenchmarkClient._wait_for_server(process, ready_file, socket_file, max_wait=10)
+
+        # Older containers don't create a ready file
+        ready_file.unlink()
+        socket_file.touch()
+        AbstractBenchmarkClient._wait_for_server(process, ready_file, socket_file, max_wait=10, legacy_wait=0.1)
+
+        socket_file.unlink()
+        with pytest.raises(TimeoutError):
+            AbstractBenchmarkClient._wait_for_server(process, ready_file, socket_file, max_wait=0.1)
+    finally:
+        process.kill()
+
+    # The server has crashed
+    process.wait()
+    with pytest.raises(SystemError):
+        AbstractBenchmarkClient._wait_for_server(process, ready_file, socket_file, max_wait=10)
+
+
+class DummyServerBenchmark:
+    _deterministic = False
+    _rng_independent_data = True
+    _instance_attributes = ('rng', 'history')
+    n_constructed = 0
+
+    def __init__(self, rng=None, dataset='a'):
+        from hpolib.util import rng_helper
+        DummyServerBenchmark.n_constructed += 1
+        self.rng = rng_helper.get_rng(rng)
+        self.dataset = dataset
+        self.data = list(range(10))
+        self.history = []
+
+    def objective_function(self, configuration, fidelity=None, rng=None, **kwargs):
+        import numpy as np
+        from hpolib.util import rng_helper
+        rng = rng_helper.get_rng(rng, self_rng=self.rng)
+        self.history.append(configuration['x'])
+        return {'function_value': configuration['x'], 'cost': 1,
+                'info': {'dataset': self.dataset, 'data': id(self.data), 'seed': int(rng.randint(100000)),
+                         'history': list(self.history),
+                         'pid': os.getpid(), 'curve': np.arange(configuration.get('n', 0), dtype=np.float64)}}
+
+    def get_meta_information(self):
+        return {'dataset': self.dataset}
+
+    def get_oracle(self, run_index=0):
+        import numpy as np
+        return {'budget': np.arange(1, 4), 'function_value': np.array([3, 2, 1]) + run_index,
+                'cost': np.ones(3), 'configuration': [{'x': run_index}] * 3}
+
+
+@contextlib.contextmanager
+def _connect_to_server(monkeypatch, benchmark_class=DummyServerBenchmark, **kwargs):
+    """ Start a server in a thread and connect a client to it without starting a container. """
+    import json
+    import subprocess
+    import threading
+    from uuid import uuid1
+
+    import Pyro4
+    from hpolib.config import HPOlibConfig
+    from hpolib.container import server_abstract_benchmark
+    from hpolib.container.client_abstract_benchmark import AbstractBenchmarkClient
+
+    monkeypatch.setattr(server_abstract_benchmark, 'Benchmark', benchmark_class, raising=False)
+    DummyServerBenchmark.n_constructed = 0
+
+    config = HPOlibConfig()
+    socket_id = str(uuid1())
+    thread = threading.Thread(target=server_abstract_benchmark.BenchmarkServer, args=(socket_id,), daemon=True)
+    thread.start()
+
+    client = AbstractBenchmarkClient.__new__(AbstractBenchmarkClient)
+    client.socket_id = socket_id
+    client.config = config
+    client.handle = None
+    client.uri = f'PYRO:{socket_id}.unixsock@./u:{config.socket_dir}/{socket_id}_unix.sock'
+    client._stopped = True  # Don't stop a singularity instance on delete
+
+    process = subprocess.Popen(['sleep', '30'])
+    try:
+        AbstractBenchmarkClient._wait_for_server(process, config.socket_dir / f'{socket_id}_ready',
+                                                 config.socket_dir / f'{socket_id}_unix.sock', max_wait=10)
+        client.benchmark = Pyro4.Proxy(client.uri)
+        client.benchmark.init_benchmark(json.dumps(kwargs))
+        client.protocol = client._negotiate_protocol()
+        yield client
+    finally:
+        client.benchmark.shutdown()
+        thread.join(timeout=10)
+        process.kill()
+
+
+def test_server_create_benchmark(monkeypatch):
+    import numpy as np
+    import pytest
+
+    with _connect_to_server(monkeypatch, dataset='a') as client:
+        b_1 = client.create_benchmark(rng=1, dataset='b')
+        b_2 = client.create_benchmark(rng=2, dataset='b')
+        b_3 = client.create_benchmark(rng=np.random.RandomState(1), dataset='c')
+        assert b_1.handle != b_2.handle
+
+        # The benchmarks with the same dataset share the data, but have their own random state.
+        assert DummyServerBenchmark.n_constructed == 3
+        r_1 = b_1.objective_function({'x': 1})
+        r_2 = b_2.objective_function({'x': 2})
+        assert r_1['info']['data'] == r_2['info']['data']
+        assert r_1['info']['seed'] == np.random.RandomState(1).randint(100000)
+        assert r_2['info']['seed'] == np.random.RandomState(2).randint(100000)
+        assert r_2['function_value'] == 2
+        assert b_3.objective_function({'x': 3})['info']['seed'] == r_1['info']['seed']
+
+        # The mutable state is not shared, neither with the template nor between the handles.
+        assert b_1.objective_function({'x': 4})['info']['history'] == [1, 4]
+        assert b_2.objective_function({'x': 5})['info']['history'] == [2, 5]
+        b_4 = client.create_benchmark(rng=1, dataset='b')
+        r_4 = b_4.objective_function({'x': 6})
+        assert r_4['info']['history'] == [6]
+        assert r_4['info']['seed'] == r_1['info']['seed']
+        assert DummyServerBenchmark.n_constructed == 3
+
+        assert client.get_meta_information() == {'dataset': 'a'}
+        assert b_1.get_meta_information() == {'dataset': 'b'}
+        assert b_3.objective_function_batch([{'x': 1}, {'x': 2}])['function_value'].tolist() == [1, 2]
+
+        handle = b_1.handle
+        del b_1
+        with pytest.raises(KeyError):
+            client.benchmark.get_meta_information(handle=handle)
+        assert b_2.get_meta_information() == {'dataset': 'b'}
+
+
+def test_server_worker_pool(monkeypatch):
+    with _connect_to_server(monkeypatch, rng=1) as client:
+        assert client.set_worker_pool(2, 'thread') == 'thread'
+        results = client.objective_function_batch([{'x': i} for i in range(4)])
+        assert results['function_value'].tolist() == [0, 1, 2, 3]
+        assert set(results['info']['pid']) == {os.getpid()}
+
+        # The processes are forked from the server. They don't construct the benchmark again.
+        assert client.set_worker_pool(2, 'process') == 'process'
+        results = client.objective_function_batch([{'x': i} for i in range(4)])
+        assert results['function_value'].tolist() == [0, 1, 2, 3]
+        assert os.getpid() not in results['info']['pid']
+        # The server draws a seed for each call. Otherwise, the processes would repeat the same random numbers.
+        assert len(set(results['info']['seed'])) == 4
+        assert client.objective_function({'x': 1}, rng=5)['info']['seed'] == \
+            client.objective_function({'x': 1}, rng=5)['info']['seed']
+
+        # Benchmarks, which are created later, are also known to the processes.
+        benchmark = client.create_benchmark(rng=2, dataset='b')
+        result = benchmark.objective_function({'x': 1})
+        assert result['info']['dataset'] == 'b'
+        assert result['info']['pid'] != os.getpid()
+
+        assert client.set_worker_pool(1) is None
+        assert client.objective_function({'x': 1})['info']['pid'] == os.getpid()
+
+
+def test_server_worker_pool_instance_state(monkeypatch):
+    import pytest
+    pytest.importorskip('xgboost')
+    from hpolib.benchmarks.ml.xgboost_benchmark import XGBoostBenchmark
+    from hpolib.util.result_cache import ResultCache
+    from tests.helpers import get_synthetic_data
+
+    class ServerXGBoostBenchmark(XGBoostBenchmark):
+        """ Reports where a call was evaluated and the state of the benchmark after the call. """
+
+        def __init__(self, result_cache=False, **kwargs):
+            super(ServerXGBoostBenchmark, self).__init__(**kwargs)
+            self.n_trained = 0
+            if result_cache:
+                self.enable_result_cache(ResultCache(use_disk=False))
+
+        def get_data(self):
+            return get_synthetic_data()
+
+        def _train_booster(self, *args, **kwargs):
+            self.n_trained += 1
+            return super(ServerXGBoostBenchmark, self)._train_booster(*args, **kwargs)
+
+        def objective_function(self, configuration, **kwargs):
+            result = super(ServerXGBoostBenchmark, self).objective_function(configuration, **kwargs)
+            return dict(result, info=dict(result['info'], pid=os.getpid(), train_idx=self.train_idx[:10].tolist(),
+                                          n_trained=self.n_trained, n_boosters=len(self._booster_cache)))
+
+    configuration = ServerXGBoostBenchmark.get_configuration_space(seed=1).sample_configuration().get_dictionary()
+
+    with _connect_to_server(monkeypatch, benchmark_class=ServerXGBoostBenchmark, rng=1, native_booster=True,
+                            booster_cache_size=2) as client:
+        assert client.set_worker_pool(2, 'process') == 'process'
+
+        # Calls without `rng` reuse the cached booster on the server
+        for n_estimators in [4, 8, 16]:
+            result = client.objective_function(configuration, fidelity={'n_estimators': n_estimators})
+            assert result['info']['pid'] == os.getpid()
+            assert result['info']['n_boosters'] == 1
+
+        # The shuffled training idx are used by all following calls, also by those in the processes.
+        benchmark = client.create_benchmark(rng=1, native_booster=True)
+        before = benchmark.objective_function(configuration, fidelity={'n_estimators': 4})
+        assert before['info']['pid'] != os.getpid()
+        shuffled = benchmark.objective_function(configuration, fidelity={'n_estimators': 4}, shuffle=True)
+        assert shuffled['info']['pid'] == os.getpid()
+        assert shuffled['info']['train_idx'] != before['info']['train_idx']
+        after = benchmark.objective_function(configuration, fidelity={'n_estimators': 4})
+        assert after['info']['pid'] != os.getpid()
+        assert after['info']['train_idx'] == shuffled['info']['train_idx']
+
+        # The second call is answered by the result cache on the server
+        benchmark = client.create_benchmark(rng=1, native_booster=True, result_cache=True)
+        results = [benchmark.objective_function(configuration, fidelity={'n_estimators': 4}, rng=2) for _ in range(2)]
+        assert results[0]['info']['pid'] == results[1]['info']['pid'] == os.getpid()
+        assert results[0]['info']['n_trained'] == results[1]['info']['n_trained'] == 1
+
+
+def test_server_shared_memory(monkeypatch):
+    import numpy as np
+    import pytest
+    from hpolib.container import transport
+
+    if not transport.is_available():
+        pytest.skip('Requires msgpack')
+
+    with _connect_to_server(monkeypatch, rng=1) as client:
+        assert client.enable_shared_memory(threshold=1024)
+
+        result = client.objective_function({'x': 1, 'n': 1000})
+        assert isinstance(result['info']['curve'], np.memmap)
+        assert np.array_equal(result['info']['curve'], np.arange(1000))
+        assert len(list(client.config.socket_dir.glob(f'{client.socket_id}_shm_*'))) == 0
+
+        # Small arrays are still sent via the socket
+        assert not isinstance(client.objective_function({'x': 1, 'n': 10})['info']['curve'], np.memmap)
+
+
+def test_server_get_oracle(monkeypatch):
+    import numpy as np
+
+    with _connect_to_server(monkeypatch, rng=1) as client:
+        oracle = client.get_oracle()
+        assert isinstance(oracle['function_value'], np.ndarray)
+        assert np.array_equal(oracle['function_value'], [3, 2, 1])
+        assert oracle['configuration'][0] == {'x': 0}
+
+        oracle = client.get_oracle(run_index=1)
+        assert np.array_equal(oracle['function_value'], [4, 3, 2])
+
+
 if __name__ == '__main__':
     test_debug_env_variable_1()
     test_debug_container()
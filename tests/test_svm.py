@@ -1,7 +1,9 @@
 import pytest
 
+from hpolib.benchmarks.ml.svm_benchmark import SupportVectorMachine as LocalSupportVectorMachine
 from hpolib.container.benchmarks.ml.svm_benchmark import SupportVectorMachine
 from hpolib.util.openml_data_manager import get_openmlcc18_taskids
+from tests.helpers import get_synthetic_data
 
 task_ids = get_openmlcc18_taskids()
 
@@ -36,5 +38,40 @@ def test_svm_init():
     assert result['cost'] is not None
 
 
+class SyntheticSupportVectorMachine(LocalSupportVectorMachine):
+    """ Replaces the OpenML task by a small synthetic data set with a categorical and a column with missing values """
+
+    def get_data(self):
+        return get_synthetic_data()
+
+
+def test_svm_kernel_cache():
+    # The distances of the test mode need 250 * 300 * 8 bytes, those of the half training set 100 * 150 * 8 bytes
+    benchmark = SyntheticSupportVectorMachine(rng=0, kernel_cache_size=2)
+    reference = SyntheticSupportVectorMachine(rng=0)
+
+    for configuration in benchmark.get_configuration_space(seed=1).sample_configuration(5):
+        for dataset_fraction in [0.5, 1.0]:
+            fidelity = {'dataset_fraction': dataset_fraction}
+            result = benchmark.objective_function(configuration, fidelity=fidelity)
+            reference_result = reference.objective_function(configuration, fidelity=fidelity)
+            assert result['function_value'] == pytest.approx(reference_result['function_value'])
+            assert result['info']['train_loss'] == pytest.approx(reference_result['info']['train_loss'])
+
+        assert benchmark.objective_function_test(configuration)['function_value'] == \
+            pytest.approx(reference.objective_function_test(configuration)['function_value'])
+
+    assert len(benchmark._kernel_cache) == 3
+    assert benchmark._kernel_cache['test']['test'].shape == (50, 250)
+
+    # Distances, which exceed the memory budget, are not cached
+    benchmark.kernel_cache_size = 0.3
+    benchmark._kernel_cache.clear()
+    benchmark.objective_function_test(configuration)
+    assert len(benchmark._kernel_cache) == 0
+    benchmark.objective_function(configuration, fidelity={'dataset_fraction': 0.5})
+    assert len(benchmark._kernel_cache) == 1
+
+
 if __name__ == "__main__":
     test_svm_init()
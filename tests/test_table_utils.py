@@ -0,0 +1,76 @@
+import json
+
+import numpy as np
+import pytest
+
+from hpolib.util.table_utils import TableWriter, get_table_format
+
+
+def _write_table(path, table_format=None):
+    with TableWriter(path, table_format, categories={'1<-0': ['none', 'skip_connect']},
+                     metadata={'benchmark': 'test'}) as writer:
+        for i in range(3):
+            writer.write({'1<-0': np.array([0, 1], dtype=np.int8),
+                          'epoch': np.array([i, i]),
+                          'loss': np.array([i, i + 0.5], dtype=np.float32)})
+
+
+def test_get_table_format():
+    assert get_table_format('table.npz') == 'npz'
+    assert get_table_format('table.parquet') == 'parquet'
+    assert get_table_format('table.feather') == 'arrow'
+    assert get_table_format('table', 'arrow') == 'arrow'
+
+    with pytest.raises(AssertionError):
+        get_table_format('table.csv')
+
+    with pytest.raises(AssertionError):
+        get_table_format('table.npz', 'csv')
+
+
+def test_table_writer_npz(tmp_path):
+    _write_table(tmp_path / 'table.npz')
+    assert [file.name for file in tmp_path.iterdir()] == ['table.npz']
+
+    with np.load(str(tmp_path / 'table.npz')) as table:
+        assert np.array_equal(table['1<-0'], [0, 1, 0, 1, 0, 1])
+        assert table['1<-0'].dtype == np.int8
+        assert np.array_equal(table['epoch'], [0, 0, 1, 1, 2, 2])
+        assert np.array_equal(table['loss'], [0, 0.5, 1, 1.5, 2, 2.5])
+        assert table['loss'].dtype == np.float32
+        assert table['1<-0.categories'].tolist() == ['none', 'skip_connect']
+        assert json.loads(str(table['__metadata__'])) == {'benchmark': 'test'}
+
+
+def test_table_writer_abort(tmp_path):
+    with pytest.raises(KeyError):
+        with TableWriter(tmp_path / 'table.npz') as writer:
+            writer.write({'loss': np.arange(3)})
+            raise KeyError()
+    assert len(list(tmp_path.iterdir())) == 0
+
+    with TableWriter(tmp_path / 'table.npz') as writer:
+        writer.write({'loss': np.arange(3)})
+        with pytest.raises(AssertionError):
+            writer.write({'cost': np.arange(3)})
+        with pytest.raises(AssertionError):
+            writer.write({'loss': np.arange(3), 'cost': np.arange(2)})
+
+
+@pytest.mark.parametrize('table_format', ['parquet', 'arrow'])
+def test_table_writer_pyarrow(tmp_path, table_format):
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.parquet as pq
+
+    path = tmp_path / f'table.{table_format}'
+    _write_table(path)
+
+    if table_format == 'parquet':
+        table = pq.read_table(str(path))
+    else:
+        table = pa.ipc.open_file(pa.OSFile(str(path))).read_all()
+
+    assert table.num_rows == 6
+    assert table.column('1<-0').to_pylist() == ['none', 'skip_connect'] * 3
+    assert table.column('loss').to_pylist() == [0, 0.5, 1, 1.5, 2, 2.5]
+    assert json.loads(table.schema.metadata[b'hpolib']) == {'benchmark': 'test'}
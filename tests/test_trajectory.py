@@ -0,0 +1,67 @@
+import ConfigSpace as CS
+import numpy as np
+
+from hpolib.util.trajectory import TrajectoryRecorder
+from tests.helpers import DummyBenchmark
+
+
+def test_trajectory_recorder_growth():
+    cs = DummyBenchmark.get_configuration_space()
+    recorder = TrajectoryRecorder(cs, initial_size=2)
+
+    values = [0.5, 0.7, 0.2, 0.9, 0.1]
+    for value in values:
+        recorder.record({'x': value}, None, function_value=value, cost=1)
+
+    assert len(recorder) == 5
+    assert recorder.capacity == 8
+
+    trajectory = recorder.get_trajectory()
+    assert np.array_equal(trajectory['index'], np.arange(5))
+    assert np.allclose(trajectory['configuration'][:, 0], values)
+    assert np.allclose(trajectory['incumbent_value'], [0.5, 0.5, 0.2, 0.2, 0.1])
+    assert np.allclose(trajectory['cumulative_cost'], [1, 2, 3, 4, 5])
+    assert 'fidelity' not in trajectory
+
+    recorder.reset()
+    assert len(recorder) == 0
+    assert recorder.capacity == 8
+
+
+def test_trajectory_recorder_ring_buffer():
+    cs = DummyBenchmark.get_configuration_space()
+    recorder = TrajectoryRecorder(cs, initial_size=2, max_size=3)
+
+    recorder.record_batch([{'x': value} for value in [0.1, 0.2, 0.3, 0.4, 0.5]], [None] * 5,
+                          function_values=np.array([0.1, 0.2, 0.3, 0.4, 0.5]), costs=np.ones(5))
+
+    assert len(recorder) == 3
+    assert recorder.capacity == 3
+    assert recorder.n_recorded == 5
+
+    # The oldest queries are overwritten
+    trajectory = recorder.get_trajectory()
+    assert np.array_equal(trajectory['index'], [2, 3, 4])
+    assert np.allclose(trajectory['function_value'], [0.3, 0.4, 0.5])
+    assert np.allclose(trajectory['configuration'][:, 0], [0.3, 0.4, 0.5])
+
+
+def test_trajectory_recorder_benchmark():
+    benchmark = DummyBenchmark()
+    benchmark.objective_function({'x': 0.5})
+    assert benchmark.trajectory is None
+
+    recorder = benchmark.enable_trajectory_recorder(initial_size=1)
+    benchmark.objective_function({'x': 0.5}, fidelity={'budget': 2})
+    benchmark.objective_function({'x': 0.1})
+
+    trajectory = recorder.get_trajectory()
+    assert np.allclose(trajectory['function_value'], [1.0, 1.0])
+    assert np.allclose(trajectory['cost'], [2, 10])
+    assert np.allclose(trajectory['fidelity'][:, 0],
+                       [CS.Configuration(benchmark.fidelity_space, {'budget': budget}).get_array()[0]
+                        for budget in [2, 10]])
+
+    benchmark.disable_trajectory_recorder()
+    benchmark.objective_function({'x': 0.5})
+    assert len(recorder) == 2
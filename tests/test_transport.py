@@ -0,0 +1,78 @@
+import enum
+
+import numpy as np
+import pytest
+
+msgpack = pytest.importorskip('msgpack')
+
+from hpolib.container import transport  # noqa: E402
+
+
+def test_pack_unpack():
+    class Color(enum.Enum):
+        RED = 1
+
+    result = {'function_value': np.float32(0.5),
+              'cost': 10,
+              'info': {'valid_rmse_per_run': np.arange(8, dtype=np.float64).reshape(2, 4),
+                       'runs': np.array([1, 2, 3], dtype=np.int32),
+                       'scalar': np.array(3.0),
+                       'color': Color.RED,
+                       'objects': np.array(['a', None], dtype=object),
+                       'fidelity': {'epoch': 199},
+                       'data_seed': (777, 888)}}
+
+    unpacked = transport.unpack(transport.pack(result))
+
+    assert unpacked['function_value'] == 0.5
+    assert isinstance(unpacked['function_value'], float)
+    assert unpacked['cost'] == 10
+
+    info = unpacked['info']
+    assert np.array_equal(info['valid_rmse_per_run'], result['info']['valid_rmse_per_run'])
+    assert info['valid_rmse_per_run'].dtype == np.float64
+    assert info['runs'].dtype == np.int32
+    assert info['scalar'].shape == ()
+    assert info['color'] == 'Color.RED'
+    assert info['objects'] == ['a', None]
+    assert info['fidelity'] == {'epoch': 199}
+    assert info['data_seed'] == [777, 888]
+
+    # Arrays are not copied and therefore read-only
+    assert not info['runs'].flags.writeable
+
+    # Non-contiguous arrays
+    array = np.arange(20).reshape(4, 5)[:, ::2]
+    assert np.array_equal(transport.unpack(transport.pack(array)), array)
+
+    with pytest.raises(TypeError):
+        transport.pack(object())
+
+
+def test_to_bytes():
+    payload = transport.pack({'a': 1})
+
+    # Pyro's serpent serializer transfers bytes as base64 encoded dictionary
+    import base64
+    serpent_payload = {'data': base64.b64encode(payload).decode('ascii'), 'encoding': 'base64'}
+    assert transport.unpack(serpent_payload) == {'a': 1}
+    assert transport.unpack(bytearray(payload)) == {'a': 1}
+
+
+def test_shared_arrays(tmp_path):
+    writer = transport.SharedArrayWriter(tmp_path, 'socket_shm_', threshold=1024)
+    result = {'curve': np.arange(1000, dtype=np.float64), 'small': np.arange(3)}
+
+    payload = transport.pack(result, writer)
+    assert len(payload) < 1000
+    assert len(list(tmp_path.glob('socket_shm_*.npy'))) == 1
+
+    unpacked = transport.unpack(payload)
+    assert np.array_equal(unpacked['curve'], result['curve'])
+    assert isinstance(unpacked['curve'], np.memmap)
+    assert not unpacked['curve'].flags.writeable
+    assert np.array_equal(unpacked['small'], result['small'])
+
+    # The file is removed as soon as it is mapped. The array is still readable.
+    assert len(list(tmp_path.glob('socket_shm_*'))) == 0
+    assert unpacked['curve'].sum() == result['curve'].sum()
@@ -0,0 +1,148 @@
+import numpy as np
+import pytest
+
+xgb = pytest.importorskip('xgboost')
+
+from hpolib.benchmarks.ml.xgboost_benchmark import XGBoostBenchmark  # noqa: E402
+from tests.helpers import get_synthetic_data  # noqa: E402
+
+
+class SyntheticXGBoostBenchmark(XGBoostBenchmark):
+    """ Replaces the OpenML task by a small synthetic data set with a categorical and a column with missing values """
+
+    def get_data(self):
+        return get_synthetic_data()
+
+
+def test_xgboost_preprocessing_cache():
+    benchmark = SyntheticXGBoostBenchmark(rng=0, preprocessing_cache_size=2)
+    reference = SyntheticXGBoostBenchmark(rng=0)
+
+    configuration = benchmark.get_configuration_space(seed=1).sample_configuration().get_dictionary()
+    fidelity = {'n_estimators': 8, 'subsample': 0.5}
+    result = benchmark.objective_function(configuration, fidelity=fidelity)
+
+    # Same result as the whole pipeline, which is fitted on the raw data
+    train_idx = reference.train_idx[:100]
+    model = reference._get_pipeline(n_estimators=8, **configuration)
+    model.fit(reference.X_train[train_idx], reference.y_train[train_idx])
+    assert result['function_value'] == 1 - reference.accuracy_scorer(model, reference.X_valid, reference.y_valid)
+    assert result['info']['train_loss'] == \
+        1 - reference.accuracy_scorer(model, reference.X_train[train_idx], reference.y_train[train_idx])
+
+    assert len(benchmark._preprocessing_cache) == 1
+    second_result = benchmark.objective_function(configuration, fidelity=fidelity, rng=0)
+    assert len(benchmark._preprocessing_cache) == 1
+    assert second_result['function_value'] == \
+        reference.objective_function(configuration, fidelity=fidelity, rng=0)['function_value']
+
+    # A new subsample or a new order of the training data is preprocessed again. The oldest entry is removed.
+    benchmark.objective_function(configuration, fidelity={'n_estimators': 8, 'subsample': 0.7})
+    benchmark.objective_function(configuration, fidelity=fidelity, shuffle=True)
+    assert len(benchmark._preprocessing_cache) == 2
+
+    test_result = benchmark.objective_function_test(configuration, fidelity={'n_estimators': 8})
+    assert ('dense', 'test') in benchmark._preprocessing_cache
+    assert 0 <= test_result['function_value'] <= 1
+
+
+class SyntheticMultiClassXGBoostBenchmark(XGBoostBenchmark):
+    def get_data(self):
+        rs = np.random.RandomState(2)
+        X = rs.rand(600, 5)
+        X[:, 0] = rs.randint(20, size=600)
+        X[:, 1] = rs.randint(4, size=600)
+        y = ((X[:, 0] % 3) + (X[:, 2] > 0.5) + 0.8 * rs.rand(600)).astype(int)
+        X[rs.rand(600) < 0.2, 3] = np.nan
+        X[rs.rand(600) < 0.2, 4] = 0
+        return X[:400], y[:400], X[400:500], y[400:500], X[500:], y[500:], \
+            ['categorical', 'categorical', 'numerical', 'numerical', 'numerical']
+
+
+@pytest.mark.parametrize('benchmark_class', [SyntheticXGBoostBenchmark, SyntheticMultiClassXGBoostBenchmark])
+def test_xgboost_native_booster(benchmark_class):
+    configurations = benchmark_class.get_configuration_space(seed=3).sample_configuration(3)
+    fidelity = {'n_estimators': 16, 'subsample': 0.6}
+
+    for configuration in configurations:
+        benchmark = benchmark_class(rng=0)
+        native_benchmark = benchmark_class(rng=0, native_booster=True)
+
+        result = benchmark.objective_function(configuration, fidelity=fidelity)
+        native_result = native_benchmark.objective_function(configuration, fidelity=fidelity)
+        assert native_result['function_value'] == result['function_value']
+        assert native_result['info']['train_loss'] == result['info']['train_loss']
+
+        assert native_benchmark.objective_function_test(configuration)['function_value'] == \
+            benchmark.objective_function_test(configuration)['function_value']
+
+    data = native_benchmark._get_dmatrices(native_benchmark.train_idx[:10])
+    assert data['train'].num_row() == 10
+    assert data['valid'].num_row() == len(native_benchmark.X_valid)
+    # One-hot encoded categories + continuous features
+    assert data['train'].num_col() == sum(len(categories) for categories in native_benchmark.categories) + 3
+
+
+def test_xgboost_booster_cache():
+    configuration = SyntheticMultiClassXGBoostBenchmark.get_configuration_space(seed=4).sample_configuration()
+    benchmark = SyntheticMultiClassXGBoostBenchmark(rng=0, native_booster=True, booster_cache_size=2)
+
+    # Continuing a cached booster or using its first trees gives the same losses as training a new booster
+    for n_estimators in [4, 16, 8]:
+        fidelity = {'n_estimators': n_estimators, 'subsample': 0.6}
+        result = benchmark.objective_function(configuration, fidelity=fidelity, rng=0)
+        reference = SyntheticMultiClassXGBoostBenchmark(rng=0, native_booster=True, booster_cache_size=2)
+        reference_result = reference.objective_function(configuration, fidelity=fidelity, rng=0)
+        assert result['function_value'] == reference_result['function_value']
+        assert result['info']['train_loss'] == reference_result['info']['train_loss']
+
+        booster, _ = list(benchmark._booster_cache.values())[0]
+        reference_booster, _ = list(reference._booster_cache.values())[0]
+        data = reference._get_dmatrices(reference.train_idx[:int(len(reference.train_idx) * 0.6)])
+        assert np.allclose(booster.predict(data['valid'], ntree_limit=n_estimators),
+                           reference_booster.predict(data['valid'], ntree_limit=n_estimators))
+
+    assert len(benchmark._booster_cache) == 1
+    assert list(benchmark._booster_cache.values())[0][1] == 16
+
+    benchmark.objective_function(configuration, fidelity={'n_estimators': 4, 'subsample': 0.7}, rng=0)
+    benchmark.objective_function_test(configuration, fidelity={'n_estimators': 4}, rng=0)
+    assert len(benchmark._booster_cache) == 2
+
+    with pytest.raises(AssertionError):
+        SyntheticXGBoostBenchmark(booster_cache_size=2)
+
+
+def test_xgboost_booster_cache_on_off():
+    configuration = SyntheticMultiClassXGBoostBenchmark.get_configuration_space(seed=6).sample_configuration()
+    benchmark = SyntheticMultiClassXGBoostBenchmark(rng=0, native_booster=True, booster_cache_size=2)
+    reference = SyntheticMultiClassXGBoostBenchmark(rng=0, native_booster=True)
+
+    # The cache changes the random stream of the boosters. Thus, the results are kept apart in the result cache.
+    assert benchmark._get_cache_key_parameters() != reference._get_cache_key_parameters()
+    assert reference._get_cache_key_parameters() == \
+        SyntheticMultiClassXGBoostBenchmark(rng=0)._get_cache_key_parameters()
+
+    # Calls without rng use the seed of the benchmark and hit the cache
+    for n_estimators in [4, 8, 16]:
+        benchmark.objective_function(configuration, fidelity={'n_estimators': n_estimators, 'subsample': 0.6})
+    assert len(benchmark._booster_cache) == 1
+    assert list(benchmark._booster_cache.values())[0][1] == 16
+
+
+@pytest.mark.parametrize('native_booster', [False, True])
+def test_xgboost_learning_curve(native_booster):
+    configuration = SyntheticMultiClassXGBoostBenchmark.get_configuration_space(seed=5).sample_configuration()
+    benchmark = SyntheticMultiClassXGBoostBenchmark(rng=0, native_booster=native_booster)
+
+    curve = benchmark.get_learning_curve(configuration, fidelity={'n_estimators': 12, 'subsample': 0.6}, rng=0)
+    assert np.array_equal(curve['n_estimators'], np.arange(1, 13))
+    assert curve['function_value'].shape == curve['train_loss'].shape == (12, )
+    assert curve['cost'] > 0
+
+    # Same losses as the objective function with fewer trees
+    for n_estimators in [2, 7, 12]:
+        result = benchmark.objective_function(configuration, fidelity={'n_estimators': n_estimators, 'subsample': 0.6},
+                                              rng=0)
+        assert curve['function_value'][n_estimators - 1] == result['function_value']
+        assert curve['train_loss'][n_estimators - 1] == result['info']['train_loss']